@@ -0,0 +1,45 @@
+import time
+from typing import Optional
+
+from google.genai import types
+
+from compaction import compact
+
+
+class AgentBudget:
+    """Limits on how far one user turn may chain model and tool steps."""
+
+    def __init__(
+        self, max_steps: int = 5, max_tokens: int = 200_000, deadline: float = 60.0
+    ):
+        self.max_steps = max_steps
+        self.max_tokens = max_tokens
+        self.deadline = deadline
+        self.started = time.monotonic()
+
+    def exhausted(self, step: int, tokens: int) -> Optional[str]:
+        """Why the turn must stop after ``step``, or ``None`` to keep going."""
+        if step >= self.max_steps:
+            return f"reached the limit of {self.max_steps} steps"
+        if tokens >= self.max_tokens:
+            return f"used {tokens} of {self.max_tokens} tokens"
+        if time.monotonic() - self.started >= self.deadline:
+            return f"ran past the {self.deadline:g}s deadline"
+        return None
+
+
+def project_result(
+    tool_name: str, text: str, query: Optional[str] = None, max_chars: int = 500
+) -> dict:
+    """Compact view of a tool result for the model instead of the full payload."""
+    return {"result": compact(tool_name, text, query, max_chars=max_chars)}
+
+
+def function_response_part(function_call, response: dict) -> types.Part:
+    return types.Part(
+        function_response=types.FunctionResponse(
+            id=function_call.id,
+            name=function_call.name,
+            response=response,
+        )
+    )
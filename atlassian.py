@@ -0,0 +1,187 @@
+"""Atlassian OAuth and identity lookups over one shared HTTP client.
+
+Every request goes through a single pooled ``httpx.AsyncClient`` that lives
+as long as the app, so a login reuses warm connections (HTTP/2 when the
+``h2`` package is installed) instead of paying TCP and TLS setup three
+times. The Jira cloud id and user profile behind an access token are
+cached for ``ttl`` seconds once both are known; failed lookups are not.
+
+``/myself`` needs the cloud id that ``accessible-resources`` returns. A
+returning user's last cloud id comes with the request, so ``resolve`` asks
+for the profile on it while the resources are still loading, and repeats
+the request on the right cloud only if that guess was wrong.
+"""
+
+import asyncio
+import hashlib
+import importlib.util
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import httpx
+
+from log import get_logger, log_payload
+from metrics import span
+
+logger = get_logger(__name__)
+
+AUTH_URL = "https://auth.atlassian.com"
+API_URL = "https://api.atlassian.com"
+
+# httpx only speaks HTTP/2 with the optional h2 package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def _token_key(access_token: str) -> str:
+    return hashlib.sha256(access_token.encode()).hexdigest()
+
+
+class AtlassianClient:
+    """Token exchange, cloud id and profile lookups for the OAuth callback."""
+
+    def __init__(
+        self,
+        auth_url: str = AUTH_URL,
+        api_url: str = API_URL,
+        ttl: float = 300.0,
+        max_entries: int = 10_000,
+        timeout: float = 10.0,
+        max_connections: int = 100,
+        http2: bool = True,
+    ):
+        self.auth_url = auth_url.rstrip("/")
+        self.api_url = api_url.rstrip("/")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.http = httpx.AsyncClient(
+            http2=self.http2,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=60.0,
+            ),
+        )
+        # Access token digest -> (expires at, cloud id, profile)
+        self._resolved: "OrderedDict[str, Tuple[float, str, Optional[dict]]]" = (
+            OrderedDict()
+        )
+        self.metrics = {
+            "resolves": 0,
+            "cache_hits": 0,
+            "guess_hits": 0,
+            "guess_misses": 0,
+            "errors": 0,
+        }
+
+    async def exchange_code(
+        self, code: str, client_id: str, client_secret: str, redirect_uri: str
+    ) -> dict:
+        """Trade an authorization code for the token response."""
+        with span("auth_token_exchange"):
+            response = await self.http.post(
+                f"{self.auth_url}/oauth/token",
+                json={
+                    "grant_type": "authorization_code",
+                    "client_id": client_id,
+                    "client_secret": client_secret,
+                    "code": code,
+                    "redirect_uri": redirect_uri,
+                },
+                headers={"Content-Type": "application/json"},
+            )
+            return response.json()
+
+    async def accessible_resources(self, access_token: str) -> list:
+        with span("auth_accessible_resources"):
+            response = await self.http.get(
+                f"{self.api_url}/oauth/token/accessible-resources",
+                headers={"Authorization": f"Bearer {access_token}"},
+            )
+            response.raise_for_status()
+            data = response.json()
+        log_payload(logger, "Accessible resources", data)
+        return data if isinstance(data, list) else []
+
+    async def myself(self, access_token: str, cloud_id: str) -> Optional[dict]:
+        """The Jira user behind ``access_token`` on ``cloud_id``."""
+        with span("auth_user_profile"):
+            response = await self.http.get(
+                f"{self.api_url}/ex/jira/{cloud_id}/rest/api/3/myself",
+                headers={
+                    "Authorization": f"Bearer {access_token}",
+                    "Accept": "application/json",
+                },
+            )
+            response.raise_for_status()
+        return response.json()
+
+    async def _profile(self, access_token: str, cloud_id: str) -> Optional[dict]:
+        try:
+            return await self.myself(access_token, cloud_id)
+        except Exception as e:
+            self.metrics["errors"] += 1
+            logger.warning(f"Failed to fetch user info: {e}")
+            return None
+
+    async def resolve(
+        self, access_token: str, last_cloud_id: Optional[str] = None
+    ) -> Tuple[str, Optional[dict]]:
+        """Cloud id (``""`` if none) and Jira profile behind ``access_token``.
+
+        ``last_cloud_id`` is the cloud the same user resolved to before, such
+        as the one in their ``cloud_id`` cookie; it is only ever a guess.
+        """
+        self.metrics["resolves"] += 1
+        key = _token_key(access_token)
+        cached = self._resolved.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                self._resolved.move_to_end(key)
+                self.metrics["cache_hits"] += 1
+                return cached[1], cached[2]
+            del self._resolved[key]
+        guess = last_cloud_id
+        guessed = (
+            asyncio.create_task(self._profile(access_token, guess)) if guess else None
+        )
+        try:
+            resources = await self.accessible_resources(access_token)
+        except Exception as e:
+            self.metrics["errors"] += 1
+            logger.warning(f"Error getting cloud resources: {e}")
+            resources = []
+        except BaseException:
+            if guessed is not None:
+                guessed.cancel()
+            raise
+        cloud_id = (
+            resources[0]["id"]
+            if resources and isinstance(resources[0], dict) and "id" in resources[0]
+            else ""
+        )
+        if guessed is not None and cloud_id == guess:
+            self.metrics["guess_hits"] += 1
+            profile = await guessed
+        else:
+            if guessed is not None:
+                self.metrics["guess_misses"] += 1
+                guessed.cancel()
+            profile = await self._profile(access_token, cloud_id) if cloud_id else None
+        if cloud_id and profile is not None:
+            self._resolved[key] = (time.monotonic() + self.ttl, cloud_id, profile)
+            while len(self._resolved) > self.max_entries:
+                self._resolved.popitem(last=False)
+        return cloud_id, profile
+
+    async def close(self):
+        await self.http.aclose()
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "cached": len(self._resolved),
+            "http2": self.http2,
+        }
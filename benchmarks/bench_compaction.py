@@ -0,0 +1,164 @@
+"""Report how much ``compaction.compact`` shrinks tool results sent to the model.
+
+By default this uses generated payloads shaped like the MCP server's
+``jira_search``, ``jira_get_board_issues`` and ``jira_batch_get_changelogs``
+results. Pass ``--payload TOOL=PATH`` (repeatable) to measure results
+recorded from a real Jira instead. Tokens are estimated at four characters
+each; with ``--live`` and ``GOOGLE_API_KEY`` set they are counted by Gemini.
+
+Run from the repository root:
+``python benchmarks/bench_compaction.py [--payload jira_search=search.json] [--live]``
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from compaction import compact  # noqa: E402
+
+QUERY = "what is on the board, and who is working on it"
+
+
+def _user(i: int) -> dict:
+    return {
+        "account_id": f"5b10a2844c20165700ede21{i}",
+        "display_name": f"User {i}",
+        "email": f"user{i}@example.com",
+        "active": True,
+        "avatar_url": f"https://avatar-management.example.net/{i}/48",
+        "time_zone": "Europe/Berlin",
+    }
+
+
+def _issue(i: int) -> dict:
+    return {
+        "id": str(10000 + i),
+        "key": f"PROJ-{i + 1}",
+        "summary": f"Fix the login redirect loop on page {i} for mobile users",
+        "url": f"https://example.atlassian.net/browse/PROJ-{i + 1}",
+        "description": "Steps to reproduce:\n1. Open the app\n" + "lorem ipsum " * 150,
+        "status": {"name": "In Progress", "category": "In Progress", "color": "yellow"},
+        "issue_type": {"name": "Bug", "icon_url": "https://example.net/bug.svg"},
+        "priority": {"name": "High", "icon_url": "https://example.net/high.svg"},
+        "assignee": _user(i % 7),
+        "reporter": _user(9),
+        "labels": ["frontend", "auth"],
+        "components": [],
+        "created": "2024-05-01T10:20:30.000+0000",
+        "updated": "2024-05-03T11:22:33.000+0000",
+        "comments": [
+            {
+                "id": str(500 + c),
+                "body": "Could not reproduce on staging. " * 10,
+                "author": _user(c),
+                "created": "2024-05-02T09:00:00.000+0000",
+            }
+            for c in range(3)
+        ],
+    }
+
+
+def make_search(count: int = 50) -> str:
+    return json.dumps(
+        {
+            "total": 180,
+            "start_at": 0,
+            "max_results": count,
+            "issues": [_issue(i) for i in range(count)],
+        }
+    )
+
+
+def make_changelogs(issues: int = 10, changes: int = 12) -> str:
+    return json.dumps(
+        [
+            {
+                "issue_id": f"PROJ-{i + 1}",
+                "changelogs": [
+                    {
+                        "author": _user(c % 5),
+                        "created": f"2024-05-{c + 1:02d}T10:00:00.000+0000",
+                        "items": [
+                            {
+                                "field": "status",
+                                "fieldtype": "jira",
+                                "from_string": "To Do",
+                                "to_string": "In Progress",
+                                "from_id": "10000",
+                                "to_id": "3",
+                            }
+                        ],
+                    }
+                    for c in range(changes)
+                ],
+            }
+            for i in range(issues)
+        ]
+    )
+
+
+def load_payloads(specs):
+    if not specs:
+        return [
+            ("jira_search", make_search()),
+            ("jira_get_board_issues", make_search(100)),
+            ("jira_batch_get_changelogs", make_changelogs()),
+        ]
+    payloads = []
+    for spec in specs:
+        tool, path = spec.split("=", 1)
+        with open(path, encoding="utf-8") as f:
+            payloads.append((tool, f.read()))
+    return payloads
+
+
+def main(payloads, live: bool = False, runs: int = 50):
+    counter = None
+    if live:
+        from google import genai
+
+        client = genai.Client(api_key=os.environ["GOOGLE_API_KEY"])
+
+        def counter(text):
+            return client.models.count_tokens(
+                model="gemini-2.0-flash", contents=text
+            ).total_tokens
+
+    reductions = []
+    for tool, payload in payloads:
+        started = time.perf_counter()
+        for _ in range(runs):
+            compacted = compact(tool, payload, QUERY)
+        elapsed = (time.perf_counter() - started) / runs * 1000
+        if counter:
+            before, after = counter(payload), counter(compacted)
+        else:
+            before, after = len(payload) // 4, len(compacted) // 4
+        reductions.append(1 - after / before)
+        print(
+            f"{tool:28} tokens {before:>7} -> {after:>6} "
+            f"({100 * reductions[-1]:.0f}% fewer), compact {elapsed:.2f} ms"
+        )
+    print()
+    print(
+        f"median reduction {100 * statistics.median(reductions):.0f}% "
+        f"({'counted by Gemini' if live else 'estimated at 4 chars/token'})"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--payload",
+        action="append",
+        metavar="TOOL=PATH",
+        help="recorded tool result to measure instead of the generated ones",
+    )
+    parser.add_argument("--live", action="store_true", help="count tokens via Gemini")
+    args = parser.parse_args()
+    main(load_payloads(args.payload), args.live)
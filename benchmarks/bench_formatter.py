@@ -0,0 +1,60 @@
+"""Time local markdown formatting of a 100-issue ``jira_search`` result.
+
+Run from the repository root: ``python benchmarks/bench_formatter.py``
+"""
+
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import formatter  # noqa: E402
+
+
+def make_search_result(count: int = 100) -> str:
+    issues = []
+    for i in range(count):
+        issues.append(
+            {
+                "id": str(10000 + i),
+                "key": f"PROJ-{i + 1}",
+                "summary": f"Fix the login redirect loop on page {i} | mobile",
+                "url": f"https://example.atlassian.net/browse/PROJ-{i + 1}",
+                "description": "Steps to reproduce:\n" + "lorem ipsum " * 200,
+                "status": {"name": "In Progress", "category": "In Progress"},
+                "issue_type": {"name": "Bug"},
+                "priority": {"name": "High"},
+                "assignee": {"display_name": f"User {i % 7}", "email": "u@x.io"},
+                "reporter": {"display_name": "Reporter"},
+                "labels": ["frontend", "auth"],
+                "created": "2024-05-01T10:20:30.000+0000",
+                "updated": "2024-05-03T11:22:33.000+0000",
+            }
+        )
+    return json.dumps(
+        {"total": 250, "start_at": 0, "max_results": count, "issues": issues}
+    )
+
+
+def main(runs: int = 200):
+    payload = make_search_result()
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = "".join(formatter.render("jira_search", payload))
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    print(
+        f"payload: {len(payload) / 1024:.1f} KiB, output: {len(output) / 1024:.1f} KiB"
+    )
+    print(
+        f"jira_search x100 issues: median {statistics.median(timings):.2f} ms, "
+        f"p95 {timings[int(runs * 0.95) - 1]:.2f} ms, max {timings[-1]:.2f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+"""Chat load test against local stand-ins for Gemini and the Jira MCP server.
+
+Starts ``fake_mcp_server.py`` and a copy of the chat server whose Gemini
+client is ``fake_genai.FakeGenaiClient``, then for every level in
+``--levels`` opens that many WebSocket sessions at once and has each send
+``--turns`` messages, waiting up to ``--think-ms`` between them, after an
+unreported warm-up round of ``--warmup`` sessions. Nothing leaves the
+machine, so the numbers are the server's own overhead plus the configured
+model and tool latencies.
+
+Reported per level:
+
+- TTFT: from sending a message to its first ``text`` event, p50/p95/p99
+- turn: from sending a message to its ``end`` event, p50/p95/p99
+- turns/s: completed turns over the time the level took
+- RSS/conn: growth of the server's resident memory per open session,
+  once connected and idle, and again after every turn has run
+- loop lag: how late a 10 ms timer on the server's event loop fired, p99 and max
+
+The load generator's own loop lag is shown too; when it is high, the client
+is the bottleneck and the level needs another machine or fewer sessions.
+
+Run from the repository root:
+``python benchmarks/bench_load.py --levels 10,100,1000``
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+import httpx
+import websockets
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, BENCHMARKS)
+
+# Open questions that go to the model rather than the fast path
+MESSAGES = [
+    "Which bugs in BENCH are still open and who is working on them?",
+    "Summarize what the team did in BENCH this week.",
+    "Is anything in the current BENCH work blocked, and why?",
+    "What should I pick up next from the BENCH backlog?",
+    "Explain the status of the BENCH release in a few sentences.",
+]
+
+
+def raise_fd_limit():
+    """Allow as many sockets as the hard limit does; each session holds several."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class LagProbe:
+    """How late a periodic timer fires on the running loop."""
+
+    def __init__(self, interval: float = 0.01, keep: int = 100_000):
+        self.interval = interval
+        self.samples = collections.deque(maxlen=keep)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(time.perf_counter() - started - self.interval)
+
+    def take(self) -> dict:
+        samples = list(self.samples)
+        self.samples.clear()
+        return {
+            "p50": percentile(samples, 50),
+            "p99": percentile(samples, 99),
+            "max": max(samples) if samples else None,
+        }
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+
+def serve(args):
+    """Run the chat server in this process with the fake Gemini client."""
+    raise_fd_limit()
+    # Databases go to a scratch directory, which also holds the static
+    # assets directory the server mounts at import
+    workdir = tempfile.mkdtemp(prefix="bench-load-")
+    os.makedirs(os.path.join(workdir, "jira-chat-automator", "dist", "assets"))
+    os.chdir(workdir)
+
+    import uvicorn
+
+    import server
+    from atlassian import AtlassianClient
+    from fake_genai import FakeGenaiClient, install
+
+    fake = FakeGenaiClient(
+        ttft=args.ttft_ms / 1000,
+        chunk_rate=args.chunk_rate,
+        chunks=args.chunks,
+        chunk_chars=args.chunk_chars,
+        tool_call_rate=args.tool_call_rate,
+        seed=args.seed,
+    )
+    install(server, fake)
+    # Token lookups go to the fake MCP server's identity routes
+    server.atlassian = AtlassianClient(
+        auth_url=args.identity_url, api_url=args.identity_url
+    )
+    lag = LagProbe()
+    server.app.router.on_startup.append(lag.start)
+
+    @server.app.get("/bench/stats")
+    async def bench_stats():
+        return {
+            "rss": rss_bytes(),
+            "lag": lag.take(),
+            "connections": len(server.drainer.connections),
+            "genai": dict(fake.metrics),
+            "mcp_pool": server.mcp_pool.stats(),
+        }
+
+    uvicorn.run(
+        server.app,
+        host="127.0.0.1",
+        port=args.port,
+        log_level="warning",
+        backlog=4096,
+        ws_max_size=16 * 1024 * 1024,
+    )
+
+
+class Level:
+    """Measurements of one concurrency level."""
+
+    def __init__(self, sessions: int):
+        self.sessions = sessions
+        self.ttft: List[float] = []
+        self.turn: List[float] = []
+        self.errors = 0
+        self.failed_connects = 0
+
+
+async def connect(url: str, i: int, level: Level, gate: asyncio.Semaphore):
+    """Open session ``i`` and wait until the server has set it up.
+
+    The ``session`` event comes once the MCP session is leased and the
+    conversation started, so ``gate`` bounds how many are set up at once.
+    """
+    async with gate:
+        websocket = None
+        try:
+            websocket = await websockets.connect(
+                url,
+                additional_headers={
+                    "Cookie": f"access_token=bench-{i}; cloud_id=bench-cloud"
+                },
+                open_timeout=60,
+                ping_interval=None,
+                max_size=None,
+            )
+            for event in json.loads(await websocket.recv()):
+                if event["type"] == "error":
+                    raise ConnectionError(event.get("message"))
+            return websocket
+        except Exception as e:
+            level.failed_connects += 1
+            print(f"connect {i} failed: {e!r}", file=sys.stderr)
+            if websocket is not None:
+                await websocket.close()
+            return None
+
+
+async def converse(websocket, i: int, level: Level, args):
+    rng = random.Random(i)
+    for n in range(args.turns):
+        if n and args.think_ms:
+            await asyncio.sleep(rng.uniform(0, args.think_ms / 1000))
+        started = time.perf_counter()
+        first_text = None
+        message = args.message or MESSAGES[(i + n) % len(MESSAGES)]
+        try:
+            await websocket.send(json.dumps({"type": "message", "text": message}))
+            ended = False
+            while not ended:
+                for event in json.loads(await websocket.recv()):
+                    if event["type"] == "text" and first_text is None:
+                        first_text = time.perf_counter()
+                    elif event["type"] == "error":
+                        level.errors += 1
+                    elif event["type"] == "end":
+                        ended = True
+        except Exception as e:
+            level.errors += 1
+            print(f"session {i} failed: {e!r}", file=sys.stderr)
+            return
+        if first_text is not None:
+            level.ttft.append(first_text - started)
+        level.turn.append(time.perf_counter() - started)
+
+
+async def server_stats(http: httpx.AsyncClient, base: str) -> dict:
+    return (await http.get(f"{base}/bench/stats")).json()
+
+
+def ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.0f}"
+
+
+async def run_level(
+    sessions: int, args, http: httpx.AsyncClient, base: str, report: bool = True
+):
+    url = base.replace("http", "ws", 1) + "/ws/chat"
+    level = Level(sessions)
+    client_lag = LagProbe()
+    client_lag.start()
+    before = await server_stats(http, base)
+    gate = asyncio.Semaphore(args.connect_concurrency)
+    sockets = await asyncio.gather(
+        *(connect(url, i, level, gate) for i in range(sessions))
+    )
+    connected = await server_stats(http, base)
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            converse(websocket, i, level, args)
+            for i, websocket in enumerate(sockets)
+            if websocket is not None
+        )
+    )
+    elapsed = time.perf_counter() - started
+    loaded = await server_stats(http, base)
+    await asyncio.gather(*(ws.close() for ws in sockets if ws is not None))
+    client_lag.stop()
+    # Let the server release the sessions before the next level measures
+    while (await server_stats(http, base))["connections"]:
+        await asyncio.sleep(0.1)
+    if not report:
+        return
+    open_sessions = max(1, sessions - level.failed_connects)
+
+    def per_connection(after: dict) -> str:
+        return f"{(after['rss'] - before['rss']) / open_sessions / 1024:.0f}"
+
+    print(
+        f"{sessions:>6} {len(level.turn):>6} {level.errors + level.failed_connects:>5}"
+        f" {ms(percentile(level.ttft, 50)):>6} {ms(percentile(level.ttft, 95)):>6}"
+        f" {ms(percentile(level.ttft, 99)):>6}"
+        f" {ms(percentile(level.turn, 50)):>6} {ms(percentile(level.turn, 95)):>6}"
+        f" {ms(percentile(level.turn, 99)):>6}"
+        f" {len(level.turn) / elapsed:>8.1f}"
+        f" {per_connection(connected):>6} {per_connection(loaded):>6}"
+        f" {ms(loaded['lag']['p99']):>6} {ms(loaded['lag']['max']):>6}"
+        f" {ms(client_lag.take()['p99']):>6}",
+        file=sys.stderr,
+    )
+
+
+async def wait_ready(http: httpx.AsyncClient, url: str, process: subprocess.Popen):
+    for _ in range(300):
+        if process.poll() is not None:
+            raise SystemExit(f"{process.args[1]} exited with {process.returncode}")
+        try:
+            if (await http.get(url)).status_code < 500:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise SystemExit(f"{url} did not come up")
+
+
+async def main(args):
+    raise_fd_limit()
+    levels = [int(level) for level in args.levels.split(",")]
+    mcp_base = f"http://127.0.0.1:{args.mcp_port}"
+    base = f"http://127.0.0.1:{args.port}"
+    env = {
+        "GOOGLE_API_KEY": "bench",
+        "MCP_SERVER_URL": f"{mcp_base}/mcp",
+        "MCP_POOL_MAX_SESSIONS": str(max(levels) + 10),
+        "JIRA_MIRROR_ENABLED": "0",
+        "DRAIN_DEADLINE": "1",
+        "LOG_LEVEL": "WARNING",
+        **os.environ,
+        # Sessions are ready once the server sends their resume token
+        "CONVERSATION_STORE_PATH": "conversations.db",
+    }
+    serve_args = [
+        "--ttft-ms",
+        str(args.ttft_ms),
+        "--chunk-rate",
+        str(args.chunk_rate),
+        "--chunks",
+        str(args.chunks),
+        "--chunk-chars",
+        str(args.chunk_chars),
+        "--tool-call-rate",
+        str(args.tool_call_rate),
+        "--seed",
+        str(args.seed),
+    ]
+    fake_mcp = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(BENCHMARKS, "fake_mcp_server.py"),
+            "--port",
+            str(args.mcp_port),
+            "--latency-ms",
+            str(args.tool_latency_ms),
+        ]
+    )
+    chat = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--serve",
+            "--port",
+            str(args.port),
+            "--identity-url",
+            mcp_base,
+            *serve_args,
+        ],
+        env=env,
+    )
+    try:
+        async with httpx.AsyncClient(timeout=30) as http:
+            await wait_ready(
+                http, f"{mcp_base}/oauth/token/accessible-resources", fake_mcp
+            )
+            await wait_ready(http, f"{base}/readyz", chat)
+            if args.warmup:
+                # First turns pay for imports, caches and pool growth
+                await run_level(args.warmup, args, http, base, report=False)
+            print(
+                f"TTFT {args.ttft_ms:g} ms, {args.chunks} chunks at "
+                f"{args.chunk_rate:g}/s, tool calls {args.tool_call_rate:.0%} at "
+                f"{args.tool_latency_ms:g} ms, {args.turns} turns per session\n"
+                f"{'':>20} {'TTFT ms':^20} {'turn ms':^20} {'':>8}"
+                f" {'RSS/conn KiB':^13} {'server lag':^13} {'client':>6}\n"
+                f"{'conns':>6} {'turns':>6} {'errs':>5}"
+                f" {'p50':>6} {'p95':>6} {'p99':>6} {'p50':>6} {'p95':>6} {'p99':>6}"
+                f" {'turns/s':>8} {'idle':>6} {'loaded':>6}"
+                f" {'p99':>6} {'max':>6} {'lag99':>6}",
+                file=sys.stderr,
+            )
+            for sessions in levels:
+                await run_level(sessions, args, http, base)
+            stats = await server_stats(http, base)
+            print(f"fake model: {stats['genai']}", file=sys.stderr)
+    finally:
+        # The server closes its MCP sessions on the way out, so it goes first
+        for process in (chat, fake_mcp):
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", default="10,100,1000")
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--think-ms", type=float, default=500.0)
+    parser.add_argument("--message", help="send this instead of the built-in mix")
+    parser.add_argument("--warmup", type=int, default=100, help="unreported sessions")
+    parser.add_argument("--connect-concurrency", type=int, default=100)
+    parser.add_argument("--port", type=int, default=9200)
+    parser.add_argument("--mcp-port", type=int, default=9100)
+    parser.add_argument("--ttft-ms", type=float, default=300.0)
+    parser.add_argument("--chunk-rate", type=float, default=50.0)
+    parser.add_argument("--chunks", type=int, default=20)
+    parser.add_argument("--chunk-chars", type=int, default=40)
+    parser.add_argument("--tool-call-rate", type=float, default=0.5)
+    parser.add_argument("--tool-latency-ms", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--identity-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+    else:
+        asyncio.run(main(args))
@@ -0,0 +1,136 @@
+"""Event loop lag while streaming turns that log chunks and large tool results.
+
+Compares printing straight to stdout, as the server used to, with the
+queue-backed logger in ``log.py`` (sampled payloads, and full payload
+capture). Output goes to a sink that accepts ``--sink-mbps`` megabytes per
+second, standing in for a terminal or a log pipe that applies backpressure;
+``--sink stdout`` writes to the real stdout instead.
+
+Run from the repository root: ``python benchmarks/bench_logging.py``
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import log  # noqa: E402
+
+
+class SlowSink:
+    """File-like object that blocks for as long as the bytes take to drain."""
+
+    def __init__(self, megabytes_per_second: float):
+        self.seconds_per_char = 1 / (megabytes_per_second * 1024 * 1024)
+
+    def write(self, text: str) -> int:
+        time.sleep(len(text) * self.seconds_per_char)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def make_tool_result(size_kib: int) -> str:
+    issue = {"key": "PROJ-1", "summary": "x" * 200, "description": "lorem " * 100}
+    count = max(1, size_kib * 1024 // len(json.dumps(issue)))
+    return json.dumps({"issues": [issue] * count})
+
+
+async def probe_lag(interval: float, lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def connection(mode: str, turns: int, chunks: int, tool_result: str):
+    logger = log.get_logger("bench")
+    for turn in range(turns):
+        for i in range(chunks):
+            # A model chunk arriving from upstream
+            await asyncio.sleep(0.002)
+            text = f"chunk {i} of turn {turn} " * 4
+            if mode == "print":
+                print(text)
+            else:
+                log.log_payload(logger, "Model chunk", text)
+        if mode == "print":
+            print(tool_result)
+        else:
+            log.log_payload(logger, "Tool result", tool_result, tool="jira_search")
+
+
+async def run(mode: str, args) -> dict:
+    lags: list = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_lag(0.01, lags, stop))
+    tool_result = make_tool_result(args.result_kib)
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            connection(mode, args.turns, args.chunks, tool_result)
+            for _ in range(args.connections)
+        )
+    )
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    lags.sort()
+    return {
+        "elapsed": elapsed,
+        "p50": lags[len(lags) // 2],
+        "p99": lags[int(len(lags) * 0.99)],
+        "max": lags[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--chunks", type=int, default=50)
+    parser.add_argument("--result-kib", type=int, default=1024)
+    parser.add_argument("--sink", choices=("slow", "stdout"), default="slow")
+    parser.add_argument("--sink-mbps", type=float, default=50.0)
+    args = parser.parse_args()
+
+    sink = SlowSink(args.sink_mbps) if args.sink == "slow" else sys.stdout
+    results = {}
+    with contextlib.redirect_stdout(sink):
+        results["print"] = asyncio.run(run("print", args))
+        for mode, debug in (("queue", False), ("queue, full payloads", True)):
+            log.configure(stream=sink, debug_payloads=debug)
+            results[mode] = asyncio.run(run(mode, args))
+            results[mode]["dropped"] = log.stats()["dropped"]
+            drain_started = time.perf_counter()
+            log.shutdown()
+            results[mode]["drain"] = time.perf_counter() - drain_started
+
+    print(
+        f"{args.connections} connections x {args.turns} turns, {args.chunks} chunks "
+        f"and a {args.result_kib} KiB tool result per turn, sink: {args.sink}",
+        file=sys.stderr,
+    )
+    for mode, result in results.items():
+        extra = ""
+        if "dropped" in result:
+            extra = (
+                f", dropped {result['dropped']}, "
+                f"drained in {result['drain']:.2f} s after the run"
+            )
+        print(
+            f"{mode:>22}: loop lag p50 {result['p50'] * 1000:.1f} ms, "
+            f"p99 {result['p99'] * 1000:.1f} ms, max {result['max'] * 1000:.1f} ms, "
+            f"run {result['elapsed']:.2f} s{extra}",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Login latency of the OAuth callback's Atlassian calls against a local stub.
+
+The stub serves ``/oauth/token``, ``/oauth/token/accessible-resources`` and
+``/ex/jira/{cloud}/rest/api/3/myself`` over plain HTTP/1.1 with keep-alive.
+Each new connection waits ``--handshake-ms`` before it is served, standing
+in for TCP and TLS setup to Atlassian, and each request waits ``--rtt-ms``.
+Compares the old callback (a new ``httpx.AsyncClient`` per call, one call
+after the other) with ``AtlassianClient`` for a first login, a login on a
+known cloud, and a repeated lookup of the same token.
+
+Run from the repository root: ``python benchmarks/bench_login.py``
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from atlassian import AtlassianClient  # noqa: E402
+
+CLOUD_ID = "11111111-2222-3333-4444-555555555555"
+
+
+class StubAtlassian:
+    def __init__(self, handshake: float, rtt: float):
+        self.handshake = handshake
+        self.rtt = rtt
+        self.connections = 0
+        self.requests = 0
+
+    def respond(self, method: str, path: str) -> dict:
+        if path == "/oauth/token":
+            return {"access_token": f"token-{self.requests}", "expires_in": 3600}
+        if path == "/oauth/token/accessible-resources":
+            return [{"id": CLOUD_ID, "name": "stub", "url": "https://stub"}]
+        if path.endswith("/rest/api/3/myself"):
+            return {"accountId": "abc", "displayName": "Stub User"}
+        return {"error": f"no route for {method} {path}"}
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        await asyncio.sleep(self.handshake)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(" ", 2)
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b""):
+                        break
+                    name, _, value = line.decode().partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                if length:
+                    await reader.readexactly(length)
+                self.requests += 1
+                await asyncio.sleep(self.rtt)
+                body = json.dumps(self.respond(method, path)).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode()
+                    + body
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def login_per_call_clients(base: str, code: str):
+    """The callback as it was: three fresh clients, strictly in sequence."""
+    async with httpx.AsyncClient() as client:
+        token = (await client.post(f"{base}/oauth/token", json={"code": code})).json()
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+    async with httpx.AsyncClient() as client:
+        resources = (
+            await client.get(
+                f"{base}/oauth/token/accessible-resources", headers=headers
+            )
+        ).json()
+    async with httpx.AsyncClient() as client:
+        await client.get(
+            f"{base}/ex/jira/{resources[0]['id']}/rest/api/3/myself", headers=headers
+        )
+
+
+async def login_shared_client(atlassian: AtlassianClient, code: str) -> str:
+    token = await atlassian.exchange_code(code, "id", "secret", "http://cb")
+    await atlassian.resolve(token["access_token"])
+    return token["access_token"]
+
+
+async def measure(label: str, logins: int, login) -> float:
+    timings = []
+    for i in range(logins):
+        started = time.perf_counter()
+        await login(i)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    median = timings[len(timings) // 2]
+    print(
+        f"{label:>34}: median {median * 1000:.1f} ms, "
+        f"max {timings[-1] * 1000:.1f} ms",
+        file=sys.stderr,
+    )
+    return median
+
+
+async def main(args):
+    stub = StubAtlassian(args.handshake_ms / 1000, args.rtt_ms / 1000)
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+    base = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+    print(
+        f"{args.logins} logins, handshake {args.handshake_ms:g} ms, "
+        f"request {args.rtt_ms:g} ms",
+        file=sys.stderr,
+    )
+
+    await measure(
+        "client per call, sequential",
+        args.logins,
+        lambda i: login_per_call_clients(base, f"code-{i}"),
+    )
+
+    # Each login is the first on a fresh app, with no cloud id seen yet
+    async def first_login(i):
+        atlassian = AtlassianClient(auth_url=base, api_url=base)
+        try:
+            await login_shared_client(atlassian, f"code-{i}")
+        finally:
+            await atlassian.close()
+
+    await measure("shared client, first login", args.logins, first_login)
+
+    atlassian = AtlassianClient(auth_url=base, api_url=base)
+    token = await login_shared_client(atlassian, "warmup")
+    await measure(
+        "shared client, warm, known cloud",
+        args.logins,
+        lambda i: login_shared_client(atlassian, f"code-{i}"),
+    )
+    await measure(
+        "cached resolve of the same token",
+        args.logins,
+        lambda i: atlassian.resolve(token),
+    )
+    print(f"{'client stats':>34}: {atlassian.stats()}", file=sys.stderr)
+    await atlassian.close()
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--handshake-ms", type=float, default=60.0)
+    parser.add_argument("--rtt-ms", type=float, default=40.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,117 @@
+"""Compare prompt size and latency with and without per-query tool routing.
+
+Offline (default) this reports the router's own latency and the estimated
+tokens of the declared tools for a set of typical messages. With ``--live``
+and ``GOOGLE_API_KEY`` set it also sends each message to Gemini both ways
+and reports the real prompt token counts and time to first chunk.
+
+Run from the repository root: ``python benchmarks/bench_tool_router.py [--live]``
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from google.genai import types  # noqa: E402
+
+from tool_router import ToolRouter  # noqa: E402
+from tools import tools  # noqa: E402
+
+MESSAGES = [
+    "show me PROJ-12",
+    "what's in the current sprint on board 4",
+    "transitions for PROJ-9",
+    "log 2 hours on ABC-1",
+    "create a bug in PROJ about the login redirect",
+    "who am I",
+    "link PROJ-1 to epic PROJ-2",
+    "what did my team close last week",
+    "list all scrum boards",
+    "add a comment to PROJ-3 saying the fix is deployed",
+    "what changed on PROJ-4 recently",
+    "rename sprint 12 to Hardening",
+]
+
+
+def estimate_tokens(selected_tools) -> int:
+    return (
+        sum(len(tool.model_dump_json(exclude_none=True)) for tool in selected_tools)
+        // 4
+    )
+
+
+def bench_offline(router: ToolRouter, runs: int = 2000):
+    full_tokens = estimate_tokens(tools)
+    timings = []
+    routed_tokens = []
+    for message in MESSAGES:
+        started = time.perf_counter()
+        for _ in range(runs):
+            names = router.select(message)
+        timings.append((time.perf_counter() - started) / runs * 1e6)
+        routed_tokens.append(estimate_tokens(router.tools_for(names)))
+        print(f"{message!r:55} -> {', '.join(n.replace('jira_', '') for n in names)}")
+    print()
+    print(
+        f"router latency: median {statistics.median(timings):.1f} us, max {max(timings):.1f} us"
+    )
+    print(
+        f"tool tokens per turn (estimated): all {full_tokens}, "
+        f"routed median {int(statistics.median(routed_tokens))} "
+        f"({100 * (1 - statistics.median(routed_tokens) / full_tokens):.0f}% fewer)"
+    )
+
+
+async def _first_chunk(client, message, selected_tools):
+    started = time.perf_counter()
+    prompt_tokens = 0
+    ttfc = None
+    async for chunk in await client.aio.models.generate_content_stream(
+        model="gemini-2.0-flash",
+        contents=message,
+        config=types.GenerateContentConfig(tools=selected_tools),
+    ):
+        if ttfc is None:
+            ttfc = time.perf_counter() - started
+        if chunk.usage_metadata and chunk.usage_metadata.prompt_token_count:
+            prompt_tokens = chunk.usage_metadata.prompt_token_count
+    return prompt_tokens, ttfc or 0.0
+
+
+async def bench_live(router: ToolRouter):
+    from google import genai
+
+    client = genai.Client(api_key=os.environ["GOOGLE_API_KEY"])
+    rows = []
+    for message in MESSAGES:
+        full = await _first_chunk(client, message, tools)
+        routed = await _first_chunk(
+            client, message, router.tools_for(router.select(message))
+        )
+        rows.append((full, routed))
+        print(
+            f"{message!r:55} tokens {full[0]:>5} -> {routed[0]:>5}   "
+            f"ttfc {full[1] * 1000:6.0f} ms -> {routed[1] * 1000:6.0f} ms"
+        )
+    print()
+    print(
+        f"median prompt tokens {statistics.median(r[0][0] for r in rows):.0f} -> "
+        f"{statistics.median(r[1][0] for r in rows):.0f}, median ttfc "
+        f"{statistics.median(r[0][1] for r in rows) * 1000:.0f} ms -> "
+        f"{statistics.median(r[1][1] for r in rows) * 1000:.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--live", action="store_true", help="also call Gemini")
+    args = parser.parse_args()
+    router = ToolRouter(tools)
+    bench_offline(router)
+    if args.live:
+        asyncio.run(bench_live(router))
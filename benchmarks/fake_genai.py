@@ -0,0 +1,174 @@
+"""A stand-in for ``genai.Client`` that streams canned answers locally.
+
+Covers what the server calls: ``aio.models.generate_content_stream``,
+``aio.models.generate_content`` and ``aio.caches``. A streamed answer
+starts after ``ttft`` seconds and then yields ``chunks`` text chunks of
+``chunk_chars`` characters at ``chunk_rate`` chunks per second. A request
+whose last message is the user's own asks for a tool first with
+probability ``tool_call_rate``; once the tool results are in, the answer is
+text, so every turn ends after at most one tool round.
+
+``install(server, fake)`` swaps the client into an imported ``server``.
+"""
+
+import asyncio
+import itertools
+import random
+from types import SimpleNamespace
+from typing import Optional
+
+from google.genai import types
+
+# Read tools the fake model reaches for, with the arguments it sends
+TOOL_CALLS = {
+    "jira_get_issue": lambda n: {"issue_key": f"BENCH-{n % 500 + 1}"},
+    "jira_search": lambda n: {"jql": "project = BENCH AND status != Done", "limit": 10},
+    "jira_get_project_issues": lambda n: {"project_key": "BENCH", "limit": 10},
+    "jira_get_transitions": lambda n: {"issue_key": f"BENCH-{n % 500 + 1}"},
+}
+
+WORDS = (
+    "the issue is in progress and assigned to the platform team, with two "
+    "linked bugs and a comment asking for a review before the sprint ends "
+).split()
+
+
+def _usage(prompt_tokens: int, output_tokens: int):
+    return types.GenerateContentResponseUsageMetadata(
+        prompt_token_count=prompt_tokens,
+        candidates_token_count=output_tokens,
+        total_token_count=prompt_tokens + output_tokens,
+    )
+
+
+def _declared(config) -> list:
+    """Names of the functions ``config`` declares; empty when they are cached."""
+    return [
+        declaration.name
+        for tool in (getattr(config, "tools", None) or [])
+        for declaration in (tool.function_declarations or [])
+    ]
+
+
+def _answered(contents) -> bool:
+    """Whether the last message carries tool results rather than the user's text."""
+    if not isinstance(contents, list) or not contents:
+        return False
+    parts = getattr(contents[-1], "parts", None) or []
+    return any(part.function_response is not None for part in parts)
+
+
+class FakeModels:
+    def __init__(self, fake: "FakeGenaiClient"):
+        self.fake = fake
+
+    async def generate_content_stream(self, model: str, contents, config=None):
+        return self.fake.stream(contents, config)
+
+    async def generate_content(self, model: str, contents, config=None):
+        await asyncio.sleep(self.fake.ttft)
+        self.fake.metrics["calls"] += 1
+        return types.GenerateContentResponse(
+            candidates=[
+                types.Candidate(
+                    content=types.Content(
+                        role="model",
+                        parts=[types.Part.from_text(text=self.fake.words(40))],
+                    ),
+                    finish_reason=types.FinishReason.STOP,
+                )
+            ],
+            usage_metadata=_usage(500, 60),
+        )
+
+
+class FakeCaches:
+    def __init__(self):
+        self._names = itertools.count(1)
+
+    async def create(self, model: str, config=None):
+        return SimpleNamespace(name=f"cachedContents/bench-{next(self._names)}")
+
+    async def update(self, name: str, config=None):
+        return SimpleNamespace(name=name)
+
+    async def delete(self, name: str, config=None):
+        return None
+
+
+class FakeGenaiClient:
+    def __init__(
+        self,
+        ttft: float = 0.3,
+        chunk_rate: float = 50.0,
+        chunks: int = 20,
+        chunk_chars: int = 40,
+        tool_call_rate: float = 0.5,
+        seed: Optional[int] = None,
+    ):
+        self.ttft = ttft
+        self.chunk_interval = 1.0 / chunk_rate if chunk_rate > 0 else 0.0
+        self.chunks = chunks
+        self.chunk_chars = chunk_chars
+        self.tool_call_rate = tool_call_rate
+        self.random = random.Random(seed)
+        self.aio = SimpleNamespace(models=FakeModels(self), caches=FakeCaches())
+        self.metrics = {"streams": 0, "calls": 0, "function_calls": 0, "chunks": 0}
+
+    def words(self, chars: int) -> str:
+        text = ""
+        while len(text) < chars:
+            text += self.random.choice(WORDS) + " "
+        return text[:chars]
+
+    def _function_call(self, config) -> Optional[types.Part]:
+        declared = _declared(config)
+        names = [name for name in TOOL_CALLS if not declared or name in declared]
+        if not names or self.random.random() >= self.tool_call_rate:
+            return None
+        name = self.random.choice(names)
+        self.metrics["function_calls"] += 1
+        return types.Part.from_function_call(
+            name=name, args=TOOL_CALLS[name](self.random.randrange(10_000))
+        )
+
+    def _chunk(self, part: types.Part, last: bool, output_tokens: int):
+        return types.GenerateContentResponse(
+            candidates=[
+                types.Candidate(
+                    content=types.Content(role="model", parts=[part]),
+                    finish_reason=types.FinishReason.STOP if last else None,
+                )
+            ],
+            usage_metadata=_usage(2000, output_tokens) if last else None,
+        )
+
+    async def stream(self, contents, config):
+        self.metrics["streams"] += 1
+        await asyncio.sleep(self.ttft)
+        call = None if _answered(contents) else self._function_call(config)
+        if call is not None:
+            yield self._chunk(call, True, 20)
+            return
+        for i in range(self.chunks):
+            if i:
+                await asyncio.sleep(self.chunk_interval)
+            self.metrics["chunks"] += 1
+            last = i == self.chunks - 1
+            yield self._chunk(
+                types.Part.from_text(text=self.words(self.chunk_chars)),
+                last,
+                self.chunks * self.chunk_chars // 4,
+            )
+
+
+def install(server, fake: FakeGenaiClient):
+    """Point an imported ``server`` module at ``fake`` instead of Gemini.
+
+    Every Gemini call already goes through ``server.client`` and the context
+    cache's own reference to it, so both are replaced. The scheduler's rate
+    limits are lifted, since there is no real quota to protect.
+    """
+    server.client = fake
+    server.context_cache.client = fake
+    server.scheduler.limits.clear()
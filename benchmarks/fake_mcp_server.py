@@ -0,0 +1,193 @@
+"""A local Jira MCP server with canned results, on the streamable HTTP transport.
+
+Lists every tool declared in ``tools.py`` with the same parameters and
+answers every call with a canned result of the right shape: issues for the
+issue and search tools, boards and sprints for the agile tools, and a
+success object for anything that writes. Each call waits ``--latency-ms``
+first, standing in for the round trip to Jira.
+
+It also serves the two Atlassian identity routes the server resolves an
+access token with, so logins and user profiles stay local as well.
+
+Run from the repository root:
+``python benchmarks/fake_mcp_server.py --port 9100``, then point the server
+at ``MCP_SERVER_URL=http://127.0.0.1:9100/mcp``.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+
+import mcp.types as mcp_types
+import uvicorn
+from mcp.server.lowlevel import Server
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from tools import tools  # noqa: E402
+
+CLOUD_ID = "bench-cloud"
+
+STATUSES = ["To Do", "In Progress", "In Review", "Done"]
+
+
+def json_schema(schema) -> dict:
+    """JSON Schema of a ``google.genai`` ``Schema``."""
+    if schema is None:
+        return {"type": "object", "properties": {}}
+    result = {"type": schema.type.value.lower()} if schema.type else {}
+    if schema.properties:
+        result["properties"] = {
+            name: json_schema(value) for name, value in schema.properties.items()
+        }
+    if schema.items:
+        result["items"] = json_schema(schema.items)
+    if schema.required:
+        result["required"] = list(schema.required)
+    return result
+
+
+def issue(n: int) -> dict:
+    return {
+        "id": str(10_000 + n),
+        "key": f"BENCH-{n}",
+        "summary": f"Benchmark issue {n}",
+        "description": "Canned issue served by the fake MCP server.",
+        "status": {"name": STATUSES[n % len(STATUSES)]},
+        "issue_type": {"name": "Bug" if n % 3 == 0 else "Task"},
+        "priority": {"name": "Medium"},
+        "assignee": {"display_name": f"User {n % 7}"},
+        "created": "2026-01-01T09:00:00.000+0000",
+        "updated": "2026-01-02T09:00:00.000+0000",
+    }
+
+
+def issue_number(arguments: dict) -> int:
+    key = str(arguments.get("issue_key") or "BENCH-1")
+    digits = key.rpartition("-")[2]
+    return int(digits) if digits.isdigit() else 1
+
+
+def canned_result(name: str, arguments: dict):
+    limit = min(int(arguments.get("limit") or 10), 50)
+    if name == "jira_get_issue":
+        return issue(issue_number(arguments))
+    if name in (
+        "jira_search",
+        "jira_get_project_issues",
+        "jira_get_board_issues",
+        "jira_get_sprint_issues",
+    ):
+        return {
+            "total": 500,
+            "start_at": int(arguments.get("start_at") or 0),
+            "max_results": limit,
+            "issues": [issue(n) for n in range(1, limit + 1)],
+        }
+    if name == "jira_get_user_profile":
+        return {
+            "accountId": "bench-user",
+            "displayName": "Bench User",
+            "emailAddress": "bench@example.com",
+        }
+    if name == "jira_get_transitions":
+        return [{"id": str(i), "name": status} for i, status in enumerate(STATUSES)]
+    if name == "jira_get_worklog":
+        return {"worklogs": [{"timeSpent": "1h", "author": "Bench User"}]}
+    if name == "jira_search_fields":
+        return [
+            {"id": "summary", "name": "Summary"},
+            {"id": "status", "name": "Status"},
+        ]
+    if name == "jira_get_agile_boards":
+        return [{"id": 1, "name": "BENCH board", "type": "scrum"}]
+    if name == "jira_get_sprints_from_board":
+        return [{"id": 1, "name": "Sprint 1", "state": "active"}]
+    if name == "jira_get_link_types":
+        return [{"id": "1", "name": "Blocks"}, {"id": "2", "name": "Relates"}]
+    if name == "jira_batch_get_changelogs":
+        return [{"issue_key": "BENCH-1", "changelogs": []}]
+    return {"success": True, "tool": name}
+
+
+def mcp_server(latency: float) -> Server:
+    server = Server("fake-jira")
+    declarations = [
+        declaration for tool in tools for declaration in tool.function_declarations
+    ]
+    listed = [
+        mcp_types.Tool(
+            name=declaration.name,
+            description=(declaration.description or "").strip().splitlines()[0],
+            inputSchema=json_schema(declaration.parameters),
+        )
+        for declaration in declarations
+    ]
+
+    @server.list_tools()
+    async def list_tools():
+        return listed
+
+    @server.call_tool(validate_input=False)
+    async def call_tool(name: str, arguments: dict):
+        if latency:
+            await asyncio.sleep(latency)
+        text = json.dumps(canned_result(name, arguments or {}))
+        return [mcp_types.TextContent(type="text", text=text)]
+
+    return server
+
+
+async def accessible_resources(request):
+    return JSONResponse([{"id": CLOUD_ID, "name": "bench", "url": "https://bench"}])
+
+
+async def myself(request):
+    token = request.headers.get("authorization", "").removeprefix("Bearer ")
+    return JSONResponse(
+        {
+            "accountId": f"acct-{token}",
+            "displayName": f"Bench {token}",
+            "emailAddress": f"{token}@example.com",
+        }
+    )
+
+
+def app(latency: float) -> Starlette:
+    sessions = StreamableHTTPSessionManager(app=mcp_server(latency), max_sessions=None)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        async with sessions.run():
+            yield
+
+    return Starlette(
+        routes=[
+            Mount("/mcp", app=sessions.handle_request),
+            Route("/oauth/token/accessible-resources", accessible_resources),
+            Route("/ex/jira/{cloud_id}/rest/api/3/myself", myself),
+        ],
+        lifespan=lifespan,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    uvicorn.run(
+        app(args.latency_ms / 1000),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+        backlog=4096,
+    )
@@ -0,0 +1,238 @@
+"""Token-efficient encoding of Jira MCP tool results for the model.
+
+Search, board and sprint results repeat the same JSON keys for every issue
+and carry avatars, URLs and full descriptions the model rarely needs.
+``compact`` projects them to the columns the user's message asks about and
+encodes issue lists and changelogs as pipe separated tables with a single
+header row. Other payloads are projected generically: UI-only keys and empty
+values are dropped, nested users and statuses collapse to their name, and
+long lists and strings are cut with a marker saying how much was left out.
+"""
+
+import json
+import re
+from typing import Callable, Dict, List, Optional
+
+# Keys that only matter to a UI and cost tokens for nothing
+DROPPED_KEYS = {
+    "avatar_url",
+    "avatarUrls",
+    "icon_url",
+    "iconUrl",
+    "self",
+    "expand",
+    "color",
+    "url",
+}
+
+DEFAULT_ISSUE_COLUMNS = [
+    "key",
+    "summary",
+    "status",
+    "type",
+    "priority",
+    "assignee",
+    "updated",
+]
+
+# Extra issue columns, included when the message mentions one of the words
+OPTIONAL_ISSUE_COLUMNS = {
+    "description": ("description", "describe", "details", "about", "why"),
+    "labels": ("label", "tagged"),
+    "components": ("component",),
+    "reporter": ("reporter", "reported", "raised"),
+    "created": ("created", "opened", "new", "oldest", "age"),
+    "due": ("due", "deadline", "overdue"),
+    "parent": ("parent", "epic", "subtask", "sub-task"),
+    "resolution": ("resolution", "resolved"),
+    "fix_versions": ("version", "release"),
+}
+
+
+def truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} chars cut]"
+
+
+def _name(value):
+    if isinstance(value, dict):
+        for key in ("display_name", "displayName", "name", "value", "key"):
+            if value.get(key):
+                return value[key]
+        return None
+    if isinstance(value, list):
+        names = [str(_name(item)) for item in value if _name(item)]
+        return ", ".join(names) or None
+    return value
+
+
+def _date(value):
+    return value[:10] if isinstance(value, str) and len(value) >= 10 else value
+
+
+def _dicts(value) -> List[dict]:
+    """The dict items of ``value`` if it is a list; nested payloads vary."""
+    if not isinstance(value, list):
+        return []
+    return [item for item in value if isinstance(item, dict)]
+
+
+def _all_dicts(value) -> bool:
+    return isinstance(value, list) and all(isinstance(item, dict) for item in value)
+
+
+ISSUE_FIELDS: Dict[str, Callable[[dict], object]] = {
+    "key": lambda issue: issue.get("key") or issue.get("id"),
+    "summary": lambda issue: issue.get("summary"),
+    "status": lambda issue: _name(issue.get("status")),
+    "type": lambda issue: _name(issue.get("issue_type") or issue.get("issuetype")),
+    "priority": lambda issue: _name(issue.get("priority")),
+    "assignee": lambda issue: _name(issue.get("assignee")),
+    "updated": lambda issue: _date(issue.get("updated")),
+    "description": lambda issue: issue.get("description"),
+    "labels": lambda issue: _name(issue.get("labels")),
+    "components": lambda issue: _name(issue.get("components")),
+    "reporter": lambda issue: _name(issue.get("reporter")),
+    "created": lambda issue: _date(issue.get("created")),
+    "due": lambda issue: _date(issue.get("duedate") or issue.get("due_date")),
+    "parent": lambda issue: _name(issue.get("parent")) or issue.get("epic_key"),
+    "resolution": lambda issue: _name(issue.get("resolution")),
+    "fix_versions": lambda issue: _name(issue.get("fix_versions")),
+}
+
+
+def issue_columns(query: Optional[str] = None) -> List[str]:
+    """Issue columns worth sending to the model for ``query``."""
+    columns = list(DEFAULT_ISSUE_COLUMNS)
+    words = set(re.findall(r"[a-z][a-z-]+", (query or "").lower()))
+    for column, triggers in OPTIONAL_ISSUE_COLUMNS.items():
+        if any(word.startswith(trigger) for word in words for trigger in triggers):
+            columns.append(column)
+    return columns
+
+
+def _cell(value, max_chars: int) -> str:
+    if value is None or value == "":
+        return ""
+    text = " ".join(str(value).split()).replace("|", "/")
+    return truncate(text, max_chars)
+
+
+def encode_table(headers: List[str], rows: List[List], max_chars: int) -> str:
+    """Pipe separated table; columns that are empty in every row are dropped."""
+    cells = [[_cell(value, max_chars) for value in row] for row in rows]
+    keep = [i for i in range(len(headers)) if any(row[i] for row in cells)]
+    lines = ["|".join(headers[i] for i in keep)]
+    lines.extend("|".join(row[i] for i in keep) for row in cells)
+    return "\n".join(lines)
+
+
+def encode_issue_list(
+    data: dict, query: Optional[str], max_items: int, max_chars: int
+) -> str:
+    issues = data.get("issues") or []
+    if not issues:
+        return "issues: none found"
+    columns = issue_columns(query)
+    shown = issues[:max_items]
+    start_at = data.get("start_at")
+    first = (start_at if isinstance(start_at, int) else 0) + 1
+    header = f"issues {first}-{first + len(shown) - 1}"
+    if data.get("total") is not None:
+        header += f" of {data['total']}"
+    if len(issues) > len(shown):
+        header += f" ({len(issues) - len(shown)} more fetched, not shown)"
+    # Cells share the string budget so a wide row stays about one line long
+    cell_chars = max(max_chars // 4, 40)
+    rows = [[ISSUE_FIELDS[c](issue) for c in columns] for issue in shown]
+    return f"{header}\n{encode_table(columns, rows, cell_chars)}"
+
+
+def encode_changelogs(entries: List[dict], max_items: int, max_chars: int) -> str:
+    blocks = []
+    for entry in entries[:max_items]:
+        issue = entry.get("issue_id") or entry.get("issue_key") or "-"
+        rows = []
+        for changelog in _dicts(entry.get("changelogs")):
+            when = _date(changelog.get("created"))
+            author = _name(changelog.get("author"))
+            for item in _dicts(changelog.get("items")):
+                rows.append(
+                    [
+                        when,
+                        author,
+                        item.get("field"),
+                        item.get("from_string") or item.get("fromString"),
+                        item.get("to_string") or item.get("toString"),
+                    ]
+                )
+        if not rows:
+            blocks.append(f"{issue}: no changes")
+            continue
+        cut = len(rows) - max_items
+        table = encode_table(
+            ["when", "author", "field", "from", "to"],
+            rows[-max_items:],
+            max(max_chars // 4, 40),
+        )
+        note = f" ({cut} older changes not shown)" if cut > 0 else ""
+        blocks.append(f"{issue} changes{note}\n{table}")
+    if len(entries) > max_items:
+        blocks.append(f"... {len(entries) - max_items} more issues not shown")
+    return "\n\n".join(blocks) or "changelogs: none found"
+
+
+def project(value, max_items: int, max_chars: int, nested: bool = False):
+    """Generic projection of any JSON value; see the module docstring."""
+    if isinstance(value, dict):
+        # Nested users, statuses and types collapse to their display name
+        if nested and len(value) > 1:
+            if "display_name" in value or "displayName" in value:
+                return value.get("display_name") or value.get("displayName")
+            if "name" in value and "id" not in value:
+                return value["name"]
+        return {
+            key: project(item, max_items, max_chars, nested=True)
+            for key, item in value.items()
+            if key not in DROPPED_KEYS and item not in (None, "", [], {})
+        }
+    if isinstance(value, list):
+        projected = [
+            project(item, max_items, max_chars, nested=nested)
+            for item in value[:max_items]
+        ]
+        if len(value) > max_items:
+            projected.append(f"... {len(value) - max_items} more not shown")
+        return projected
+    if isinstance(value, str):
+        return truncate(value, max_chars)
+    return value
+
+
+def compact(
+    tool_name: str,
+    text: str,
+    query: Optional[str] = None,
+    max_items: int = 50,
+    max_chars: int = 500,
+) -> str:
+    """Compact text form of a tool result for a model prompt.
+
+    ``query`` is the user's message and decides which optional issue columns
+    are kept. Text that is not JSON is only truncated, and payloads whose
+    items are not objects get the generic projection.
+    """
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return truncate(str(text), max_chars * 8)
+    if isinstance(data, dict) and _all_dicts(data.get("issues")):
+        return encode_issue_list(data, query, max_items, max_chars)
+    if tool_name == "jira_batch_get_changelogs" and _all_dicts(data):
+        return encode_changelogs(data, max_items, max_chars)
+    return json.dumps(
+        project(data, max_items, max_chars),
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
@@ -0,0 +1,140 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+from google.genai import errors as genai_errors
+from google.genai import types
+
+from log import get_logger
+
+logger = get_logger(__name__)
+
+
+def is_cache_error(exc: BaseException) -> bool:
+    """Whether a request failed because of its cached content, not the request.
+
+    Expired, deleted or foreign caches are rejected as client errors that
+    name the cached content; quota and server errors would fail inline too.
+    """
+    return (
+        isinstance(exc, genai_errors.ClientError)
+        and exc.code in (400, 403, 404)
+        and "cache" in str(exc).lower()
+    )
+
+
+class _CacheEntry:
+    __slots__ = ("name", "expires_at")
+
+    def __init__(self, name: str, expires_at: float):
+        self.name = name
+        self.expires_at = expires_at
+
+
+class ContextCache:
+    """Gemini cached-content handles for the static system prompt and tools.
+
+    One cache is created per model and shared by every connection. It is
+    extended shortly before its TTL runs out and recreated if that fails.
+    When a model rejects caching (unsupported model, prefix too small, quota)
+    the model is skipped for ``retry_after`` seconds and callers fall back to
+    sending the prefix inline.
+    """
+
+    def __init__(
+        self,
+        client,
+        system_instruction: str,
+        tools: list,
+        ttl_seconds: int = 3600,
+        refresh_margin: int = 300,
+        retry_after: int = 600,
+    ):
+        self.client = client
+        self.system_instruction = system_instruction
+        self.tools = tools
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self._entries: Dict[str, _CacheEntry] = {}
+        self._disabled_until: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.metrics = {
+            "lookups": 0,
+            "hits": 0,
+            "creates": 0,
+            "refreshes": 0,
+            "failures": 0,
+            "invalidations": 0,
+        }
+
+    async def _create(self, model: str) -> _CacheEntry:
+        cache = await self.client.aio.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                display_name=f"jira-chat-{model}",
+                system_instruction=self.system_instruction,
+                tools=self.tools,
+                ttl=f"{self.ttl_seconds}s",
+            ),
+        )
+        self.metrics["creates"] += 1
+        return _CacheEntry(cache.name, time.monotonic() + self.ttl_seconds)
+
+    async def _refresh(self, entry: _CacheEntry) -> _CacheEntry:
+        await self.client.aio.caches.update(
+            name=entry.name,
+            config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s"),
+        )
+        self.metrics["refreshes"] += 1
+        return _CacheEntry(entry.name, time.monotonic() + self.ttl_seconds)
+
+    async def get(self, model: str) -> Optional[str]:
+        """Return the cache name for ``model``, or ``None`` to send inline."""
+        self.metrics["lookups"] += 1
+        if self._disabled_until.get(model, 0) > time.monotonic():
+            return None
+        entry = self._entries.get(model)
+        if entry and entry.expires_at - time.monotonic() > self.refresh_margin:
+            self.metrics["hits"] += 1
+            return entry.name
+        lock = self._locks.setdefault(model, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(model)
+            now = time.monotonic()
+            if entry and entry.expires_at - now > self.refresh_margin:
+                self.metrics["hits"] += 1
+                return entry.name
+            try:
+                if entry and entry.expires_at > now:
+                    try:
+                        entry = await self._refresh(entry)
+                    except Exception as e:
+                        logger.warning(f"Context cache refresh failed for {model}: {e}")
+                        entry = await self._create(model)
+                else:
+                    entry = await self._create(model)
+            except Exception as e:
+                logger.warning(f"Context caching unavailable for {model}: {e}")
+                self.metrics["failures"] += 1
+                self._entries.pop(model, None)
+                self._disabled_until[model] = now + self.retry_after
+                return None
+            self._entries[model] = entry
+            return entry.name
+
+    def invalidate(self, model: str):
+        """Forget the cache for ``model`` after the API rejected it."""
+        if self._entries.pop(model, None) is not None:
+            self.metrics["invalidations"] += 1
+
+    async def close(self):
+        for model, entry in list(self._entries.items()):
+            try:
+                await self.client.aio.caches.delete(name=entry.name)
+            except Exception as e:
+                logger.warning(f"Failed to delete context cache for {model}: {e}")
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {**self.metrics, "cached_models": sorted(self._entries)}
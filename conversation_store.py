@@ -0,0 +1,149 @@
+"""Chat histories kept outside the worker process, resumable by token.
+
+A conversation is saved after every turn as zlib-compressed JSON of
+``ConversationHistory.state()`` and found again by its resume token, which
+the client gets when it connects and sends back on reconnect. Tokens are
+random and checked against the user that created them, so any worker can
+pick a conversation up and no sticky sessions are needed.
+
+``SQLiteConversationStore`` keeps conversations in a WAL-mode SQLite file
+that every worker on a host can share. Workers on several hosts need a
+networked backend implementing ``ConversationStore``.
+"""
+
+import abc
+import asyncio
+import json
+import secrets
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from log import get_logger
+
+logger = get_logger(__name__)
+
+
+def new_token() -> str:
+    return secrets.token_urlsafe(24)
+
+
+def encode_state(state: dict) -> bytes:
+    return zlib.compress(json.dumps(state, separators=(",", ":")).encode(), 6)
+
+
+def decode_state(data: bytes) -> dict:
+    return json.loads(zlib.decompress(data))
+
+
+class ConversationStore(abc.ABC):
+    """Interface of the conversation stores."""
+
+    @abc.abstractmethod
+    async def load(self, token: str, owner: str) -> Optional[dict]:
+        """Saved state of ``token`` if ``owner`` created it and it has not expired."""
+
+    @abc.abstractmethod
+    async def save(self, token: str, owner: str, state: dict): ...
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    token TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    state BLOB NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated_at);
+"""
+
+
+class SQLiteConversationStore(ConversationStore):
+    """Conversations in a SQLite file shared by the workers of one host.
+
+    Conversations untouched for ``ttl`` seconds are no longer loaded and are
+    deleted a few at a time as others are saved.
+    """
+
+    def __init__(self, path: str, ttl: float = 7 * 86400.0, busy_timeout: float = 5.0):
+        self.ttl = ttl
+        # One thread owns the connection, which also serializes every query
+        self._thread = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="conversations"
+        )
+        # Other workers write to the same file; wait for their locks
+        self._db = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self.metrics = {
+            "loads": 0,
+            "resumed": 0,
+            "misses": 0,
+            "saves": 0,
+            "save_failures": 0,
+            "bytes_saved": 0,
+        }
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._thread, lambda: fn(*args)
+        )
+
+    def _select(self, token: str):
+        return self._db.execute(
+            "SELECT owner, state FROM conversations "
+            "WHERE token = ? AND updated_at > ?",
+            (token, time.time() - self.ttl),
+        ).fetchone()
+
+    def _upsert(self, token: str, owner: str, state: dict) -> int:
+        data = encode_state(state)
+        now = time.time()
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO conversations VALUES (?, ?, ?, ?)",
+                (token, owner, data, now),
+            )
+            # Expired rows go a few at a time instead of in a sweep
+            self._db.execute(
+                "DELETE FROM conversations WHERE rowid IN (SELECT rowid FROM "
+                "conversations WHERE updated_at <= ? LIMIT 16)",
+                (now - self.ttl,),
+            )
+        return len(data)
+
+    async def load(self, token: str, owner: str) -> Optional[dict]:
+        self.metrics["loads"] += 1
+        row = await self._run(self._select, token)
+        if row is None or row[0] != owner:
+            self.metrics["misses"] += 1
+            return None
+        state = await self._run(decode_state, row[1])
+        self.metrics["resumed"] += 1
+        return state
+
+    async def save(self, token: str, owner: str, state: dict):
+        try:
+            size = await self._run(self._upsert, token, owner, state)
+        except Exception as e:
+            self.metrics["save_failures"] += 1
+            logger.warning(f"Saving conversation failed: {e}")
+            return
+        self.metrics["saves"] += 1
+        self.metrics["bytes_saved"] += size
+
+    async def close(self):
+        await self._run(self._db.close)
+        self._thread.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return dict(self.metrics)
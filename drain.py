@@ -0,0 +1,145 @@
+"""Graceful draining of WebSocket connections before a worker exits.
+
+On SIGTERM the worker stops taking new conversations: readiness turns
+unhealthy, new sockets and new messages get a ``reconnect`` event instead
+of a turn, and turns already running get up to ``deadline`` seconds to
+finish. Turns still running then are cancelled, which ends and saves them
+like a user's stop. Every socket then gets a ``reconnect`` event and is
+closed with code 1012 (service restart), so the client reconnects, to
+another worker if need be, and resumes its conversation. Only after that
+is the server asked to exit.
+"""
+
+import asyncio
+import signal
+import threading
+import time
+from typing import Optional, Set
+
+import uvicorn
+
+from log import get_logger
+
+logger = get_logger(__name__)
+
+# WebSocket close code for "server restarting, try again"
+SERVICE_RESTART = 1012
+
+
+class Connection:
+    """One chat socket and the turn it is running, if any."""
+
+    __slots__ = ("writer", "websocket", "turn")
+
+    def __init__(self, writer, websocket):
+        self.writer = writer
+        self.websocket = websocket
+        self.turn: Optional[asyncio.Task] = None
+
+    @property
+    def busy(self) -> bool:
+        return self.turn is not None and not self.turn.done()
+
+
+class Drainer:
+    def __init__(self, deadline: float = 25.0, retry_after: float = 1.0):
+        self.deadline = deadline
+        self.retry_after = retry_after
+        self.draining = False
+        self.connections: Set[Connection] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.metrics = {
+            "drains": 0,
+            "turns_finished": 0,
+            "turns_cancelled": 0,
+            "sockets_closed": 0,
+            "refused": 0,
+        }
+
+    def open(self, writer, websocket) -> Connection:
+        connection = Connection(writer, websocket)
+        self.connections.add(connection)
+        return connection
+
+    def close(self, connection: Connection):
+        self.connections.discard(connection)
+
+    async def refuse(self, writer, websocket, resend: Optional[str] = None):
+        """Send a socket away to reconnect elsewhere, with a message to resend."""
+        self.metrics["refused"] += 1
+        await self._send_away(writer, websocket, resend)
+
+    async def _send_away(self, writer, websocket, resend: Optional[str] = None):
+        fields = {"resend": resend} if resend else {}
+        try:
+            await writer.event("reconnect", retry_after=self.retry_after, **fields)
+            await writer.flush()
+            await websocket.close(code=SERVICE_RESTART)
+        except Exception as e:
+            # Already gone
+            logger.debug(f"Could not send a socket away: {e}")
+
+    async def drain(self):
+        """Let running turns finish, then send every socket away."""
+        self.draining = True
+        self.metrics["drains"] += 1
+        started = time.monotonic()
+        turns = {c.turn for c in self.connections if c.busy}
+        logger.info(
+            f"Draining {len(self.connections)} sockets, {len(turns)} turns running"
+        )
+        if turns:
+            done, pending = await asyncio.wait(turns, timeout=self.deadline)
+            self.metrics["turns_finished"] += len(done)
+            self.metrics["turns_cancelled"] += len(pending)
+            for turn in pending:
+                turn.cancel()
+            if pending:
+                # Cancelled turns still send their end event and save
+                await asyncio.wait(pending, timeout=5)
+        connections = list(self.connections)
+        await asyncio.gather(
+            *(self._send_away(c.writer, c.websocket) for c in connections)
+        )
+        self.metrics["sockets_closed"] += len(connections)
+        logger.info(f"Drained in {time.monotonic() - started:.1f}s")
+
+    def install(self, loop: asyncio.AbstractEventLoop):
+        """Drain on SIGTERM before uvicorn starts its own shutdown.
+
+        uvicorn hands SIGTERM to ``Server.handle_exit``, which closes every
+        socket at once; the server's handler is wrapped so the drain runs
+        first and then the server is told to exit. A second SIGTERM skips
+        whatever is left of the drain. When no uvicorn server handles the
+        signal, shutdown goes ahead undrained rather than not at all.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            # Signal handlers can only be set from the main thread
+            return
+        handle_exit = signal.getsignal(signal.SIGTERM)
+        server = getattr(handle_exit, "__self__", None)
+        if not isinstance(server, uvicorn.Server):
+            logger.warning("SIGTERM is not handled by uvicorn, not draining on exit")
+            return
+
+        def start(signum, frame):
+            if self._task is not None:
+                logger.warning("Second SIGTERM, exiting without finishing the drain")
+                handle_exit(signum, frame)
+                return
+            self._task = loop.create_task(self.drain())
+            self._task.add_done_callback(lambda _: handle_exit(signum, frame))
+
+        def drain_then_exit(signum, frame):
+            loop.call_soon_threadsafe(start, signum, frame)
+
+        server.handle_exit = drain_then_exit
+        signal.signal(signal.SIGTERM, drain_then_exit)
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "draining": self.draining,
+            "connections": len(self.connections),
+            "busy": sum(1 for c in self.connections if c.busy),
+        }
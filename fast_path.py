@@ -0,0 +1,145 @@
+"""Rule based handling of mechanical Jira lookups without a model call.
+
+Messages such as "open PROJ-123" or "transitions for PROJ-9" map directly to
+one tool call. ``FastPath.match`` recognises them with anchored patterns so
+anything with more to it than the lookup itself still goes to the model.
+"""
+
+import re
+from typing import Callable, List, Optional, Tuple
+
+ISSUE_KEY = r"(?P<key>[a-z][a-z0-9]+-\d+)"
+# Project keys must be typed in capitals so "issues for me" is not a project
+PROJECT_KEY = r"(?P<project>(?-i:[A-Z][A-Z0-9]+))"
+BOARD_ID = r"board\s*#?\s*(?P<board>\d+)"
+LEAD = r"(?:(?:please|can you|could you)\s+)?(?:(?:show|list|get|give|open|view|display|fetch|find)\s+(?:me\s+)?)?"
+THE = r"(?:(?:the|all|all the|available)\s+)?"
+
+Intent = Tuple[str, dict]
+
+# (name, pattern, builder of tool name and arguments from the match)
+RULES: List[Tuple[str, str, Callable[[re.Match], Intent]]] = [
+    (
+        "issue",
+        rf"{LEAD}(?:what(?:'s| is)\s+)?(?:issue\s+|ticket\s+)?{ISSUE_KEY}",
+        lambda m: ("jira_get_issue", {"issue_key": m["key"].upper()}),
+    ),
+    (
+        "transitions",
+        rf"{LEAD}{THE}transitions\s+(?:for|of|on)\s+{ISSUE_KEY}",
+        lambda m: ("jira_get_transitions", {"issue_key": m["key"].upper()}),
+    ),
+    (
+        "worklog",
+        rf"{LEAD}{THE}(?:work\s*logs?|time\s+logged)\s+(?:for|of|on)\s+{ISSUE_KEY}",
+        lambda m: ("jira_get_worklog", {"issue_key": m["key"].upper()}),
+    ),
+    (
+        "current_sprint",
+        rf"{LEAD}(?:what(?:'s| is)\s+)?(?:in\s+)?{THE}(?:current|active|open)\s+sprint\s+(?:on|for|of|in)\s+{BOARD_ID}",
+        lambda m: (
+            "jira_get_board_issues",
+            {"board_id": m["board"], "jql": "sprint in openSprints()"},
+        ),
+    ),
+    (
+        "sprints",
+        rf"{LEAD}{THE}sprints\s+(?:on|for|of|in)\s+{BOARD_ID}",
+        lambda m: ("jira_get_sprints_from_board", {"board_id": m["board"]}),
+    ),
+    (
+        "boards",
+        rf"{LEAD}{THE}(?:(?P<type>scrum|kanban)\s+)?boards(?:\s+(?:for|in|of)\s+(?:project\s+)?{PROJECT_KEY})?",
+        lambda m: (
+            "jira_get_agile_boards",
+            {
+                k: v
+                for k, v in (
+                    ("board_type", m["type"] and m["type"].lower()),
+                    ("project_key", m["project"]),
+                )
+                if v
+            },
+        ),
+    ),
+    (
+        "project_issues",
+        rf"{LEAD}{THE}issues\s+(?:for|in|of)\s+(?:project\s+)?{PROJECT_KEY}",
+        lambda m: ("jira_get_project_issues", {"project_key": m["project"]}),
+    ),
+    (
+        "link_types",
+        rf"{LEAD}{THE}(?:issue\s+)?link\s+types",
+        lambda m: ("jira_get_link_types", {}),
+    ),
+]
+
+COMPILED_RULES = [
+    (name, re.compile(pattern, re.IGNORECASE), build) for name, pattern, build in RULES
+]
+
+
+def normalize(message: str) -> str:
+    return " ".join(message.split()).rstrip("?.! ")
+
+
+class FastPath:
+    """Match trivial lookups and keep hit rate and latency saved counters.
+
+    Latency saved is estimated against a moving average of how long turns
+    that went to the model took, so it only accrues once one has been seen.
+    """
+
+    def __init__(self, enabled: bool = True, smoothing: float = 0.2):
+        self.enabled = enabled
+        self.smoothing = smoothing
+        self.model_turn_seconds: Optional[float] = None
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "fallbacks": 0,
+            "saved_seconds": 0.0,
+        }
+
+    def match(self, message: str) -> Optional[Tuple[str, str, dict]]:
+        """``(intent, tool name, arguments)`` for ``message``, or ``None``."""
+        if self.enabled:
+            text = normalize(message)
+            for name, pattern, build in COMPILED_RULES:
+                match = pattern.fullmatch(text)
+                if match:
+                    tool_name, args = build(match)
+                    return name, tool_name, args
+        self.metrics["misses"] += 1
+        return None
+
+    def record_hit(self, elapsed: float):
+        self.metrics["hits"] += 1
+        if self.model_turn_seconds is not None:
+            self.metrics["saved_seconds"] += max(self.model_turn_seconds - elapsed, 0)
+
+    def record_fallback(self):
+        """A matched lookup whose result still needed the model."""
+        self.metrics["fallbacks"] += 1
+
+    def record_model_turn(self, elapsed: float):
+        if self.model_turn_seconds is None:
+            self.model_turn_seconds = elapsed
+        else:
+            self.model_turn_seconds += self.smoothing * (
+                elapsed - self.model_turn_seconds
+            )
+
+    def stats(self) -> dict:
+        handled = self.metrics["hits"] + self.metrics["misses"]
+        handled += self.metrics["fallbacks"]
+        return {
+            **self.metrics,
+            "saved_seconds": round(self.metrics["saved_seconds"], 3),
+            "hit_rate": round(self.metrics["hits"] / handled, 4) if handled else 0.0,
+            "model_turn_seconds": (
+                round(self.model_turn_seconds, 3)
+                if self.model_turn_seconds is not None
+                else None
+            ),
+        }
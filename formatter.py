@@ -0,0 +1,348 @@
+"""Deterministic markdown rendering of Jira MCP tool results.
+
+``render`` turns the JSON returned by the tools in ``tools.py`` into chat
+friendly markdown without a model round trip. It yields the output one line
+or table row at a time so callers can stream it, and returns ``None`` when
+the payload has a shape it does not recognise so the caller can fall back to
+LLM formatting.
+"""
+
+import json
+from typing import Callable, Dict, Iterator, List, Optional
+
+MAX_CELL_LENGTH = 80
+MAX_DESCRIPTION_LENGTH = 1500
+MAX_COMMENTS = 5
+
+SEARCH_TOOLS = {
+    "jira_search",
+    "jira_search_local",
+    "jira_get_project_issues",
+    "jira_get_board_issues",
+    "jira_get_sprint_issues",
+}
+
+
+def _cell(value, limit: int = MAX_CELL_LENGTH) -> str:
+    if value is None or value == "":
+        return "-"
+    text = str(value).replace("\r", " ").replace("\n", " ").replace("|", "\\|")
+    if len(text) > limit:
+        text = text[: limit - 1] + "…"
+    return text
+
+
+def _name(value) -> Optional[str]:
+    """Display name of a nested Jira object such as a status or a user."""
+    if isinstance(value, dict):
+        for key in ("display_name", "displayName", "name", "value", "key"):
+            if value.get(key):
+                return value[key]
+        return None
+    return value
+
+
+def _date(value) -> Optional[str]:
+    if not isinstance(value, str) or len(value) < 10:
+        return value
+    if len(value) >= 16 and value[10] == "T":
+        return f"{value[:10]} {value[11:16]}"
+    return value[:10]
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit].rstrip()}… _({len(text) - limit} more characters)_"
+
+
+def _issue_link(issue: dict) -> str:
+    key = issue.get("key") or issue.get("id") or "-"
+    url = issue.get("url")
+    return f"[{key}]({url})" if url else str(key)
+
+
+def _table(headers: List[str], rows: Iterator[List]) -> Iterator[str]:
+    yield "| " + " | ".join(headers) + " |\n"
+    yield "|" + "---|" * len(headers) + "\n"
+    for row in rows:
+        yield "| " + " | ".join(_cell(value) for value in row) + " |\n"
+
+
+def _issue_row(issue: dict) -> List:
+    return [
+        _issue_link(issue),
+        issue.get("summary"),
+        _name(issue.get("status")),
+        _name(issue.get("issue_type") or issue.get("issuetype")),
+        _name(issue.get("priority")),
+        _name(issue.get("assignee")) or "Unassigned",
+        _date(issue.get("updated")),
+    ]
+
+
+def render_issue_list(issues: List[dict], total=None, start_at=None) -> Iterator[str]:
+    if not issues:
+        yield "No issues found.\n"
+        return
+    shown = len(issues)
+    if isinstance(total, int) and total > shown:
+        first = (start_at if isinstance(start_at, int) else 0) + 1
+        yield f"**{total} issues found** (showing {first}–{first + shown - 1})\n\n"
+    else:
+        yield f"**{shown} issue{'s' if shown != 1 else ''} found**\n\n"
+    yield from _table(
+        ["Key", "Summary", "Status", "Type", "Priority", "Assignee", "Updated"],
+        (_issue_row(issue) for issue in issues),
+    )
+
+
+def render_issue(issue: dict) -> Iterator[str]:
+    yield f"### {_issue_link(issue)}: {_cell(issue.get('summary'), 200)}\n\n"
+    details = [
+        ("Status", _name(issue.get("status"))),
+        ("Type", _name(issue.get("issue_type") or issue.get("issuetype"))),
+        ("Priority", _name(issue.get("priority"))),
+        ("Assignee", _name(issue.get("assignee")) or "Unassigned"),
+        ("Reporter", _name(issue.get("reporter"))),
+        ("Parent", _name(issue.get("parent"))),
+        ("Epic", issue.get("epic_key") or issue.get("epic_name")),
+        ("Labels", ", ".join(map(str, _items(issue.get("labels")))) or None),
+        ("Created", _date(issue.get("created"))),
+        ("Updated", _date(issue.get("updated"))),
+        ("Due", _date(issue.get("duedate") or issue.get("due_date"))),
+    ]
+    yield from _table(["Field", "Value"], ([k, v] for k, v in details if v))
+    description = issue.get("description")
+    if description:
+        yield "\n**Description**\n\n"
+        yield _truncate(str(description), MAX_DESCRIPTION_LENGTH) + "\n"
+    comments = _dicts(issue.get("comments"))
+    if comments:
+        yield f"\n**Comments** ({len(comments)})\n\n"
+        for comment in comments[-MAX_COMMENTS:]:
+            author = _name(comment.get("author")) or "Unknown"
+            body = _truncate(str(comment.get("body") or ""), 300).replace("\n", " ")
+            created = _date(comment.get("created"))
+            when = f" ({created})" if created else ""
+            yield f"- **{author}**{when}: {body}\n"
+
+
+def render_search(data: dict) -> Iterator[str]:
+    yield from render_issue_list(
+        data.get("issues") or [], data.get("total"), data.get("start_at")
+    )
+
+
+def render_mutation(data: dict) -> Iterator[str]:
+    message = data.get("message") or "Done."
+    yield f"✅ {message}\n\n"
+    if isinstance(data.get("issue"), dict):
+        yield from render_issue(data["issue"])
+
+
+def render_sprints(sprints: List[dict]) -> Iterator[str]:
+    if not sprints:
+        yield "No sprints found.\n"
+        return
+    yield from _table(
+        ["ID", "Name", "State", "Start", "End", "Goal"],
+        (
+            [
+                s.get("id"),
+                s.get("name"),
+                s.get("state"),
+                _date(s.get("start_date") or s.get("startDate")),
+                _date(s.get("end_date") or s.get("endDate")),
+                s.get("goal"),
+            ]
+            for s in sprints
+        ),
+    )
+
+
+def render_boards(boards: List[dict]) -> Iterator[str]:
+    if not boards:
+        yield "No boards found.\n"
+        return
+    yield from _table(
+        ["ID", "Name", "Type"],
+        ([b.get("id"), b.get("name"), b.get("type")] for b in boards),
+    )
+
+
+def render_transitions(transitions: List[dict]) -> Iterator[str]:
+    if not transitions:
+        yield "No transitions available.\n"
+        return
+    yield from _table(
+        ["ID", "Transition", "To Status"],
+        (
+            [t.get("id"), t.get("name"), _name(t.get("to_status") or t.get("to"))]
+            for t in transitions
+        ),
+    )
+
+
+def render_worklogs(data) -> Iterator[str]:
+    worklogs = data.get("worklogs") if isinstance(data, dict) else data
+    if not worklogs:
+        yield "No work logged.\n"
+        return
+    total_seconds = sum(
+        w["timeSpentSeconds"]
+        for w in worklogs
+        if isinstance(w.get("timeSpentSeconds"), (int, float))
+    )
+    yield from _table(
+        ["Author", "Started", "Time Spent", "Comment"],
+        (
+            [
+                _name(w.get("author")),
+                _date(w.get("started")),
+                w.get("timeSpent") or w.get("time_spent"),
+                w.get("comment"),
+            ]
+            for w in worklogs
+        ),
+    )
+    if total_seconds:
+        yield f"\n**Total:** {total_seconds / 3600:g}h\n"
+
+
+def render_changelogs(entries: List[dict]) -> Iterator[str]:
+    if not entries:
+        yield "No changelogs found.\n"
+        return
+    for entry in entries:
+        issue = entry.get("issue_id") or entry.get("issue_key") or "-"
+        yield f"#### {issue}\n\n"
+        changelogs = _dicts(entry.get("changelogs"))
+        if not changelogs:
+            yield "No changes.\n\n"
+            continue
+        yield "| When | Author | Field | From | To |\n"
+        yield "|---|---|---|---|---|\n"
+        for changelog in changelogs:
+            when = _cell(_date(changelog.get("created")))
+            author = _cell(_name(changelog.get("author")))
+            for item in _dicts(changelog.get("items")):
+                yield "| " + " | ".join(
+                    [
+                        when,
+                        author,
+                        _cell(item.get("field")),
+                        _cell(item.get("from_string") or item.get("fromString")),
+                        _cell(item.get("to_string") or item.get("toString")),
+                    ]
+                ) + " |\n"
+        yield "\n"
+
+
+def render_fields(fields: List[dict]) -> Iterator[str]:
+    if not fields:
+        yield "No matching fields.\n"
+        return
+    yield from _table(
+        ["ID", "Name", "Type", "Custom"],
+        (
+            [
+                f.get("id"),
+                f.get("name"),
+                (f.get("schema") or {}).get("type"),
+                "yes" if f.get("custom") else "no",
+            ]
+            for f in fields
+        ),
+    )
+
+
+def render_link_types(link_types: List[dict]) -> Iterator[str]:
+    yield from _table(
+        ["ID", "Name", "Inward", "Outward"],
+        (
+            [t.get("id"), t.get("name"), t.get("inward"), t.get("outward")]
+            for t in link_types
+        ),
+    )
+
+
+def render_user(user: dict) -> Iterator[str]:
+    details = [
+        ("Name", _name(user)),
+        ("Email", user.get("email") or user.get("emailAddress")),
+        ("Account ID", user.get("account_id") or user.get("accountId")),
+        ("Active", user.get("active")),
+        ("Time zone", user.get("time_zone") or user.get("timeZone")),
+    ]
+    yield from _table(["Field", "Value"], ([k, v] for k, v in details if v is not None))
+
+
+def _items(value) -> list:
+    return value if isinstance(value, list) else []
+
+
+def _dicts(value) -> List[dict]:
+    """The dict items of ``value`` if it is a list; nested payloads vary."""
+    return [item for item in _items(value) if isinstance(item, dict)]
+
+
+def _is_issue(data) -> bool:
+    return isinstance(data, dict) and "key" in data and "summary" in data
+
+
+def _list_of(data, *keys) -> bool:
+    return (
+        isinstance(data, list)
+        and all(isinstance(item, dict) for item in data)
+        and (not data or all(key in data[0] for key in keys))
+    )
+
+
+def _renderer_for(tool_name: str, data) -> Optional[Callable[[], Iterator[str]]]:
+    if isinstance(data, dict) and set(data) <= {"error", "success"} and "error" in data:
+        return lambda: iter([f"> **Error:** {data['error']}\n"])
+    if isinstance(data, dict) and _list_of(data.get("issues")):
+        return lambda: render_search(data)
+    if tool_name not in SEARCH_TOOLS:
+        if _is_issue(data):
+            return lambda: render_issue(data)
+        if (
+            isinstance(data, dict)
+            and "message" in data
+            and ("issue" not in data or _is_issue(data["issue"]))
+        ):
+            return lambda: render_mutation(data)
+    shape_renderers: Dict[str, Callable[[], Iterator[str]]] = {
+        "jira_get_sprints_from_board": lambda: render_sprints(data),
+        "jira_get_agile_boards": lambda: render_boards(data),
+        "jira_get_transitions": lambda: render_transitions(data),
+        "jira_batch_get_changelogs": lambda: render_changelogs(data),
+        "jira_search_fields": lambda: render_fields(data),
+        "jira_get_link_types": lambda: render_link_types(data),
+    }
+    if tool_name in shape_renderers and _list_of(data, "id"):
+        return shape_renderers[tool_name]
+    if tool_name == "jira_batch_get_changelogs" and _list_of(data, "changelogs"):
+        return shape_renderers[tool_name]
+    if tool_name == "jira_get_worklog" and (
+        _list_of(data) or isinstance(data, dict) and _list_of(data.get("worklogs"))
+    ):
+        return lambda: render_worklogs(data)
+    if tool_name == "jira_get_user_profile" and isinstance(data, dict):
+        if any(k in data for k in ("display_name", "displayName", "account_id")):
+            return lambda: render_user(data)
+    return None
+
+
+def render(tool_name: str, result_text: str) -> Optional[Iterator[str]]:
+    """Render a tool result as markdown, one row at a time.
+
+    Returns ``None`` if ``result_text`` is not JSON or has an unknown shape.
+    """
+    try:
+        data = json.loads(result_text)
+    except (TypeError, ValueError):
+        return None
+    renderer = _renderer_for(tool_name, data)
+    return renderer() if renderer else None
@@ -0,0 +1,117 @@
+"""Batched, typed WebSocket output for chat turns.
+
+Every frame sent to the client is a JSON array of events such as
+``{"type": "text", "text": "..."}`` or ``{"type": "tool_call_start", ...}``.
+Text deltas and events are buffered and sent together once
+``flush_interval`` has passed since the first of them, or at once when the
+buffered text reaches ``max_batch_chars``. Consecutive text deltas are
+merged into one event. ``end`` and ``error`` events flush immediately.
+"""
+
+import asyncio
+import json
+from typing import List, Optional
+
+# Events that close a turn; nothing follows them that is worth waiting for
+IMMEDIATE_EVENTS = {"end", "error"}
+
+
+class FrameBatcher:
+    """Batching settings and frame counters shared by every connection."""
+
+    def __init__(self, flush_interval: float = 0.02, max_batch_chars: int = 4096):
+        self.flush_interval = flush_interval
+        self.max_batch_chars = max_batch_chars
+        self.metrics = {"frames": 0, "events": 0, "text_deltas": 0, "bytes": 0}
+
+    def writer(self, websocket) -> "FrameWriter":
+        return FrameWriter(websocket, self)
+
+    def stats(self) -> dict:
+        frames = self.metrics["frames"]
+        return {
+            **self.metrics,
+            "deltas_per_frame": (
+                round(self.metrics["text_deltas"] / frames, 2) if frames else 0.0
+            ),
+        }
+
+
+class FrameWriter:
+    """Output side of one WebSocket connection."""
+
+    def __init__(self, websocket, batcher: FrameBatcher):
+        self.websocket = websocket
+        self.batcher = batcher
+        self._events: List[dict] = []
+        self._text: List[str] = []
+        self._text_chars = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock = asyncio.Lock()
+        self._error: Optional[BaseException] = None
+
+    def _check(self):
+        if self._error is not None:
+            # A background flush found the connection gone
+            raise self._error
+
+    def _end_text(self):
+        if self._text:
+            self._events.append({"type": "text", "text": "".join(self._text)})
+            self._text.clear()
+            self._text_chars = 0
+
+    def _schedule(self):
+        if self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.batcher.flush_interval, self._flush_later
+            )
+
+    def _flush_later(self):
+        self._timer = None
+        task = asyncio.create_task(self.flush())
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def text(self, delta: str):
+        """Queue streamed answer text for the client."""
+        self._check()
+        if not delta:
+            return
+        self._text.append(delta)
+        self._text_chars += len(delta)
+        self.batcher.metrics["text_deltas"] += 1
+        if self._text_chars >= self.batcher.max_batch_chars:
+            await self.flush()
+        else:
+            self._schedule()
+
+    async def event(self, event_type: str, **fields):
+        """Queue a control event; ``end`` and ``error`` are sent at once."""
+        self._check()
+        self._end_text()
+        self._events.append({"type": event_type, **fields})
+        if event_type in IMMEDIATE_EVENTS:
+            await self.flush()
+        else:
+            self._schedule()
+
+    async def flush(self):
+        """Send everything buffered as one frame."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            self._end_text()
+            if not self._events:
+                return
+            events, self._events = self._events, []
+            frame = json.dumps(events)
+            metrics = self.batcher.metrics
+            metrics["frames"] += 1
+            metrics["events"] += len(events)
+            metrics["bytes"] += len(frame)
+            try:
+                await self.websocket.send_text(frame)
+            except Exception as e:
+                self._error = e
+                raise
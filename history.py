@@ -0,0 +1,242 @@
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+
+from google.genai import types
+
+from log import get_logger
+
+logger = get_logger(__name__)
+
+# Rough chars-per-token ratio, good enough for budgeting without a tokenizer call
+CHARS_PER_TOKEN = 4
+
+STALE_TOOL_RESULT = {"note": "Earlier tool result dropped to save context."}
+
+CANCELLED_TURN_NOTE = "(The user stopped this answer before it was finished.)"
+
+Summarizer = Callable[[str, str], Awaitable[str]]
+
+
+def estimate_tokens(content: types.Content) -> int:
+    chars = 0
+    for part in content.parts or []:
+        if part.text:
+            chars += len(part.text)
+        elif part.function_call:
+            chars += len(str(part.function_call.args)) + len(part.function_call.name)
+        elif part.function_response:
+            chars += len(str(part.function_response.response))
+    return chars // CHARS_PER_TOKEN + 1
+
+
+def render_transcript(contents: List[types.Content]) -> str:
+    lines = []
+    for content in contents:
+        for part in content.parts or []:
+            if part.text:
+                lines.append(f"{content.role}: {part.text}")
+            elif part.function_call:
+                lines.append(
+                    f"{content.role} called {part.function_call.name}({part.function_call.args})"
+                )
+    return "\n".join(lines)
+
+
+class _Turn:
+    __slots__ = ("contents", "tokens")
+
+    def __init__(self, content: types.Content):
+        self.contents = [content]
+        self.tokens = estimate_tokens(content)
+
+    @classmethod
+    def restore(cls, contents: List[dict]) -> "_Turn":
+        turn = cls(types.Content.model_validate(contents[0]))
+        for content in contents[1:]:
+            turn.add(types.Content.model_validate(content))
+        return turn
+
+    def add(self, content: types.Content):
+        self.contents.append(content)
+        self.tokens += estimate_tokens(content)
+
+    def drop_tool_payloads(self) -> int:
+        """Replace function response bodies with a stub, returning how many."""
+        dropped = 0
+        for content in self.contents:
+            for part in content.parts or []:
+                response = part.function_response
+                if response and response.response != STALE_TOOL_RESULT:
+                    response.response = STALE_TOOL_RESULT
+                    dropped += 1
+        if dropped:
+            self.tokens = sum(estimate_tokens(c) for c in self.contents)
+        return dropped
+
+
+class ConversationHistory:
+    """Token-budgeted chat history for one WebSocket connection.
+
+    The last ``keep_recent_turns`` turns are kept verbatim. Once the estimated
+    size exceeds ``token_budget``, older turns are folded into a running
+    summary by ``summarizer`` in a background task, so compaction never
+    delays the next user message. Tool payloads are dropped from every turn
+    but the latest one. If the history grows past twice the budget while a
+    summary is still pending, or no summarizer is configured, the oldest
+    turns are dropped outright to keep the prompt bounded.
+    """
+
+    def __init__(
+        self,
+        preamble: Optional[types.Content] = None,
+        token_budget: int = 8000,
+        keep_recent_turns: int = 6,
+        summarizer: Optional[Summarizer] = None,
+    ):
+        self.preamble = preamble
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.summarizer = summarizer
+        self.summary = ""
+        self._turns: List[_Turn] = []
+        self._summary_task: Optional[asyncio.Task] = None
+        self._folding = 0
+        self.metrics = {
+            "turns_summarized": 0,
+            "turns_dropped": 0,
+            "tool_payloads_dropped": 0,
+            "compactions": 0,
+            "summary_failures": 0,
+        }
+
+    def add_user_message(self, text: str):
+        """Start a new turn with the user's message."""
+        self._turns.append(
+            _Turn(types.Content(role="user", parts=[types.Part.from_text(text=text)]))
+        )
+
+    def add(self, content: types.Content):
+        """Append a model or tool content to the current turn."""
+        if not self._turns:
+            self._turns.append(_Turn(content))
+        else:
+            self._turns[-1].add(content)
+
+    def cancel_turn(self):
+        """Close the current turn after it was cancelled partway through.
+
+        A trailing model step whose function calls never got a response is
+        dropped, since the model API rejects unanswered calls, and a note
+        records that the answer was cut short.
+        """
+        if not self._turns:
+            return
+        turn = self._turns[-1]
+        last = turn.contents[-1]
+        if last.role == "model" and any(p.function_call for p in last.parts or []):
+            turn.contents.pop()
+            turn.tokens = sum(estimate_tokens(c) for c in turn.contents)
+        turn.add(
+            types.Content(
+                role="model", parts=[types.Part.from_text(text=CANCELLED_TURN_NOTE)]
+            )
+        )
+
+    def state(self) -> dict:
+        """JSON-serializable summary and turns, for ``restore`` in another process."""
+        return {
+            "summary": self.summary,
+            "turns": [
+                [c.model_dump(mode="json", exclude_none=True) for c in turn.contents]
+                for turn in self._turns
+            ],
+        }
+
+    def restore(self, state: dict):
+        """Continue a conversation saved with ``state``."""
+        self.summary = state.get("summary") or ""
+        self._turns = [_Turn.restore(turn) for turn in state.get("turns") or [] if turn]
+
+    def _summary_content(self) -> Optional[types.Content]:
+        if not self.summary:
+            return None
+        return types.Content(
+            role="user",
+            parts=[
+                types.Part.from_text(
+                    text=f"Summary of the earlier conversation:\n{self.summary}"
+                )
+            ],
+        )
+
+    def contents(self) -> List[types.Content]:
+        contents = []
+        if self.preamble is not None:
+            contents.append(self.preamble)
+        summary = self._summary_content()
+        if summary is not None:
+            contents.append(summary)
+        for turn in self._turns:
+            contents.extend(turn.contents)
+        return contents
+
+    @property
+    def summary_tokens(self) -> int:
+        return len(self.summary) // CHARS_PER_TOKEN
+
+    @property
+    def tokens(self) -> int:
+        return self.summary_tokens + sum(turn.tokens for turn in self._turns)
+
+    def compact(self):
+        """Trim the history after a turn, summarizing old turns in the background."""
+        for turn in self._turns[:-1]:
+            self.metrics["tool_payloads_dropped"] += turn.drop_tool_payloads()
+        if self.tokens <= self.token_budget:
+            return
+        # Turns at the front already handed to a pending summary stay put
+        pending = self._folding
+        foldable = len(self._turns) - self.keep_recent_turns - pending
+        if foldable <= 0:
+            return
+        if self.summarizer is None or (pending and self.tokens > 2 * self.token_budget):
+            del self._turns[pending : pending + foldable]
+            self.metrics["turns_dropped"] += foldable
+            return
+        if not pending:
+            self._folding = foldable
+            transcript = render_transcript(
+                [c for turn in self._turns[:foldable] for c in turn.contents]
+            )
+            self._summary_task = asyncio.create_task(
+                self._summarize(foldable, transcript)
+            )
+
+    async def _summarize(self, count: int, transcript: str):
+        try:
+            self.summary = await self.summarizer(self.summary, transcript)
+            self.metrics["turns_summarized"] += count
+            self.metrics["compactions"] += 1
+        except Exception as e:
+            logger.warning(f"History summarization failed: {e}")
+            self.metrics["summary_failures"] += 1
+            self.metrics["turns_dropped"] += count
+        del self._turns[:count]
+        self._folding = 0
+
+    async def close(self):
+        if self._summary_task and not self._summary_task.done():
+            self._summary_task.cancel()
+            try:
+                await self._summary_task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "turns": len(self._turns),
+            "estimated_tokens": self.tokens,
+            "summary_tokens": self.summary_tokens,
+            "token_budget": self.token_budget,
+        }
@@ -0,0 +1,744 @@
+"""Local, incrementally synced mirror of Jira issues in SQLite with FTS5.
+
+Each ``(scope, project)`` pair the chat asks about is backfilled once (all
+issues, or those updated in the last ``backfill_days``) and then kept
+current by pulling only what changed since the last sync, through the MCP
+``jira_search`` tool with a relative ``updated >= -Nm`` JQL clause (relative
+minutes do not depend on the Jira user's time zone). Like the tool result
+cache, the scope is a user's permission scope, keyed by their Jira account
+so a rotated access token keeps its mirror: rows are only ever read by the
+user whose own session synced them, and only that user's sessions run
+background syncs for them. A scope's rows are dropped once it has not been
+searched for ``idle_after`` seconds.
+
+The model reads the mirror through the ``jira_search_local`` tool. A search
+is answered locally only if the project was synced completely within
+``max_staleness`` seconds and no write went through the chat since;
+otherwise one incremental sync is attempted inline, and if that does not
+finish within ``sync_timeout`` the search falls back to a live
+``jira_search``. Issues deleted in Jira stay in the mirror until it is
+rebuilt, since an incremental query cannot see them.
+"""
+
+import asyncio
+import json
+import math
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from google.genai import types
+from mcp.types import CallToolResult, TextContent
+
+from log import get_logger
+from result_cache import ToolResultCache, cloud_of
+from resilience import Upstream
+
+logger = get_logger(__name__)
+
+TOOL_NAME = "jira_search_local"
+
+# jira_search returns at most this many issues per call
+PAGE_SIZE = 50
+SYNC_FIELDS = (
+    "summary,description,status,issuetype,priority,assignee,reporter,"
+    "labels,created,updated,resolutiondate"
+)
+# Re-read a little before the last sync to absorb clock skew between hosts
+OVERLAP_MINUTES = 2
+
+ISO = "%Y-%m-%dT%H:%M:%SZ"
+RELATIVE_RE = re.compile(r"^-(\d+)([mhdw])$")
+RELATIVE_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+SEARCH_TOOL = types.Tool(
+    function_declarations=[
+        types.FunctionDeclaration(
+            name=TOOL_NAME,
+            description=(
+                "Search the issues of one Jira project in a local copy that is "
+                "kept in sync with Jira, much faster than jira_search. Prefer it "
+                "for listing, counting or finding a project's issues by text, "
+                "status, assignee, type or update date, e.g. what a team closed "
+                "last week. Use jira_search for JQL it cannot express.\n\n"
+                "    Args:\n"
+                "        project_key: Jira project key.\n"
+                "        text: Words to match in summary and description.\n"
+                "        status: Exact status name.\n"
+                "        status_category: 'To Do', 'In Progress' or 'Done'.\n"
+                "        assignee: Part of the assignee's name or email.\n"
+                "        issue_type: Issue type name, e.g. Bug.\n"
+                "        updated_since: Date (YYYY-MM-DD) or relative like -7d.\n"
+                "        updated_before: Date (YYYY-MM-DD) or relative like -7d.\n"
+                "        limit: Maximum number of results (default 50).\n\n"
+                "    Returns:\n"
+                "        JSON search results, newest update first.\n    "
+            ),
+            parameters=types.Schema(
+                type=types.Type.OBJECT,
+                required=["project_key"],
+                properties={
+                    "project_key": types.Schema(type=types.Type.STRING),
+                    "text": types.Schema(type=types.Type.STRING),
+                    "status": types.Schema(type=types.Type.STRING),
+                    "status_category": types.Schema(type=types.Type.STRING),
+                    "assignee": types.Schema(type=types.Type.STRING),
+                    "issue_type": types.Schema(type=types.Type.STRING),
+                    "updated_since": types.Schema(type=types.Type.STRING),
+                    "updated_before": types.Schema(type=types.Type.STRING),
+                    "limit": types.Schema(type=types.Type.INTEGER),
+                },
+            ),
+        ),
+    ],
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS issues (
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    project TEXT NOT NULL,
+    summary TEXT,
+    description TEXT,
+    status TEXT,
+    status_category TEXT,
+    assignee TEXT,
+    issue_type TEXT,
+    updated TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (scope, key)
+);
+CREATE INDEX IF NOT EXISTS issues_project_updated
+    ON issues (scope, project, updated);
+CREATE VIRTUAL TABLE IF NOT EXISTS issues_fts USING fts5(
+    summary, description, content='issues', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS issues_ai AFTER INSERT ON issues BEGIN
+    INSERT INTO issues_fts(rowid, summary, description)
+    VALUES (new.rowid, new.summary, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS issues_ad AFTER DELETE ON issues BEGIN
+    INSERT INTO issues_fts(issues_fts, rowid, summary, description)
+    VALUES ('delete', old.rowid, old.summary, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS issues_au AFTER UPDATE ON issues BEGIN
+    INSERT INTO issues_fts(issues_fts, rowid, summary, description)
+    VALUES ('delete', old.rowid, old.summary, old.description);
+    INSERT INTO issues_fts(rowid, summary, description)
+    VALUES (new.rowid, new.summary, new.description);
+END;
+CREATE TABLE IF NOT EXISTS sync_state (
+    scope TEXT NOT NULL,
+    project TEXT NOT NULL,
+    watermark TEXT,
+    covered_since TEXT,
+    synced_at REAL,
+    PRIMARY KEY (scope, project)
+);
+"""
+
+
+class MirrorError(Exception):
+    """A sync could not read issues from Jira."""
+
+
+def to_utc(value) -> Optional[str]:
+    """Jira timestamp or date as a sortable UTC string, or ``None``."""
+    if not value:
+        return None
+    try:
+        moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).strftime(ISO)
+
+
+def parse_since(value, now: Optional[float] = None) -> Optional[str]:
+    """UTC string for a date argument: ``YYYY-MM-DD``, ISO time or ``-7d``."""
+    if not value:
+        return None
+    match = RELATIVE_RE.match(str(value).strip())
+    if match:
+        seconds = int(match[1]) * RELATIVE_UNITS[match[2]]
+        moment = datetime.fromtimestamp((now or time.time()) - seconds, tz=timezone.utc)
+        return moment.strftime(ISO)
+    return to_utc(value)
+
+
+def _name(value) -> Optional[str]:
+    if isinstance(value, dict):
+        for key in ("display_name", "displayName", "name", "email", "value"):
+            if value.get(key):
+                return str(value[key])
+        return None
+    return str(value) if value else None
+
+
+def assignee_text(issue: dict) -> Optional[str]:
+    """Names and email of the assignee, which ``assignee`` arguments match."""
+    assignee = issue.get("assignee")
+    text = " ".join(
+        str(assignee.get(k))
+        for k in ("display_name", "displayName", "email", "emailAddress")
+        if isinstance(assignee, dict) and assignee.get(k)
+    )
+    return text or _name(assignee)
+
+
+def issue_row(scope: str, issue: dict) -> tuple:
+    status = issue.get("status") or {}
+    return (
+        scope,
+        issue["key"],
+        issue["key"].rsplit("-", 1)[0],
+        issue.get("summary") or "",
+        issue.get("description") or "",
+        _name(status),
+        status.get("category") if isinstance(status, dict) else None,
+        assignee_text(issue),
+        _name(issue.get("issue_type") or issue.get("issuetype")),
+        to_utc(issue.get("updated")),
+        json.dumps(issue, separators=(",", ":")),
+    )
+
+
+def fts_query(text: str) -> str:
+    """Every word of ``text`` must match, each quoted so FTS syntax is inert."""
+    terms = [t.replace('"', '""') for t in str(text).split()]
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def _jql_value(value) -> str:
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _jql_date(value) -> str:
+    value = str(value).strip()
+    if RELATIVE_RE.match(value):
+        return value
+    utc = to_utc(value)
+    return _jql_value(utc[:10].replace("-", "/") if utc else value)
+
+
+def minutes_since(utc: str, now: float) -> int:
+    """Relative JQL minutes that reach back to ``utc``, rounded up."""
+    moment = datetime.strptime(utc, ISO).replace(tzinfo=timezone.utc)
+    return max(math.ceil((now - moment.timestamp()) / 60), 1)
+
+
+def live_jql(args: dict, assignee_id: Optional[str] = None) -> str:
+    """JQL equivalent of a ``jira_search_local`` call, for the live fallback.
+
+    JQL only matches an assignee by account id, so the partial name the
+    mirror accepts is left out unless ``assignee_id`` resolves it.
+    """
+    clauses = [f"project = {_jql_value(str(args['project_key']).upper())}"]
+    if args.get("text"):
+        clauses.append(f"text ~ {_jql_value(args['text'])}")
+    if args.get("status"):
+        clauses.append(f"status = {_jql_value(args['status'])}")
+    if args.get("status_category"):
+        clauses.append(f"statusCategory = {_jql_value(args['status_category'])}")
+    if assignee_id:
+        clauses.append(f"assignee = {_jql_value(assignee_id)}")
+    if args.get("issue_type"):
+        clauses.append(f"issuetype = {_jql_value(args['issue_type'])}")
+    if args.get("updated_since"):
+        clauses.append(f"updated >= {_jql_date(args['updated_since'])}")
+    if args.get("updated_before"):
+        clauses.append(f"updated < {_jql_date(args['updated_before'])}")
+    return " AND ".join(clauses) + " ORDER BY updated DESC"
+
+
+class SyncState:
+    """How far a project is mirrored.
+
+    Everything updated before ``watermark`` is in the index; during a
+    backfill that is the last issue read so far. ``covered_since`` is where
+    the backfill started, ``None`` for all issues, and ``synced_at`` is the
+    start of the last complete sync.
+    """
+
+    __slots__ = ("watermark", "covered_since", "synced_at")
+
+    def __init__(
+        self,
+        watermark: Optional[str],
+        covered_since: Optional[str],
+        synced_at: Optional[float],
+    ):
+        self.watermark = watermark
+        self.covered_since = covered_since
+        self.synced_at = synced_at
+
+
+class IssueIndex:
+    """The SQLite side of the mirror; every method blocks, so call it off-loop."""
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def state(self, scope: str, project: str) -> Optional[SyncState]:
+        row = self._db.execute(
+            "SELECT watermark, covered_since, synced_at FROM sync_state "
+            "WHERE scope = ? AND project = ?",
+            (scope, project),
+        ).fetchone()
+        return SyncState(*row) if row else None
+
+    def save_state(self, scope: str, project: str, state: SyncState):
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?, ?)",
+                (
+                    scope,
+                    project,
+                    state.watermark,
+                    state.covered_since,
+                    state.synced_at,
+                ),
+            )
+
+    def upsert(self, rows: List[tuple]):
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO issues VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (scope, key) DO UPDATE SET project = excluded.project, "
+                "summary = excluded.summary, description = excluded.description, "
+                "status = excluded.status, "
+                "status_category = excluded.status_category, "
+                "assignee = excluded.assignee, issue_type = excluded.issue_type, "
+                "updated = excluded.updated, data = excluded.data",
+                rows,
+            )
+
+    def search(
+        self,
+        scope: str,
+        project: str,
+        text: Optional[str] = None,
+        status: Optional[str] = None,
+        status_category: Optional[str] = None,
+        assignee: Optional[str] = None,
+        issue_type: Optional[str] = None,
+        updated_since: Optional[str] = None,
+        updated_before: Optional[str] = None,
+        limit: int = PAGE_SIZE,
+    ) -> Tuple[int, List[dict]]:
+        """Matching issues, most recently updated first, and their total count."""
+        tables = "issues"
+        where = ["issues.scope = ?", "issues.project = ?"]
+        params: list = [scope, project]
+        if text and fts_query(text):
+            tables += " JOIN issues_fts ON issues_fts.rowid = issues.rowid"
+            where.append("issues_fts MATCH ?")
+            params.append(fts_query(text))
+        for column, value in (
+            ("status", status),
+            ("status_category", status_category),
+            ("issue_type", issue_type),
+        ):
+            if value:
+                where.append(f"issues.{column} = ? COLLATE NOCASE")
+                params.append(value)
+        if assignee:
+            where.append("issues.assignee LIKE ?")
+            params.append(f"%{assignee}%")
+        if updated_since:
+            where.append("issues.updated >= ?")
+            params.append(updated_since)
+        if updated_before:
+            where.append("issues.updated < ?")
+            params.append(updated_before)
+        condition = " AND ".join(where)
+        total = self._db.execute(
+            f"SELECT COUNT(*) FROM {tables} WHERE {condition}", params
+        ).fetchone()[0]
+        rows = self._db.execute(
+            f"SELECT issues.data FROM {tables} WHERE {condition} "
+            "ORDER BY issues.updated DESC LIMIT ?",
+            params + [limit],
+        ).fetchall()
+        return total, [json.loads(data) for (data,) in rows]
+
+    def drop(self, scope: str, project: str):
+        with self._db:
+            self._db.execute(
+                "DELETE FROM issues WHERE scope = ? AND project = ?", (scope, project)
+            )
+            self._db.execute(
+                "DELETE FROM sync_state WHERE scope = ? AND project = ?",
+                (scope, project),
+            )
+
+    def count(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM issues").fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+
+class JiraMirror:
+    """Sync engine and ``jira_search_local`` handler over an ``IssueIndex``.
+
+    Projects are tracked once searched; while a WebSocket of their scope is
+    connected, ``run`` syncs each project used within ``idle_after`` seconds
+    every ``interval`` seconds, so most searches find it fresh already.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        upstream: Optional[Upstream] = None,
+        cache: Optional[ToolResultCache] = None,
+        backfill_days: int = 0,
+        max_staleness: float = 60.0,
+        sync_timeout: float = 5.0,
+        interval: float = 30.0,
+        idle_after: float = 1800.0,
+        max_issues_per_sync: int = 2000,
+    ):
+        # One thread owns the connection, which also serializes every query
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mirror")
+        self.index = IssueIndex(path)
+        self.upstream = upstream
+        self.cache = cache
+        self.backfill_days = backfill_days
+        self.max_staleness = max_staleness
+        self.sync_timeout = sync_timeout
+        self.interval = interval
+        self.idle_after = idle_after
+        self.max_issues_per_sync = max_issues_per_sync
+        self._sessions: Dict[str, list] = {}
+        self._last_used: Dict[Tuple[str, str], float] = {}
+        self._generations: Dict[Tuple[str, str], int] = {}
+        self._syncs: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.metrics = {
+            "searches": 0,
+            "local": 0,
+            "live_fallbacks": 0,
+            "inline_syncs": 0,
+            "syncs": 0,
+            "sync_failures": 0,
+            "issues_synced": 0,
+        }
+
+    async def _db(self, fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._thread, lambda: fn(*args, **kwargs)
+        )
+
+    def attach(self, scope: str, session):
+        """Make a connected user's MCP session available for background syncs."""
+        self._sessions.setdefault(scope, []).append(session)
+
+    def detach(self, scope: str, session):
+        sessions = self._sessions.get(scope, [])
+        if session in sessions:
+            sessions.remove(session)
+        if not sessions:
+            self._sessions.pop(scope, None)
+
+    async def _call(self, session, scope: str, name: str, args: dict):
+        if self.upstream is None:
+            return await session.call_tool(name, args)
+        return await self.upstream.call(
+            lambda: session.call_tool(name, args), key=cloud_of(scope)
+        )
+
+    def _generation(self, scope: str) -> int:
+        return self.cache.generation(scope) if self.cache is not None else 0
+
+    async def _sync(self, session, scope: str, project: str):
+        key = (scope, project)
+        generation = self._generation(scope)
+        started = time.time()
+        state = await self._db(self.index.state, scope, project)
+        if state is None:
+            backfill = f"-{self.backfill_days}d" if self.backfill_days else None
+            state = SyncState(None, parse_since(backfill, started), None)
+        if state.watermark is not None:
+            last = datetime.strptime(state.watermark, ISO).replace(tzinfo=timezone.utc)
+            minutes = math.ceil((started - last.timestamp()) / 60) + OVERLAP_MINUTES
+            since = f"-{minutes}m"
+        elif state.covered_since is not None:
+            # A backfill, possibly resumed after one that read no issue
+            since = f"-{minutes_since(state.covered_since, started)}m"
+        else:
+            since = None
+        # Each page starts at the newest update read so far rather than at
+        # an offset, so an issue updated mid-sync moves behind the cursor
+        # instead of shifting the issues after it out of the next page
+        cursor = since
+        seen: set = set()
+        start_at = 0
+        fetched = 0
+        complete = False
+        pages = math.ceil(self.max_issues_per_sync / PAGE_SIZE) * 2
+        for _ in range(pages):
+            if fetched >= self.max_issues_per_sync:
+                break
+            jql = f"project = {_jql_value(project)}"
+            if cursor:
+                jql += f" AND updated >= {cursor}"
+            jql += " ORDER BY updated ASC, key ASC"
+            result = await self._call(
+                session,
+                scope,
+                "jira_search",
+                {
+                    "jql": jql,
+                    "fields": SYNC_FIELDS,
+                    "limit": PAGE_SIZE,
+                    "start_at": start_at,
+                },
+            )
+            try:
+                data = json.loads(result.content[0].text)
+            except (AttributeError, IndexError, TypeError, ValueError):
+                data = None
+            if getattr(result, "isError", False) or not isinstance(data, dict):
+                raise MirrorError(f"jira_search failed while syncing {project}")
+            issues = [i for i in data.get("issues") or [] if i.get("key")]
+            fresh = [issue for issue in issues if issue["key"] not in seen]
+            seen.update(issue["key"] for issue in fresh)
+            rows = [issue_row(scope, issue) for issue in fresh]
+            await self._db(self.index.upsert, rows)
+            fetched += len(fresh)
+            newest = max((to_utc(i.get("updated")) or "" for i in issues), default="")
+            if newest:
+                state.watermark = max(state.watermark or "", newest)
+            total = data.get("total")
+            if len(issues) < PAGE_SIZE or (
+                isinstance(total, int) and 0 <= total <= start_at + len(issues)
+            ):
+                complete = True
+                break
+            last = to_utc(issues[-1].get("updated"))
+            cursor_at = last and f"-{minutes_since(last, time.time())}m"
+            if fresh and cursor_at and cursor_at != cursor:
+                cursor, start_at = cursor_at, 0
+            else:
+                # A full page within the cursor's minute: page through it
+                start_at += len(issues)
+        if complete:
+            # Everything updated before the sync started is now in the index
+            state.watermark = datetime.fromtimestamp(started, tz=timezone.utc).strftime(
+                ISO
+            )
+            state.synced_at = started
+            self._generations[key] = generation
+        await self._db(self.index.save_state, scope, project, state)
+        self.metrics["syncs"] += 1
+        self.metrics["issues_synced"] += fetched
+        logger.info(
+            f"Mirror synced {fetched} issues of {project}"
+            + ("" if complete else ", more to come")
+        )
+
+    def sync(self, session, scope: str, project: str) -> asyncio.Task:
+        """Start a sync of ``project`` unless one is already running."""
+        key = (scope, project)
+        task = self._syncs.get(key)
+        if task is None or task.done():
+            task = self._syncs[key] = asyncio.create_task(
+                self._sync(session, scope, project)
+            )
+            task.add_done_callback(self._sync_done)
+        return task
+
+    def _sync_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            self.metrics["sync_failures"] += 1
+            logger.warning(f"Mirror sync failed: {task.exception()!r}")
+
+    def _fresh(self, scope: str, project: str, state: Optional[SyncState]) -> bool:
+        return (
+            state is not None
+            and state.synced_at is not None
+            and time.time() - state.synced_at <= self.max_staleness
+            and self._generations.get((scope, project)) == self._generation(scope)
+        )
+
+    async def _ensure_fresh(
+        self, session, scope: str, project: str
+    ) -> Optional[SyncState]:
+        """Sync state if the mirror may answer for ``project`` now, else ``None``."""
+        state = await self._db(self.index.state, scope, project)
+        if self._fresh(scope, project, state):
+            return state
+        task = self.sync(session, scope, project)
+        if state is None or state.synced_at is None:
+            # The backfill can take a while; let it run and answer live
+            return None
+        self.metrics["inline_syncs"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=self.sync_timeout)
+        except Exception:
+            return None
+        state = await self._db(self.index.state, scope, project)
+        return state if self._fresh(scope, project, state) else None
+
+    async def search(self, session, args: dict, scope: str) -> CallToolResult:
+        """Handle a ``jira_search_local`` call from the model."""
+        self.metrics["searches"] += 1
+        project = str(args.get("project_key") or "").strip().upper()
+        if not project:
+            raise ValueError("project_key is required")
+        self._last_used[(scope, project)] = time.monotonic()
+        limit = max(1, min(int(args.get("limit") or PAGE_SIZE), 200))
+        since = parse_since(args.get("updated_since"))
+        state = await self._ensure_fresh(session, scope, project)
+        if state is None or (
+            # Older issues than the backfill reached may match
+            state.covered_since is not None
+            and (since is None or since < state.covered_since)
+        ):
+            return await self._search_live(
+                session, scope, {**args, "project_key": project}
+            )
+        total, issues = await self._db(
+            self.index.search,
+            scope,
+            project,
+            text=args.get("text"),
+            status=args.get("status"),
+            status_category=args.get("status_category"),
+            assignee=args.get("assignee"),
+            issue_type=args.get("issue_type"),
+            updated_since=since,
+            updated_before=parse_since(args.get("updated_before")),
+            limit=limit,
+        )
+        self.metrics["local"] += 1
+        payload = {
+            "total": total,
+            "start_at": 0,
+            "max_results": limit,
+            "issues": issues,
+            "source": "mirror",
+            "synced_at": datetime.fromtimestamp(
+                state.synced_at, tz=timezone.utc
+            ).strftime(ISO),
+        }
+        return CallToolResult(
+            content=[TextContent(type="text", text=json.dumps(payload))]
+        )
+
+    async def _assignee_id(self, session, scope: str, assignee: str) -> Optional[str]:
+        """Account id of the user ``assignee`` names, if Jira can resolve it."""
+        try:
+            result = await self._call(
+                session, scope, "jira_get_user_profile", {"user_identifier": assignee}
+            )
+            profile = json.loads(result.content[0].text)
+        except Exception:
+            return None
+        if getattr(result, "isError", False) or not isinstance(profile, dict):
+            return None
+        account_id = profile.get("accountId") or profile.get("account_id")
+        names = f"{assignee_text({'assignee': profile}) or ''} {account_id}"
+        # A lookup may answer with someone else; only trust a matching name
+        if account_id and assignee.lower() in names.lower():
+            return str(account_id)
+        return None
+
+    async def _search_live(self, session, scope: str, args: dict) -> CallToolResult:
+        self.metrics["live_fallbacks"] += 1
+        limit = max(1, min(int(args.get("limit") or PAGE_SIZE), PAGE_SIZE))
+        assignee = str(args.get("assignee") or "").strip()
+        if not assignee:
+            return await self._call(
+                session, scope, "jira_search", {"jql": live_jql(args), "limit": limit}
+            )
+        assignee_id = await self._assignee_id(session, scope, assignee)
+        if assignee_id:
+            return await self._call(
+                session,
+                scope,
+                "jira_search",
+                {"jql": live_jql(args, assignee_id), "limit": limit},
+            )
+        # No account to match on: read a full page and match the partial
+        # name the way the mirror does
+        result = await self._call(
+            session, scope, "jira_search", {"jql": live_jql(args), "limit": PAGE_SIZE}
+        )
+        try:
+            data = json.loads(result.content[0].text)
+        except (AttributeError, IndexError, TypeError, ValueError):
+            return result
+        if getattr(result, "isError", False) or not isinstance(data, dict):
+            return result
+        issues = [
+            issue
+            for issue in data.get("issues") or []
+            if assignee.lower() in (assignee_text(issue) or "").lower()
+        ]
+        payload = {
+            "total": len(issues),
+            "start_at": 0,
+            "max_results": limit,
+            "issues": issues[:limit],
+            "source": "live",
+        }
+        return CallToolResult(
+            content=[TextContent(type="text", text=json.dumps(payload))]
+        )
+
+    async def run(self):
+        """Keep recently used projects fresh while their user is connected."""
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            for (scope, project), used in list(self._last_used.items()):
+                if now - used > self.idle_after:
+                    # Scopes follow access tokens, so an idle one is not coming back
+                    del self._last_used[(scope, project)]
+                    self._generations.pop((scope, project), None)
+                    await self._db(self.index.drop, scope, project)
+                    continue
+                sessions = self._sessions.get(scope)
+                if not sessions:
+                    continue
+                state = await self._db(self.index.state, scope, project)
+                if state is not None and state.synced_at is not None:
+                    if time.time() - state.synced_at < self.interval:
+                        continue
+                try:
+                    await self.sync(sessions[-1], scope, project)
+                except Exception:
+                    pass  # counted and logged by _sync_done
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def close(self):
+        tasks = [t for t in [self._task, *self._syncs.values()] if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        await self._db(self.index.close)
+        self._thread.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        searches = self.metrics["searches"]
+        return {
+            **self.metrics,
+            "local_rate": (
+                round(self.metrics["local"] / searches, 4) if searches else 0.0
+            ),
+            "tracked_projects": len(self._last_used),
+            "syncing": sum(1 for t in self._syncs.values() if not t.done()),
+        }
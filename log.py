@@ -0,0 +1,147 @@
+"""Structured logging that never blocks the event loop.
+
+Records are handed to a bounded in-memory queue and formatted and written
+as JSON lines by a background thread, so a slow terminal or a full pipe
+stalls only that thread. When the queue is full a record is dropped and
+counted instead of waited for. Tool results and model output go through
+``log_payload``: by default only a sample of them is logged and each is
+cut to ``payload_max_chars``, and even that conversion happens on the
+writer thread. ``debug_payloads`` logs every payload in full.
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from typing import Optional, TextIO
+
+ROOT = "jira_chat"
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        payload = getattr(record, "payload", None)
+        if payload is not None:
+            text = payload if isinstance(payload, str) else str(payload)
+            entry["payload_chars"] = len(text)
+            max_chars = record.payload_max_chars
+            if max_chars is not None and len(text) > max_chars:
+                text = text[:max_chars]
+                entry["truncated"] = True
+            entry["payload"] = text
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, records: queue.Queue):
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue stays in process, so the record needs no pickling and
+        # formatting is left to the writer thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _State:
+    handler: Optional[_DroppingQueueHandler] = None
+    listener: Optional[logging.handlers.QueueListener] = None
+    debug_payloads = False
+    payload_sample_rate = 0.01
+    payload_max_chars = 2000
+    payloads_logged = 0
+    payloads_skipped = 0
+
+
+_state = _State()
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT}.{name}")
+
+
+def configure(
+    level: str = "INFO",
+    queue_size: int = 10_000,
+    debug_payloads: bool = False,
+    payload_sample_rate: float = 0.01,
+    payload_max_chars: int = 2000,
+    stream: Optional[TextIO] = None,
+):
+    """Route every ``jira_chat.*`` logger through the background writer."""
+    shutdown()
+    records: queue.Queue = queue.Queue(maxsize=queue_size)
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(JsonFormatter())
+    handler = _DroppingQueueHandler(records)
+    root = logging.getLogger(ROOT)
+    root.handlers = [handler]
+    root.setLevel(level.upper())
+    root.propagate = False
+    _state.handler = handler
+    _state.listener = logging.handlers.QueueListener(records, writer)
+    _state.listener.start()
+    _state.debug_payloads = debug_payloads
+    _state.payload_sample_rate = payload_sample_rate
+    _state.payload_max_chars = payload_max_chars
+
+
+def shutdown():
+    """Write out everything still queued and stop the writer thread."""
+    if _state.listener is not None:
+        _state.listener.stop()
+        _state.listener = None
+
+
+def log_payload(logger: logging.Logger, message: str, payload, **fields):
+    """Log a possibly huge ``payload``, sampled and size-capped unless debugging.
+
+    ``payload`` is converted to text on the writer thread, so a skipped or
+    queued payload costs the caller nothing beyond the record itself.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    if not _state.debug_payloads and random.random() >= _state.payload_sample_rate:
+        _state.payloads_skipped += 1
+        return
+    _state.payloads_logged += 1
+    logger.info(
+        message,
+        extra={
+            "fields": fields,
+            "payload": payload,
+            "payload_max_chars": (
+                None if _state.debug_payloads else _state.payload_max_chars
+            ),
+        },
+    )
+
+
+def stats() -> dict:
+    handler = _state.handler
+    return {
+        "queued": handler.queue.qsize() if handler else 0,
+        "dropped": handler.dropped if handler else 0,
+        "payloads_logged": _state.payloads_logged,
+        "payloads_skipped": _state.payloads_skipped,
+        "debug_payloads": _state.debug_payloads,
+    }
@@ -0,0 +1,325 @@
+import asyncio
+import contextlib
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+
+from log import get_logger
+
+logger = get_logger(__name__)
+
+MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://localhost:9096/mcp")
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no MCP session slot frees up within the acquire timeout."""
+
+
+class _PooledSession:
+    def __init__(self, key: Tuple[str, str]):
+        self.key = key
+        self.session: Optional[ClientSession] = None
+        self.task: Optional[asyncio.Task] = None
+        self.ready = asyncio.Event()
+        self.closing = asyncio.Event()
+        self.error: Optional[BaseException] = None
+        self.closed = False
+        self.leases = 0
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.last_checked = self.created_at
+
+    @property
+    def alive(self) -> bool:
+        return (
+            self.session is not None and not self.closed and not self.closing.is_set()
+        )
+
+
+def is_connection_lost(exc: BaseException) -> bool:
+    """Whether ``exc`` means the session's connection is gone for good."""
+    if isinstance(exc, McpError):
+        return exc.error.code == CONNECTION_CLOSED
+    return isinstance(exc, (ConnectionError, httpx.NetworkError))
+
+
+class Lease:
+    """One holder's claim on a pooled session.
+
+    Stands in for the ``ClientSession`` it leases: ``call_tool`` goes to the
+    pooled session, which is kept out of eviction while the call is in
+    flight. A call that finds the session's connection lost invalidates it,
+    and the next call moves the lease to a fresh session for the same key.
+    """
+
+    def __init__(self, pool: "MCPSessionPool", entry: _PooledSession):
+        self.pool = pool
+        self.entry = entry
+        self.released = False
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.entry.key
+
+    @property
+    def session(self) -> Optional[ClientSession]:
+        return self.entry.session
+
+    def borrow(self):
+        """Another lease of this key, for work that may outlive this holder."""
+        return self.pool.session(*self.key)
+
+    async def call_tool(self, name: str, arguments: Optional[dict] = None):
+        if self.released:
+            raise ConnectionError("MCP session lease was released.")
+        if not self.entry.alive:
+            await self.pool.renew(self)
+        entry = self.entry
+        # A call in flight holds the session like a lease does
+        entry.leases += 1
+        try:
+            return await entry.session.call_tool(name, arguments)
+        except Exception as e:
+            if is_connection_lost(e):
+                await self.pool.invalidate(self)
+            raise
+        finally:
+            await self.pool._unlease(entry)
+
+
+class MCPSessionPool:
+    """Warm MCP client sessions keyed by ``(access_token, cloud_id)``.
+
+    Each pooled session is owned by a background task that keeps the
+    ``streamablehttp_client`` and ``ClientSession`` contexts open, so the
+    initialize handshake is paid once per credential pair instead of once per
+    WebSocket connection. Concurrent connections for the same key share the
+    session; idle sessions are health-checked with a ping and evicted after
+    ``idle_ttl`` seconds. ``acquire`` hands out a ``Lease`` per holder, which
+    is used in place of the session and given back to ``release``; a session
+    is only torn down once no lease or call holds it.
+    """
+
+    def __init__(
+        self,
+        url: str = MCP_SERVER_URL,
+        max_sessions: int = 100,
+        idle_ttl: float = 300.0,
+        health_check_interval: float = 60.0,
+        acquire_timeout: float = 10.0,
+    ):
+        self.url = url
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self._entries: Dict[Tuple[str, str], _PooledSession] = {}
+        self._lock = asyncio.Lock()
+        self._slot_freed = asyncio.Condition(self._lock)
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "health_check_failures": 0,
+            "connect_failures": 0,
+            "invalidations": 0,
+            "renewals": 0,
+        }
+
+    async def _run(self, entry: _PooledSession):
+        access_token, cloud_id = entry.key
+        try:
+            async with streamablehttp_client(
+                self.url,
+                headers={
+                    "Authorization": f"Bearer {access_token}",
+                    "X-Atlassian-Cloud-Id": cloud_id,
+                },
+            ) as (read_stream, write_stream, _):
+                async with ClientSession(read_stream, write_stream) as session:
+                    await session.initialize()
+                    entry.session = session
+                    entry.ready.set()
+                    await entry.closing.wait()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            entry.error = e
+            logger.warning(f"MCP pooled session error: {e}")
+        finally:
+            entry.closed = True
+            entry.ready.set()
+
+    def _evict_idle_lru(self) -> bool:
+        idle = [e for e in self._entries.values() if e.leases == 0]
+        if not idle:
+            return False
+        victim = min(idle, key=lambda e: e.last_used)
+        self._remove(victim)
+        return True
+
+    def _remove(self, entry: _PooledSession):
+        if self._entries.get(entry.key) is entry:
+            del self._entries[entry.key]
+            self.metrics["evictions"] += 1
+        entry.closing.set()
+        self._slot_freed.notify_all()
+
+    async def _unlease(self, entry: _PooledSession, failed: bool = False):
+        """Drop one lease on ``entry``; tear it down only once nobody holds it."""
+        async with self._lock:
+            entry.leases = max(entry.leases - 1, 0)
+            entry.last_used = time.monotonic()
+            if entry.leases:
+                return
+            if failed or entry.closed:
+                self._remove(entry)
+            else:
+                self._slot_freed.notify_all()
+
+    async def acquire(self, access_token: str, cloud_id: str) -> Lease:
+        key = (access_token, cloud_id)
+        deadline = time.monotonic() + self.acquire_timeout
+        async with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not entry.alive and entry.ready.is_set():
+                # Died since it was leased; its holders renew onto the new one
+                self._remove(entry)
+                entry = None
+            if entry is None:
+                while len(self._entries) >= self.max_sessions:
+                    if self._evict_idle_lru():
+                        continue
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolExhaustedError(
+                            f"All {self.max_sessions} MCP sessions are in use."
+                        )
+                    with contextlib.suppress(asyncio.TimeoutError):
+                        await asyncio.wait_for(self._slot_freed.wait(), remaining)
+                entry = self._entries.get(key)
+            if entry is None:
+                self.metrics["misses"] += 1
+                entry = _PooledSession(key)
+                entry.task = asyncio.create_task(self._run(entry))
+                self._entries[key] = entry
+            else:
+                self.metrics["hits"] += 1
+            entry.leases += 1
+
+        try:
+            await asyncio.wait_for(
+                entry.ready.wait(), max(deadline - time.monotonic(), 0.1)
+            )
+        except BaseException:
+            # Timed out or cancelled: others may still be waiting on it
+            await self._unlease(entry, failed=True)
+            self.metrics["connect_failures"] += 1
+            raise
+        if not entry.alive:
+            await self._unlease(entry, failed=True)
+            self.metrics["connect_failures"] += 1
+            raise entry.error or ConnectionError("MCP session closed.")
+        return Lease(self, entry)
+
+    async def release(self, lease: Lease):
+        """Give back ``lease``; releasing it twice does nothing."""
+        if lease.released:
+            return
+        lease.released = True
+        await self._unlease(lease.entry)
+
+    async def renew(self, lease: Lease):
+        """Move ``lease`` from its dead session to a live one for the same key."""
+        old = lease.entry
+        fresh = await self.acquire(*old.key)
+        self.metrics["renewals"] += 1
+        lease.entry = fresh.entry
+        await self._unlease(old)
+
+    @contextlib.asynccontextmanager
+    async def session(self, access_token: str, cloud_id: str):
+        """Lease the pooled session for ``(access_token, cloud_id)``."""
+        lease = await self.acquire(access_token, cloud_id)
+        try:
+            yield lease
+        finally:
+            await self.release(lease)
+
+    async def invalidate(self, lease: Lease):
+        """Close the session behind ``lease`` after its connection was lost.
+
+        Every holder of it moves to a fresh session on its next call.
+        """
+        async with self._lock:
+            if not lease.entry.closing.is_set():
+                self.metrics["invalidations"] += 1
+            self._remove(lease.entry)
+
+    async def _health_check(self, entry: _PooledSession) -> bool:
+        try:
+            await asyncio.wait_for(entry.session.send_ping(), timeout=5)
+            return True
+        except Exception as e:
+            logger.info(f"MCP session health check failed: {e}")
+            return False
+
+    async def _maintenance_loop(self):
+        interval = max(min(self.idle_ttl, self.health_check_interval) / 2, 1)
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            async with self._lock:
+                for entry in list(self._entries.values()):
+                    if entry.leases:
+                        continue
+                    if entry.closed or now - entry.last_used > self.idle_ttl:
+                        self._remove(entry)
+                candidates = [
+                    e
+                    for e in self._entries.values()
+                    if e.alive
+                    and e.leases == 0
+                    and now - e.last_checked > self.health_check_interval
+                ]
+            for entry in candidates:
+                entry.last_checked = now
+                if not await self._health_check(entry):
+                    self.metrics["health_check_failures"] += 1
+                    async with self._lock:
+                        if entry.leases == 0:
+                            self._remove(entry)
+
+    def start(self):
+        if self._maintenance_task is None or self._maintenance_task.done():
+            self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+
+    async def close(self):
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+        async with self._lock:
+            entries = list(self._entries.values())
+            for entry in entries:
+                self._remove(entry)
+        tasks = [e.task for e in entries if e.task]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=5)
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "hit_rate": round(self.metrics["hits"] / lookups, 4) if lookups else 0.0,
+            "sessions": len(self._entries),
+            "active_sessions": sum(1 for e in self._entries.values() if e.leases),
+            "max_sessions": self.max_sessions,
+        }
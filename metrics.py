@@ -0,0 +1,198 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Histograms and counters are plain dicts keyed by label values, so observing
+a value costs a bisect and a few additions; ``span`` times a block into the
+shared ``stage_seconds`` histogram. Component ``stats()`` dicts (pool,
+caches, scheduler, ...) are exported as gauges at scrape time through
+``Registry.add_stats`` instead of being tracked twice.
+"""
+
+import bisect
+import re
+import time
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+from log import get_logger
+
+logger = get_logger(__name__)
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+TOKEN_BUCKETS = (100, 500, 1000, 2500, 5000, 10_000, 25_000, 50_000, 100_000, 250_000)
+COST_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+
+_NAME_RE = re.compile(r"[^a-zA-Z0-9_]")
+_IDENTIFIER_RE = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in self._values.items():
+            yield f"{self.name}{_labels(self.label_names, key)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        label_names: Sequence[str] = (),
+    ):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        # Per label values: [count per bucket (non-cumulative), sum, count]
+        self._series: Dict[Tuple, List] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.label_names)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for key, (counts, total, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = _labels(self.label_names, key, f'le="{_number(bound)}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            labels = _labels(self.label_names, key)
+            yield f"{self.name}_sum{labels} {_number(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+def _flatten(prefix: str, stats: dict, labels: str = "") -> Iterator[str]:
+    for key, value in stats.items():
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            yield f"{prefix}_{_NAME_RE.sub('_', key)}{labels} {_number(value)}"
+        elif isinstance(value, str):
+            yield f'{prefix}_{_NAME_RE.sub("_", key)}{{value="{_escape(value)}"}} 1'
+        elif isinstance(value, dict):
+            if value and not all(_IDENTIFIER_RE.match(str(k)) for k in value):
+                # Keyed by model, tool or path names: keep those as a label
+                for sub_key, sub_value in value.items():
+                    sub_labels = f'{{key="{_escape(sub_key)}"}}'
+                    name = f"{prefix}_{_NAME_RE.sub('_', key)}"
+                    if isinstance(sub_value, dict):
+                        yield from _flatten(name, sub_value, sub_labels)
+                    elif isinstance(sub_value, (int, float)):
+                        yield f"{name}{sub_labels} {_number(sub_value)}"
+            else:
+                yield from _flatten(f"{prefix}_{_NAME_RE.sub('_', key)}", value, labels)
+
+
+class Registry:
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._metrics: List = []
+        self._stats: List[Tuple[str, Callable[[], dict]]] = []
+
+    def counter(self, name: str, help_text: str, label_names=()) -> Counter:
+        metric = Counter(f"{self.namespace}_{name}", help_text, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self, name: str, help_text: str, buckets=LATENCY_BUCKETS, label_names=()
+    ) -> Histogram:
+        metric = Histogram(f"{self.namespace}_{name}", help_text, buckets, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def add_stats(self, name: str, stats: Callable[[], dict]):
+        """Export the numbers in ``stats()`` as untyped gauges under ``name``."""
+        self._stats.append((f"{self.namespace}_{name}", stats))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        gauges = []
+        for prefix, stats in self._stats:
+            try:
+                gauges.extend(_flatten(prefix, stats()))
+            except Exception as e:
+                logger.warning(f"Metrics collection for {prefix} failed: {e}")
+        # Samples of one metric must be contiguous
+        gauges.sort(key=lambda line: re.split(r"[{ ]", line, 1)[0])
+        lines.extend(gauges)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry("jira_chat")
+
+stage_seconds = registry.histogram(
+    "stage_seconds",
+    "Time spent in each stage of a chat turn or login",
+    label_names=("stage",),
+)
+
+
+class span:
+    """Time a block as one observation of ``stage_seconds`` for ``stage``."""
+
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        stage_seconds.observe(time.perf_counter() - self.started, stage=self.stage)
+        return False
@@ -0,0 +1,164 @@
+import re
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+
+from google.genai import types
+
+from log import get_logger
+
+logger = get_logger(__name__)
+
+# Words that suggest a request needs several steps or real reasoning
+MULTI_STEP_RE = re.compile(
+    r"\b(and then|then|compare|each|every|all of|summari[sz]e|explain|why|plan|"
+    r"analy[sz]e|report|breakdown|recommend|prioriti[sz]e)\b",
+    re.IGNORECASE,
+)
+ISSUE_KEY_RE = re.compile(r"\b[A-Z][A-Z0-9]+-\d+\b")
+
+# Finish reasons that mean the model did not produce a usable step
+MALFORMED_FINISH_REASONS = {"MALFORMED_FUNCTION_CALL", "UNEXPECTED_TOOL_CALL"}
+
+
+class ModelRouter:
+    """Pick a Gemini model per turn from cheap local signals.
+
+    ``chat_models`` is a ladder from cheapest to strongest. A turn starts on
+    the lowest rung its complexity score reaches; the score grows with
+    message length, words that suggest several steps, history size and a
+    failed previous turn. ``escalate`` moves to the next rung when a step
+    produced nothing usable. Formatting, which needs no tools, may use
+    ``format_models`` from cheapest up by payload size. When disabled every
+    turn starts on ``default_chat_model``, but weak steps still escalate.
+    """
+
+    def __init__(
+        self,
+        chat_models: Sequence[str],
+        format_models: Sequence[str],
+        tool_declarations: Sequence[types.Tool],
+        default_chat_model: str,
+        long_message_chars: int = 300,
+        large_history_tokens: int = 4000,
+        small_format_chars: int = 2000,
+        enabled: bool = True,
+    ):
+        self.chat_models = list(chat_models)
+        self.format_models = list(format_models)
+        self.default_chat_model = default_chat_model
+        self.long_message_chars = long_message_chars
+        self.large_history_tokens = large_history_tokens
+        self.small_format_chars = small_format_chars
+        self.enabled = enabled
+        self._required: Dict[str, set] = {}
+        for tool in tool_declarations:
+            for declaration in tool.function_declarations or []:
+                required = (
+                    declaration.parameters.required if declaration.parameters else None
+                )
+                self._required[declaration.name] = set(required or [])
+        self._stats: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"calls": 0, "failures": 0, "seconds": 0.0, "cost": 0.0}
+        )
+        self.metrics = {"turns": 0, "escalations": 0}
+        self.escalations: Dict[str, int] = defaultdict(int)
+
+    def complexity(
+        self,
+        message: str,
+        tools_likely: bool,
+        history_tokens: int = 0,
+        last_failed: bool = False,
+    ) -> int:
+        score = 0
+        if len(message) > self.long_message_chars:
+            score += 1
+        if len(message) > 3 * self.long_message_chars:
+            score += 1
+        if MULTI_STEP_RE.search(message) or len(ISSUE_KEY_RE.findall(message)) > 2:
+            score += 1
+        if tools_likely and history_tokens > self.large_history_tokens:
+            score += 1
+        if last_failed:
+            score += 1
+        return score
+
+    def choose(
+        self,
+        message: str,
+        tools_likely: bool,
+        history_tokens: int = 0,
+        last_failed: bool = False,
+    ) -> str:
+        """Model for the first step of a turn."""
+        self.metrics["turns"] += 1
+        if not self.enabled:
+            return self.default_chat_model
+        score = self.complexity(message, tools_likely, history_tokens, last_failed)
+        return self.chat_models[min(score, len(self.chat_models) - 1)]
+
+    def escalate(self, model: str, reason: str) -> Optional[str]:
+        """Next stronger chat model after a weak step, or ``None`` at the top.
+
+        A model outside the ladder goes to the top rung, never back down.
+        """
+        if model not in self.chat_models:
+            index = len(self.chat_models) - 1
+        else:
+            index = self.chat_models.index(model) + 1
+        if index >= len(self.chat_models):
+            return None
+        stronger = self.chat_models[index]
+        self.metrics["escalations"] += 1
+        self.escalations[f"{model}->{stronger}"] += 1
+        logger.info(f"Escalating {model} -> {stronger}: {reason}")
+        return stronger
+
+    def format_model(self, payload: str) -> str:
+        if not self.enabled or len(payload) > self.small_format_chars:
+            return self.format_models[-1]
+        return self.format_models[0]
+
+    def weak_step(
+        self,
+        text: str,
+        function_calls: List[types.FunctionCall],
+        finish_reason: Optional[str],
+    ) -> Optional[str]:
+        """Why a step's output is unusable, or ``None`` if it is fine."""
+        if finish_reason in MALFORMED_FINISH_REASONS:
+            return finish_reason.lower()
+        for function_call in function_calls:
+            if function_call.name not in self._required:
+                return f"unknown tool {function_call.name}"
+            missing = self._required[function_call.name] - set(function_call.args or {})
+            if missing:
+                return f"{function_call.name} missing {', '.join(sorted(missing))}"
+        if not function_calls and not text.strip():
+            return "empty reply"
+        return None
+
+    def record(self, model: str, started: float, cost: float = 0.0, ok: bool = True):
+        stats = self._stats[model]
+        stats["calls"] += 1
+        stats["seconds"] += time.perf_counter() - started
+        stats["cost"] += cost
+        if not ok:
+            stats["failures"] += 1
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "escalation_paths": dict(self.escalations),
+            "models": {
+                model: {
+                    "calls": int(stats["calls"]),
+                    "failures": int(stats["failures"]),
+                    "mean_seconds": round(stats["seconds"] / stats["calls"], 3),
+                    "cost": round(stats["cost"], 6),
+                }
+                for model, stats in self._stats.items()
+                if stats["calls"]
+            },
+        }
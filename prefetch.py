@@ -0,0 +1,155 @@
+import asyncio
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from result_cache import canonical_args
+from tool_executor import ToolExecutor
+
+ISSUE_KEY_RE = re.compile(r"\b([A-Z][A-Z0-9]+-\d+)\b")
+SPRINT_RE = re.compile(r"\bsprint\s+(?:id\s+)?#?(\d+)\b", re.IGNORECASE)
+BOARD_RE = re.compile(r"\bboard\s+(?:id\s+)?#?(\d+)\b", re.IGNORECASE)
+
+
+def references(message: str) -> List[Tuple[str, dict]]:
+    """Read-only calls the model is likely to make for what ``message`` names.
+
+    Arguments are built exactly the way the model fills them in, since a
+    prefetch is only used for a call with identical arguments.
+    """
+    calls = []
+    for key in dict.fromkeys(ISSUE_KEY_RE.findall(message)):
+        calls.append(("jira_get_issue", {"issue_key": key}))
+    for sprint_id in dict.fromkeys(SPRINT_RE.findall(message)):
+        calls.append(("jira_get_sprint_issues", {"sprint_id": sprint_id}))
+    for board_id in dict.fromkeys(BOARD_RE.findall(message)):
+        calls.append(("jira_get_sprints_from_board", {"board_id": board_id}))
+    return calls
+
+
+class _Prefetch:
+    __slots__ = ("task", "started", "finished", "generation")
+
+    def __init__(self, task: asyncio.Task, generation: Optional[int]):
+        self.task = task
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.generation = generation
+
+
+class PrefetchSet:
+    """The speculative fetches started for one user turn."""
+
+    def __init__(self, prefetcher: "Prefetcher", scope: str):
+        self.prefetcher = prefetcher
+        self.scope = scope
+        self._pending: Dict[Tuple[str, str], _Prefetch] = {}
+
+    def _fresh(self, prefetch: _Prefetch) -> bool:
+        cache = self.prefetcher.executor.cache
+        return cache is None or cache.generation(self.scope) == prefetch.generation
+
+    async def take(self, name: str, args: Optional[dict]):
+        """Result of the prefetch for this exact call, or ``None`` to call upstream.
+
+        A prefetch that a write in this cloud may have made stale is dropped.
+        """
+        prefetch = self._pending.pop((name, canonical_args(args)), None)
+        if prefetch is None:
+            return None
+        metrics = self.prefetcher.metrics
+        if not self._fresh(prefetch):
+            prefetch.task.cancel()
+            metrics["stale"] += 1
+            return None
+        claimed = time.perf_counter()
+        try:
+            result = await asyncio.shield(prefetch.task)
+        except Exception:
+            metrics["failed"] += 1
+            return None
+        if not self._fresh(prefetch) or getattr(result, "isError", False):
+            metrics["stale"] += 1
+            return None
+        metrics["used"] += 1
+        # Time the call would otherwise have spent waiting upstream
+        metrics["saved_seconds"] += min(claimed, prefetch.finished) - prefetch.started
+        return result
+
+    def close(self):
+        """Cancel or discard every prefetch the model did not ask for."""
+        for prefetch in self._pending.values():
+            if prefetch.task.done():
+                self.prefetcher.metrics["unused"] += 1
+            else:
+                prefetch.task.cancel()
+                self.prefetcher.metrics["cancelled"] += 1
+        self._pending.clear()
+
+
+class Prefetcher:
+    """Start fetches for issues, sprints and boards a message mentions.
+
+    They run while the model is still generating, so when its function call
+    arrives the result is already there or on its way. They go through the
+    executor's coalescer under the same key as real calls, so a real call
+    racing a prefetch joins it instead of fetching again. Results land in
+    the tool result cache as well, and anything already cached is not
+    fetched.
+    """
+
+    def __init__(
+        self,
+        executor: ToolExecutor,
+        max_references: int = 3,
+        call_timeout: float = 30.0,
+    ):
+        self.executor = executor
+        self.max_references = max_references
+        self.call_timeout = call_timeout
+        self.metrics = {
+            "started": 0,
+            "used": 0,
+            "unused": 0,
+            "cancelled": 0,
+            "stale": 0,
+            "failed": 0,
+            "saved_seconds": 0.0,
+        }
+
+    async def _fetch(self, prefetch: _Prefetch, session, name, args, scope):
+        try:
+            return await asyncio.wait_for(
+                self.executor.shared_fetch(session, name, args, scope),
+                timeout=self.call_timeout,
+            )
+        finally:
+            prefetch.finished = time.perf_counter()
+
+    def start(self, session, message: str, scope: str) -> PrefetchSet:
+        prefetched = PrefetchSet(self, scope)
+        if self.max_references <= 0:
+            return prefetched
+        cache = self.executor.cache
+        for name, args in references(message)[: self.max_references]:
+            if cache is not None and cache.contains(scope, name, args):
+                continue
+            generation = cache.generation(scope) if cache is not None else None
+            prefetch = _Prefetch(None, generation)
+            prefetch.task = asyncio.create_task(
+                self._fetch(prefetch, session, name, args, scope)
+            )
+            # Nobody may await a prefetch that fails, so mark it retrieved
+            prefetch.task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            prefetched._pending[(name, canonical_args(args))] = prefetch
+            self.metrics["started"] += 1
+        return prefetched
+
+    def stats(self) -> dict:
+        settled = self.metrics["used"] + self.metrics["unused"]
+        settled += self.metrics["cancelled"] + self.metrics["stale"]
+        return {
+            **self.metrics,
+            "saved_seconds": round(self.metrics["saved_seconds"], 3),
+            "accuracy": round(self.metrics["used"] / settled, 4) if settled else 0.0,
+        }
@@ -0,0 +1,322 @@
+"""Retries with backoff, retry budgets and circuit breaking for upstream calls.
+
+Each upstream (Gemini, the MCP server) gets an ``Upstream`` that classifies
+errors, retries the transient ones with exponential backoff and full jitter,
+and draws every retry from a budget earned by first attempts so an outage
+cannot multiply the load it is under. A circuit breaker fails calls fast
+while the upstream keeps failing and lets a single probe through once
+``reset_timeout`` has passed; calls made with a ``key`` trip a breaker of
+their own, so one failing Jira cloud does not fail the others.
+"""
+
+import asyncio
+import random
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import httpx
+from google.genai import errors as genai_errors
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+
+from log import get_logger
+
+logger = get_logger(__name__)
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """The upstream is failing and calls are refused until it recovers."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(
+            f"{name} is unavailable, retry in about {max(retry_after, 1):.0f}s"
+        )
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether ``exc`` is worth retrying: timeouts, dropped connections, 429/5xx."""
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if isinstance(exc, (httpx.TimeoutException, httpx.NetworkError)):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUS
+    if isinstance(exc, genai_errors.APIError):
+        return exc.code in RETRYABLE_STATUS
+    if isinstance(exc, McpError):
+        return exc.error.code in (CONNECTION_CLOSED, httpx.codes.REQUEST_TIMEOUT)
+    return False
+
+
+class RetryPolicy:
+    def __init__(
+        self, max_attempts: int = 3, base_delay: float = 0.25, max_delay: float = 4.0
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, retry: int) -> float:
+        """Full jitter backoff before retry number ``retry`` (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**retry))
+
+
+class RetryBudget:
+    """Allow retries up to ``ratio`` of first attempts, plus a small floor.
+
+    Every first attempt deposits ``ratio`` of a retry and the balance also
+    refills at ``min_per_second`` so a quiet service can still retry.
+    """
+
+    def __init__(
+        self, ratio: float = 0.2, min_per_second: float = 1.0, max_balance: float = 10
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_balance = max_balance
+        self.balance = max_balance
+        self.updated = time.monotonic()
+
+    def _refill(self, amount: float = 0.0):
+        now = time.monotonic()
+        self.balance = min(
+            self.max_balance,
+            self.balance + amount + (now - self.updated) * self.min_per_second,
+        )
+        self.updated = now
+
+    def record_attempt(self):
+        self._refill(self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self.balance < 1:
+            return False
+        self.balance -= 1
+        return True
+
+
+class CircuitBreaker:
+    """Open after ``failure_threshold`` consecutive failures."""
+
+    def __init__(
+        self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started: Optional[float] = None
+        self.metrics = {"opened": 0, "rejected": 0}
+
+    def before_call(self):
+        if self.state == CLOSED:
+            return
+        remaining = self.opened_at + self.reset_timeout - time.monotonic()
+        if self.state == OPEN and remaining <= 0:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            # Let one call find out whether the upstream is back; a probe
+            # that never reported (cancelled) is replaced after a while
+            now = time.monotonic()
+            if (
+                self.probe_started is None
+                or now - self.probe_started > self.reset_timeout
+            ):
+                self.probe_started = now
+                return
+        self.metrics["rejected"] += 1
+        raise CircuitOpenError(self.name, max(remaining, 0.0))
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.probe_started = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.metrics["opened"] += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self.probe_started = None
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+        }
+
+
+class Upstream:
+    """Retry policy, retry budget and circuit breakers for one upstream.
+
+    ``breaker`` guards calls made without a key; each ``key`` gets a breaker
+    configured like it. ``before_retry`` is awaited before every retry, for
+    callers that must admit each attempt against a rate limit.
+    """
+
+    # Keyed breakers kept before healthy ones are forgotten
+    max_keyed_breakers = 1024
+
+    def __init__(
+        self,
+        name: str,
+        policy: Optional[RetryPolicy] = None,
+        budget: Optional[RetryBudget] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        classify: Callable[[BaseException], bool] = is_transient,
+    ):
+        self.name = name
+        self.policy = policy or RetryPolicy()
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker(name)
+        self.classify = classify
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.metrics = {
+            "calls": 0,
+            "retries": 0,
+            "failures": 0,
+            "budget_exhausted": 0,
+        }
+
+    def breaker_for(self, key: Optional[str]) -> CircuitBreaker:
+        if key is None:
+            return self.breaker
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            if len(self._breakers) >= self.max_keyed_breakers:
+                self._breakers = {
+                    k: b
+                    for k, b in self._breakers.items()
+                    if b.state != CLOSED or b.failures
+                }
+            breaker = self._breakers[key] = CircuitBreaker(
+                f"{self.name} ({key})",
+                self.breaker.failure_threshold,
+                self.breaker.reset_timeout,
+            )
+        return breaker
+
+    def _failed(self, exc: BaseException, breaker: CircuitBreaker) -> bool:
+        """Record an error; ``True`` if it says the upstream itself is unwell."""
+        if not self.classify(exc):
+            # The upstream answered, the request was just wrong
+            breaker.record_success()
+            return False
+        breaker.record_failure()
+        return True
+
+    async def _backoff(
+        self,
+        exc: BaseException,
+        retry: int,
+        retryable: bool,
+        before_retry: Optional[Callable[[], Awaitable]] = None,
+    ):
+        if not retryable or retry >= self.policy.max_attempts:
+            raise exc
+        if not self.budget.try_spend():
+            self.metrics["budget_exhausted"] += 1
+            raise exc
+        self.metrics["retries"] += 1
+        delay = self.policy.delay(retry)
+        logger.info(f"{self.name}: retry {retry} in {delay:.2f}s after {exc!r}")
+        await asyncio.sleep(delay)
+        if before_retry is not None:
+            await before_retry()
+
+    async def call(
+        self,
+        fn: Callable[[], Awaitable],
+        retryable: bool = True,
+        key: Optional[str] = None,
+        before_retry: Optional[Callable[[], Awaitable]] = None,
+    ):
+        """Await ``fn()``, retrying transient failures if ``retryable``."""
+        self.metrics["calls"] += 1
+        self.budget.record_attempt()
+        breaker = self.breaker_for(key)
+        retry = 0
+        while True:
+            breaker.before_call()
+            try:
+                result = await fn()
+            except Exception as e:
+                if not self._failed(e, breaker):
+                    raise
+                self.metrics["failures"] += 1
+                retry += 1
+                await self._backoff(e, retry, retryable, before_retry)
+                continue
+            breaker.record_success()
+            return result
+
+    async def stream(
+        self,
+        open_stream: Callable[[], Awaitable[AsyncIterator]],
+        key: Optional[str] = None,
+        before_retry: Optional[Callable[[], Awaitable]] = None,
+    ) -> AsyncIterator:
+        """Iterate a stream, retrying only until its first item arrives.
+
+        Once something was yielded it may already be on the user's screen,
+        so a later failure is raised instead of replaying the stream.
+        """
+        self.metrics["calls"] += 1
+        self.budget.record_attempt()
+        breaker = self.breaker_for(key)
+        retry = 0
+        while True:
+            breaker.before_call()
+            try:
+                stream = await open_stream()
+                first = await stream.__anext__()
+            except StopAsyncIteration:
+                breaker.record_success()
+                return
+            except Exception as e:
+                if not self._failed(e, breaker):
+                    raise
+                self.metrics["failures"] += 1
+                retry += 1
+                await self._backoff(e, retry, True, before_retry)
+                continue
+            break
+        breaker.record_success()
+        try:
+            yield first
+            async for item in stream:
+                yield item
+        except Exception as e:
+            if self._failed(e, breaker):
+                self.metrics["failures"] += 1
+            raise
+        finally:
+            # Also when the consumer stops early, so the connection is freed
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        breaker.record_success()
+
+    def stats(self) -> dict:
+        return {
+            **self.metrics,
+            "circuit": self.breaker.stats(),
+            "keyed_circuits": len(self._breakers),
+            "open_keyed_circuits": sum(
+                1 for breaker in self._breakers.values() if breaker.state != CLOSED
+            ),
+        }
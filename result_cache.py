@@ -0,0 +1,258 @@
+import json
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Optional, Set, Tuple
+
+# Read-only tools whose results may be cached, with their TTL in seconds
+READ_ONLY_TOOL_TTLS = {
+    "jira_get_issue": 60,
+    "jira_search": 60,
+    "jira_get_project_issues": 60,
+    "jira_get_board_issues": 60,
+    "jira_get_sprint_issues": 60,
+    "jira_get_transitions": 300,
+    "jira_get_worklog": 60,
+    "jira_batch_get_changelogs": 60,
+    "jira_get_sprints_from_board": 120,
+    "jira_get_agile_boards": 600,
+    "jira_search_fields": 3600,
+    "jira_get_link_types": 3600,
+}
+
+# Result kinds that a mutation can change without naming them in its arguments
+ISSUE_LISTS = "kind:issue_lists"
+SPRINT_LISTS = "kind:sprint_lists"
+BOARDS = "kind:boards"
+ISSUES = "kind:issues"
+
+READ_KINDS = {
+    "jira_get_issue": ISSUES,
+    "jira_search": ISSUE_LISTS,
+    "jira_get_project_issues": ISSUE_LISTS,
+    "jira_get_board_issues": ISSUE_LISTS,
+    "jira_get_sprint_issues": ISSUE_LISTS,
+    "jira_get_sprints_from_board": SPRINT_LISTS,
+    "jira_get_agile_boards": BOARDS,
+}
+
+MUTATION_KINDS = {
+    "jira_create_issue": {ISSUE_LISTS},
+    "jira_batch_create_issues": {ISSUE_LISTS},
+    "jira_update_issue": {ISSUE_LISTS},
+    "jira_transition_issue": {ISSUE_LISTS},
+    "jira_delete_issue": {ISSUE_LISTS},
+    "jira_link_to_epic": {ISSUE_LISTS},
+    "jira_create_issue_link": set(),
+    "jira_create_remote_issue_link": set(),
+    # Only the link id is known, so any cached issue may still show the link
+    "jira_remove_issue_link": {ISSUES},
+    "jira_add_comment": set(),
+    "jira_add_worklog": set(),
+    "jira_create_sprint": {SPRINT_LISTS},
+    "jira_update_sprint": {SPRINT_LISTS, ISSUE_LISTS},
+}
+
+# Tools that change nothing in Jira but are not worth caching
+UNCACHED_READ_TOOLS = {
+    "jira_get_user_profile",
+    "jira_download_attachments",
+    "jira_search_local",
+}
+
+ISSUE_ARGS = ("issue_key", "inward_issue_key", "outward_issue_key", "epic_key")
+
+CacheKey = Tuple[str, str, str]
+
+
+def permission_scope(cloud_id: str, principal: str) -> str:
+    """Scope of one user's tool results on one Jira cloud.
+
+    Jira only returns what the caller may see, so a result fetched for one
+    user is never served to another.
+    """
+    return f"{cloud_id}/{principal}"
+
+
+def cloud_of(scope: str) -> str:
+    return scope.split("/", 1)[0]
+
+
+def canonical_args(args: Optional[dict]) -> str:
+    """Stable text form of tool arguments, ignoring unset values."""
+    if not args:
+        return "{}"
+    return json.dumps(
+        {k: v for k, v in args.items() if v is not None},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+
+
+def args_tags(args: Optional[dict]) -> Set[str]:
+    """Issue, sprint and board tags named by a tool call's arguments."""
+    tags = set()
+    if not args:
+        return tags
+    for name in ISSUE_ARGS:
+        if args.get(name):
+            tags.add(f"issue:{str(args[name]).upper()}")
+    for key in args.get("issue_ids_or_keys") or []:
+        tags.add(f"issue:{str(key).upper()}")
+    if args.get("board_id"):
+        tags.add(f"board:{args['board_id']}")
+    if args.get("sprint_id"):
+        tags.add(f"sprint:{args['sprint_id']}")
+    return tags
+
+
+def _result_size(result) -> int:
+    try:
+        return sum(len(block.text) for block in result.content)
+    except (AttributeError, TypeError):
+        return len(str(result))
+
+
+class _Entry:
+    __slots__ = ("result", "expires_at", "size", "tags")
+
+    def __init__(self, result, expires_at: float, size: int, tags: Set[str]):
+        self.result = result
+        self.expires_at = expires_at
+        self.size = size
+        self.tags = tags
+
+
+class ToolResultCache:
+    """LRU + TTL cache of read-only MCP tool results.
+
+    Entries are keyed by ``(scope, tool, canonical args)`` where the scope is
+    a ``permission_scope``, so results are only shared by calls made with
+    the same user's permissions. Mutating tools invalidate the entries
+    tagged with the issues, sprints and boards they touch, plus any list
+    results they may change, for every user on the cloud. A per-cloud
+    generation counter stops a read that raced a write from storing its now
+    stale result. Total cached text is capped at ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: int = None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max_bytes // 8
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._tag_index: Dict[Tuple[str, str], Set[CacheKey]] = defaultdict(set)
+        self._generations: Dict[str, int] = defaultdict(int)
+        self.bytes = 0
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "expired": 0,
+            "evictions": 0,
+            "invalidations": 0,
+        }
+
+    @staticmethod
+    def is_cacheable(tool_name: str) -> bool:
+        return tool_name in READ_ONLY_TOOL_TTLS
+
+    def generation(self, scope: str) -> int:
+        return self._generations[cloud_of(scope)]
+
+    def contains(self, scope: str, tool_name: str, args: Optional[dict]) -> bool:
+        """Whether a live entry exists, without counting a hit or miss."""
+        entry = self._entries.get((scope, tool_name, canonical_args(args)))
+        return entry is not None and entry.expires_at > time.monotonic()
+
+    def get(self, scope: str, tool_name: str, args: Optional[dict]):
+        if not self.is_cacheable(tool_name):
+            return None
+        key = (scope, tool_name, canonical_args(args))
+        entry = self._entries.get(key)
+        if entry is None:
+            self.metrics["misses"] += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.metrics["expired"] += 1
+            self.metrics["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.metrics["hits"] += 1
+        return entry.result
+
+    def put(
+        self,
+        scope: str,
+        tool_name: str,
+        args: Optional[dict],
+        result,
+        generation: int = None,
+    ):
+        if not self.is_cacheable(tool_name) or getattr(result, "isError", False):
+            return
+        if generation is not None and generation != self.generation(scope):
+            return
+        size = _result_size(result)
+        if size > self.max_entry_bytes:
+            return
+        key = (scope, tool_name, canonical_args(args))
+        if key in self._entries:
+            self._remove(key)
+        tags = args_tags(args)
+        if tool_name in READ_KINDS:
+            tags.add(READ_KINDS[tool_name])
+        self._entries[key] = _Entry(
+            result, time.monotonic() + READ_ONLY_TOOL_TTLS[tool_name], size, tags
+        )
+        self.bytes += size
+        for tag in tags:
+            self._tag_index[(cloud_of(scope), tag)].add(key)
+        self.metrics["stores"] += 1
+        while self.bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.metrics["evictions"] += 1
+
+    def _remove(self, key: CacheKey):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= entry.size
+        cloud = cloud_of(key[0])
+        for tag in entry.tags:
+            keys = self._tag_index.get((cloud, tag))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[(cloud, tag)]
+
+    def invalidate_for(self, scope: str, tool_name: str, args: Optional[dict]):
+        """Drop the entries a call to mutating ``tool_name`` may have changed.
+
+        A write is seen by everyone, so every user's entries on the cloud of
+        ``scope`` are affected.
+        """
+        if self.is_cacheable(tool_name) or tool_name in UNCACHED_READ_TOOLS:
+            return
+        cloud = cloud_of(scope)
+        self._generations[cloud] += 1
+        if tool_name not in MUTATION_KINDS:
+            # Unknown write: nothing cached for this cloud can be trusted
+            keys = [key for key in self._entries if cloud_of(key[0]) == cloud]
+        else:
+            tags = args_tags(args) | MUTATION_KINDS[tool_name]
+            keys = set()
+            for tag in tags:
+                keys |= self._tag_index.get((cloud, tag), set())
+        for key in list(keys):
+            self._remove(key)
+            self.metrics["invalidations"] += 1
+
+    def stats(self) -> dict:
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "hit_rate": round(self.metrics["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,270 @@
+import asyncio
+import contextlib
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+# Priority classes, lower is served first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+QueuedCallback = Callable[[int, float], Awaitable[None]]
+
+
+class SchedulerBusyError(Exception):
+    """A model call was refused admission because the model is saturated."""
+
+    def __init__(self, model: str, retry_after: float):
+        super().__init__(f"{model} is at capacity, retry in about {retry_after:.0f}s")
+        self.model = model
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Continuously refilled bucket holding at most ``capacity`` units."""
+
+    def __init__(self, capacity: float, per_minute: float):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until ``amount`` units are available."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        """Remove ``amount``; the level may go negative to carry a debt."""
+        self._refill()
+        self.level -= amount
+
+    def give(self, amount: float):
+        """Return ``amount`` that was taken but not used."""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class Ticket:
+    """An admitted model call; ``settle`` it with the tokens it really used."""
+
+    __slots__ = ("model", "user", "priority", "tokens", "queued_at", "future")
+
+    def __init__(self, model: str, user: str, priority: int, tokens: int):
+        self.model = model
+        self.user = user
+        self.priority = priority
+        self.tokens = tokens
+        self.queued_at = time.monotonic()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class _ModelQueue:
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm, rpm)
+        self.tokens = TokenBucket(tpm, tpm)
+        # Per priority class, waiting tickets per user in round robin order
+        self.queues: List["OrderedDict[str, Deque[Ticket]]"] = [
+            OrderedDict(),
+            OrderedDict(),
+        ]
+        self.depth = 0
+        self.wakeup = asyncio.Event()
+        self.dispatcher: Optional[asyncio.Task] = None
+
+    def push(self, ticket: Ticket):
+        self.queues[ticket.priority].setdefault(ticket.user, deque()).append(ticket)
+        self.depth += 1
+        self.wakeup.set()
+
+    def peek(self) -> Optional[Ticket]:
+        for users in self.queues:
+            while users:
+                user, tickets = next(iter(users.items()))
+                while tickets and tickets[0].future.done():
+                    # Gave up while waiting, already left ``depth``
+                    tickets.popleft()
+                if tickets:
+                    return tickets[0]
+                del users[user]
+        return None
+
+    def pop(self, ticket: Ticket):
+        users = self.queues[ticket.priority]
+        tickets = users.pop(ticket.user)
+        tickets.popleft()
+        self.depth -= 1
+        if tickets:
+            # Next turn for this user comes after everyone else waiting
+            users[ticket.user] = tickets
+
+    def take(self, ticket: Ticket):
+        self.requests.take(1)
+        self.tokens.take(ticket.tokens)
+
+    def abandon(self, ticket: Ticket):
+        """Give up on ``ticket``: stop waiting, or hand back what it was granted."""
+        if not ticket.future.done():
+            # The dispatcher drops it once it reaches the head
+            ticket.future.cancel()
+            self.depth -= 1
+        else:
+            self.requests.give(1)
+            self.tokens.give(ticket.tokens)
+            self.wakeup.set()
+
+    def estimated_wait(self, tokens: int) -> float:
+        """Rough wait for a new call given what is queued ahead of it."""
+        queued_tokens = tokens + sum(
+            ticket.tokens
+            for users in self.queues
+            for tickets in users.values()
+            for ticket in tickets
+            if not ticket.future.done()
+        )
+        return max(
+            (self.depth + 1 - self.requests.level) / self.requests.rate,
+            (queued_tokens - self.tokens.level) / self.tokens.rate,
+            0.0,
+        )
+
+
+class GeminiScheduler:
+    """Admission control shared by every Gemini call in the process.
+
+    Each model gets a request bucket and a token bucket sized from its RPM and
+    TPM limits. Calls wait in per-user queues served round robin, with
+    interactive turns always ahead of background summaries and formatting.
+    A call is refused with ``SchedulerBusyError`` instead of queueing when
+    the queue is already ``max_queue_depth`` deep or it would wait longer
+    than ``max_wait`` seconds. Models without limits are admitted at once.
+
+    The limits are per API key, so with ``workers`` processes sharing a key
+    each process keeps to its share of them.
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[int, int]],
+        max_queue_depth: int = 100,
+        max_wait: float = 30.0,
+        notify_after: float = 1.0,
+        workers: int = 1,
+    ):
+        self.limits = limits
+        self.workers = max(workers, 1)
+        self.max_queue_depth = max_queue_depth
+        self.max_wait = max_wait
+        self.notify_after = notify_after
+        self._models: Dict[str, _ModelQueue] = {}
+        self._waits: Deque[float] = deque(maxlen=1000)
+        self.metrics = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+
+    def _queue(self, model: str) -> Optional[_ModelQueue]:
+        if model not in self.limits:
+            return None
+        queue = self._models.get(model)
+        if queue is None:
+            rpm, tpm = self.limits[model]
+            queue = self._models[model] = _ModelQueue(
+                max(rpm / self.workers, 1), max(tpm / self.workers, 1)
+            )
+        if queue.dispatcher is None or queue.dispatcher.done():
+            queue.dispatcher = asyncio.create_task(self._dispatch(queue))
+        return queue
+
+    async def _dispatch(self, queue: _ModelQueue):
+        while True:
+            ticket = queue.peek()
+            if ticket is None:
+                queue.wakeup.clear()
+                await queue.wakeup.wait()
+                continue
+            delay = max(queue.requests.delay(1), queue.tokens.delay(ticket.tokens))
+            if delay > 0:
+                # A higher priority arrival may take the slot in the meantime
+                queue.wakeup.clear()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(queue.wakeup.wait(), timeout=delay)
+                continue
+            queue.pop(ticket)
+            queue.take(ticket)
+            ticket.future.set_result(None)
+
+    async def admit(
+        self,
+        model: str,
+        user: str,
+        tokens: int,
+        priority: int = INTERACTIVE,
+        on_queued: Optional[QueuedCallback] = None,
+    ) -> Ticket:
+        """Wait for capacity to call ``model`` with about ``tokens`` tokens.
+
+        ``on_queued(position, estimated_wait)`` is awaited once if the call
+        is still waiting after ``notify_after`` seconds.
+        """
+        ticket = Ticket(model, user, priority, tokens)
+        queue = self._queue(model)
+        if queue is None:
+            self.metrics["admitted"] += 1
+            return ticket
+        if queue.peek() is None and not max(
+            queue.requests.delay(1), queue.tokens.delay(tokens)
+        ):
+            queue.take(ticket)
+            self._admitted(ticket)
+            return ticket
+        estimated_wait = queue.estimated_wait(tokens)
+        if queue.depth >= self.max_queue_depth or estimated_wait > self.max_wait:
+            self.metrics["rejected"] += 1
+            raise SchedulerBusyError(model, estimated_wait)
+        self.metrics["queued"] += 1
+        queue.push(ticket)
+        granted = False
+        try:
+            done, _ = await asyncio.wait({ticket.future}, timeout=self.notify_after)
+            if not done and on_queued is not None:
+                await on_queued(queue.depth, queue.estimated_wait(0))
+            remaining = self.max_wait - (time.monotonic() - ticket.queued_at)
+            await asyncio.wait_for(asyncio.shield(ticket.future), max(remaining, 0))
+            granted = True
+        except asyncio.TimeoutError:
+            self.metrics["timed_out"] += 1
+            raise SchedulerBusyError(model, queue.estimated_wait(tokens)) from None
+        finally:
+            if not granted:
+                # Also when the grant raced the timeout or a cancellation
+                queue.abandon(ticket)
+        self._admitted(ticket)
+        return ticket
+
+    def _admitted(self, ticket: Ticket):
+        self.metrics["admitted"] += 1
+        self._waits.append(time.monotonic() - ticket.queued_at)
+
+    def settle(self, ticket: Ticket, tokens: int):
+        """Correct the token bucket once a call reports its real usage."""
+        queue = self._models.get(ticket.model)
+        if queue is not None and tokens:
+            queue.tokens.take(tokens - ticket.tokens)
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+        return {
+            **self.metrics,
+            "queue_depth": {
+                model: queue.depth for model, queue in self._models.items()
+            },
+            "wait_seconds": {
+                "mean": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                "p95": round(waits[int(len(waits) * 0.95)], 4) if waits else 0.0,
+                "max": round(waits[-1], 4) if waits else 0.0,
+            },
+        }
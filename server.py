@@ -11,36 +11,53 @@ from google import genai
 from google.genai.types import GenerateContentConfig, AutomaticFunctionCallingConfig
 import os
 from dotenv import load_dotenv
-import httpx
 import aiohttp
 from fastapi.concurrency import run_in_threadpool
-from typing import Dict, Optional
+from typing import List, Optional, Tuple
 from dotenv import load_dotenv
 import subprocess
 
 app = FastAPI()
 from fastapi.staticfiles import StaticFiles
-from mcp.client.streamable_http import streamablehttp_client
-from mcp import ClientSession
+from mcp_pool import MCPSessionPool
+from atlassian import AtlassianClient
+from user_store import MemoryUserStore, SQLiteUserStore, UserStore, profile_answer
+from drain import Drainer
+from conversation_store import (
+    ConversationStore,
+    SQLiteConversationStore,
+    new_token as new_conversation_token,
+)
+from tool_executor import ToolExecutor
+from result_cache import ToolResultCache, permission_scope
+from singleflight import SingleFlight
+import formatter
+from history import ConversationHistory
+from context_cache import ContextCache, is_cache_error
+from tool_router import ToolRouter
+from agent_loop import AgentBudget, function_response_part, project_result
+from compaction import compact
+from fast_path import FastPath
+from frame_writer import FrameBatcher, FrameWriter
+from prefetch import Prefetcher, PrefetchSet
+from resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, Upstream
+from model_router import ModelRouter
+import log
+from log import get_logger, log_payload
+from metrics import COST_BUCKETS, TOKEN_BUCKETS, registry, span, stage_seconds
+from scheduler import BACKGROUND, INTERACTIVE, GeminiScheduler, SchedulerBusyError
+from history import estimate_tokens
+from jira_mirror import TOOL_NAME as MIRROR_TOOL_NAME, SEARCH_TOOL, JiraMirror
 import base64
+import functools
+import hashlib
 import asyncio
+import time
 import json
 from google.genai import types
 from tools import tools
 import contextlib
-import signal
-
-
-# Ensure clean shutdown on SIGTERM/SIGINT
-def handle_exit(signum, frame):
-    print(f"Received signal {signum}, shutting down...")
-    import sys
-
-    sys.exit(0)
-
-
-signal.signal(signal.SIGTERM, handle_exit)
-signal.signal(signal.SIGINT, handle_exit)
+import importlib.util
 
 app.mount(
     "/assets", StaticFiles(directory="jira-chat-automator/dist/assets"), name="assets"
@@ -53,6 +70,7 @@ async def calculate_token_usage(response, model_name):
         "output_tokens": 0,
         "total_tokens": 0,
         "thinking_tokens": 0,
+        "cached_tokens": 0,
     }
     input_tokens = (
         response.usage_metadata.prompt_token_count
@@ -74,15 +92,28 @@ async def calculate_token_usage(response, model_name):
         if response.usage_metadata.total_token_count
         else 0
     )
+    cached_tokens = (
+        response.usage_metadata.cached_content_token_count
+        if response.usage_metadata.cached_content_token_count
+        else 0
+    )
 
     total_token_usage["input_tokens"] += input_tokens
     total_token_usage["output_tokens"] += output_tokens
     total_token_usage["total_tokens"] += total_tokens
     if thinking_tokens:
         total_token_usage["thinking_tokens"] += thinking_tokens
-    input_cost = (total_token_usage["input_tokens"] / 1_000_000) * MODEL_CONFIG[
-        f"{model_name}"
-    ]["input_price_per_million"]
+    total_token_usage["cached_tokens"] += cached_tokens
+    # Cached prefix tokens are part of the prompt but billed at the cached rate
+    pricing = MODEL_CONFIG[f"{model_name}"]
+    uncached_input_tokens = (
+        total_token_usage["input_tokens"] - total_token_usage["cached_tokens"]
+    )
+    input_cost = (uncached_input_tokens / 1_000_000) * pricing[
+        "input_price_per_million"
+    ] + (total_token_usage["cached_tokens"] / 1_000_000) * pricing[
+        "cached_input_price_per_million"
+    ]
     output_cost = (
         (total_token_usage["output_tokens"] + total_token_usage["thinking_tokens"])
         / 1_000_000
@@ -92,6 +123,47 @@ async def calculate_token_usage(response, model_name):
     return total_cost, total_token_usage
 
 
+def calculate_cache_savings(cached_tokens, model_name):
+    """Cost avoided by serving ``cached_tokens`` from the context cache."""
+    pricing = MODEL_CONFIG[f"{model_name}"]
+    return (cached_tokens / 1_000_000) * (
+        pricing["input_price_per_million"] - pricing["cached_input_price_per_million"]
+    )
+
+
+class TurnUsage:
+    """Token usage and cost accumulated over one user turn."""
+
+    def __init__(self):
+        self.cost = 0
+        self.cache_savings = 0
+        self.token_usage = {
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "thinking_tokens": 0,
+            "cached_tokens": 0,
+        }
+
+    async def add(self, response, model_name):
+        """Account one model call from the usage metadata of its final chunk."""
+        cost, token_usage = await calculate_token_usage(response, model_name)
+        self.cost += cost
+        for key in self.token_usage:
+            self.token_usage[key] += token_usage[key]
+        self.cache_savings += calculate_cache_savings(
+            token_usage["cached_tokens"], model_name
+        )
+        return cost
+
+    @property
+    def total_tokens(self):
+        return (
+            self.token_usage["input_tokens"]
+            + self.token_usage["output_tokens"]
+            + self.token_usage["thinking_tokens"]
+        )
+
+
 # Allow CORS for frontend
 app.add_middleware(
     CORSMiddleware,
@@ -113,31 +185,54 @@ async def get_aiohttp_client():
 
 
 load_dotenv()
+
+# Log records are written by a background thread, never on the event loop
+log.configure(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")),
+    debug_payloads=os.getenv("LOG_PAYLOADS", "0") == "1",
+    payload_sample_rate=float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.01")),
+    payload_max_chars=int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000")),
+)
+logger = get_logger("server")
 client = genai.Client(
     api_key=os.environ.get("GOOGLE_API_KEY"),
 )
 
 # Model pricing configuration
+# Prices per million tokens; rpm/tpm are the project's Gemini rate limits
 MODEL_CONFIG = {
     "gemini-2.5-flash": {
         "name": "gemini-2.5-flash",  # Or whichever model you are using
         "input_price_per_million": 0.3,
         "output_price_per_million": 2.5,
+        "cached_input_price_per_million": 0.075,
+        "rpm": 1000,
+        "tpm": 1_000_000,
     },
     "gemini-2.0-flash": {
         "name": "gemini-2.0-flash",  # Or whichever model you are using
         "input_price_per_million": 0.1,
         "output_price_per_million": 0.4,
+        "cached_input_price_per_million": 0.025,
+        "rpm": 2000,
+        "tpm": 4_000_000,
     },
     "gemini-2.0-flash-lite": {
         "name": "gemini-2.0-flash-lite",  # Or whichever model you are using
         "input_price_per_million": 0.075,
         "output_price_per_million": 0.3,
+        "cached_input_price_per_million": 0.01875,
+        "rpm": 4000,
+        "tpm": 4_000_000,
     },
     "gemma-3n-e4b-it": {
         "name": "gemma-3n-e4b-it",
         "input_price_per_million": 0,
         "output_price_per_million": 0,
+        "cached_input_price_per_million": 0,
+        "rpm": 30,
+        "tpm": 15_000,
     },
 }
 
@@ -145,11 +240,252 @@ JIRA_CLIENT_ID = os.getenv("JIRA_CLIENT_ID")
 JIRA_CLIENT_SECRET = os.getenv("JIRA_CLIENT_SECRET")
 CALLBACK_URL = os.getenv("CALLBACK_URL")
 
-# In-memory user store (replace with DB in production)
-users: Dict[str, dict] = {}
+# One pooled HTTP client for every Atlassian call of the OAuth callback
+atlassian = AtlassianClient(
+    ttl=float(os.getenv("ATLASSIAN_CACHE_TTL", "300")),
+    timeout=float(os.getenv("ATLASSIAN_HTTP_TIMEOUT", "10")),
+    http2=os.getenv("ATLASSIAN_HTTP2", "1") == "1",
+)
+
+# Jira profiles of logged in users, in a SQLite file when USER_STORE_PATH is set
+USER_STORE_PATH = os.getenv("USER_STORE_PATH", "")
+user_memory = MemoryUserStore(
+    max_entries=int(os.getenv("USER_STORE_MAX_ENTRIES", "10000")),
+    max_bytes=int(os.getenv("USER_STORE_MAX_BYTES", str(16 * 1024 * 1024))),
+    ttl=float(os.getenv("USER_STORE_TTL", "86400")),
+)
+user_store: UserStore = (
+    SQLiteUserStore(USER_STORE_PATH, user_memory) if USER_STORE_PATH else user_memory
+)
+
+# Chat histories saved after every turn so any worker can resume them
+CONVERSATION_STORE_PATH = os.getenv("CONVERSATION_STORE_PATH", "conversations.db")
+conversations: Optional[ConversationStore] = (
+    SQLiteConversationStore(
+        CONVERSATION_STORE_PATH,
+        ttl=float(os.getenv("CONVERSATION_TTL", str(7 * 86400))),
+    )
+    if CONVERSATION_STORE_PATH
+    else None
+)
+
+# On SIGTERM, running turns get DRAIN_DEADLINE seconds before sockets are sent away
+drainer = Drainer(
+    deadline=float(os.getenv("DRAIN_DEADLINE", "25")),
+    retry_after=float(os.getenv("DRAIN_RETRY_AFTER", "1")),
+)
 
-# Store chat sessions per client
-client_chats: Dict[str, any] = {}
+# Warm MCP sessions shared across WebSocket connections
+mcp_pool = MCPSessionPool(
+    max_sessions=int(os.getenv("MCP_POOL_MAX_SESSIONS", "100")),
+    idle_ttl=float(os.getenv("MCP_POOL_IDLE_TTL", "300")),
+    health_check_interval=float(os.getenv("MCP_POOL_HEALTH_CHECK_INTERVAL", "60")),
+)
+
+# Read-only tool results shared per Jira cloud
+tool_result_cache = ToolResultCache(
+    max_bytes=int(os.getenv("TOOL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+)
+
+# Retries with backoff and circuit breakers for Gemini and the MCP server
+UPSTREAM_MAX_ATTEMPTS = int(os.getenv("UPSTREAM_MAX_ATTEMPTS", "3"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", "30"))
+gemini_upstream = Upstream(
+    "Gemini",
+    RetryPolicy(max_attempts=UPSTREAM_MAX_ATTEMPTS),
+    breaker=CircuitBreaker("Gemini", CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS),
+)
+mcp_upstream = Upstream(
+    "Jira tools",
+    RetryPolicy(max_attempts=UPSTREAM_MAX_ATTEMPTS),
+    breaker=CircuitBreaker(
+        "Jira tools", CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS
+    ),
+)
+# Local SQLite copy of the projects the chat searches, kept in sync with Jira
+JIRA_MIRROR_ENABLED = os.getenv("JIRA_MIRROR_ENABLED", "1") == "1"
+jira_mirror = (
+    JiraMirror(
+        os.getenv("JIRA_MIRROR_PATH", "jira_mirror.db"),
+        upstream=mcp_upstream,
+        cache=tool_result_cache,
+        backfill_days=int(os.getenv("JIRA_MIRROR_BACKFILL_DAYS", "0")),
+        max_staleness=float(os.getenv("JIRA_MIRROR_MAX_STALENESS", "60")),
+        sync_timeout=float(os.getenv("JIRA_MIRROR_SYNC_TIMEOUT", "5")),
+        interval=float(os.getenv("JIRA_MIRROR_SYNC_INTERVAL", "30")),
+    )
+    if JIRA_MIRROR_ENABLED
+    else None
+)
+# MCP tools plus the ones answered in process
+chat_tools = tools + [SEARCH_TOOL] if jira_mirror is not None else tools
+
+# Runs all function calls of a model turn concurrently
+tool_executor = ToolExecutor(
+    max_concurrency=int(os.getenv("TOOL_CALL_CONCURRENCY", "4")),
+    call_timeout=float(os.getenv("TOOL_CALL_TIMEOUT", "60")),
+    cache=tool_result_cache,
+    coalescer=SingleFlight(),
+    upstream=mcp_upstream,
+    local_tools=(
+        {MIRROR_TOOL_NAME: jira_mirror.search} if jira_mirror is not None else None
+    ),
+)
+
+# Streamed text and events are batched into one frame per window
+frame_batcher = FrameBatcher(
+    flush_interval=float(os.getenv("WS_FLUSH_INTERVAL_MS", "20")) / 1000,
+    max_batch_chars=int(os.getenv("WS_MAX_BATCH_CHARS", "4096")),
+)
+
+# Estimated tokens of chat history resent per turn before older turns get summarized
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "8000"))
+HISTORY_KEEP_RECENT_TURNS = int(os.getenv("HISTORY_KEEP_RECENT_TURNS", "6"))
+
+SYSTEM_INSTRUCTION = (
+    "You are a helpful Jira assistant. Only answer questions related to Jira. "
+    "Do not answer anything except Jira-related queries. "
+    "Never ask the user for their identifier (email, username, key, or account ID); you already have all required context. "
+    "For any Jira action, use the provided tools and follow the tool descriptions and JQL examples. "
+    "Use JQL only when the tool description or parameters require a JQL query; do not use JQL for other tools. "
+    "Always return your response in beautiful markdown format, with tables and lists where appropriate, and make the output easy to read in a chat application. "
+    "Tool responses marked displayed=true have already been shown to the user as formatted tables; do not repeat them, only add a short summary or the next step. "
+    "Present tool responses marked displayed=false yourself. Chain further tool calls when the request needs them."
+)
+
+# Gemini cached content for the static system instruction and tool declarations
+context_cache = ContextCache(
+    client,
+    SYSTEM_INSTRUCTION,
+    chat_tools,
+    ttl_seconds=int(os.getenv("CONTEXT_CACHE_TTL", "3600")),
+    refresh_margin=int(os.getenv("CONTEXT_CACHE_REFRESH_MARGIN", "300")),
+)
+
+# Tools declared per turn when the context cache is unavailable; 0 sends all of them
+TOOL_ROUTING_TOP_K = int(os.getenv("TOOL_ROUTING_TOP_K", "6"))
+tool_router = ToolRouter(
+    chat_tools,
+    top_k=TOOL_ROUTING_TOP_K or len(chat_tools),
+    always_include=("jira_search", "jira_get_issue")
+    + ((MIRROR_TOOL_NAME,) if jira_mirror is not None else ()),
+)
+
+# Limits on model/tool round trips within a single user turn
+AGENT_MAX_STEPS = int(os.getenv("AGENT_MAX_STEPS", "5"))
+AGENT_TOKEN_BUDGET = int(os.getenv("AGENT_TOKEN_BUDGET", "200000"))
+AGENT_DEADLINE_SECONDS = float(os.getenv("AGENT_DEADLINE_SECONDS", "90"))
+
+# Answer mechanical lookups ("open PROJ-1") with a direct tool call
+fast_path = FastPath(enabled=os.getenv("FAST_PATH_ENABLED", "1") == "1")
+
+# Cheapest model that fits each turn, escalating when a step comes back weak
+model_router = ModelRouter(
+    chat_models=os.getenv(
+        "CHAT_MODELS", "gemini-2.0-flash-lite,gemini-2.0-flash,gemini-2.5-flash"
+    ).split(","),
+    # gemma-3n-e4b-it is free but allows 30 RPM, so it is opt-in
+    format_models=os.getenv(
+        "FORMAT_MODELS", "gemini-2.0-flash-lite,gemini-2.0-flash"
+    ).split(","),
+    tool_declarations=chat_tools,
+    default_chat_model="gemini-2.0-flash",
+    enabled=os.getenv("MODEL_ROUTING_ENABLED", "1") == "1",
+)
+
+# RELOAD=1 for development. Otherwise WORKERS processes share the port;
+# SIGTERM drains them and SIGHUP replaces them one at a time
+RELOAD = os.getenv("RELOAD", "0") == "1"
+WORKERS = 1 if RELOAD else int(os.getenv("WORKERS", "1"))
+
+# Every Gemini call is admitted through one scheduler sized from MODEL_CONFIG;
+# the quota is per API key, so each worker process gets its share of it
+scheduler = GeminiScheduler(
+    {name: (config["rpm"], config["tpm"]) for name, config in MODEL_CONFIG.items()},
+    max_queue_depth=int(os.getenv("MODEL_QUEUE_MAX_DEPTH", "100")),
+    max_wait=float(os.getenv("MODEL_QUEUE_MAX_WAIT", "30")),
+    workers=WORKERS,
+)
+# Declaration size of each tool, and the system prompt with all of them
+TOOL_TOKENS = {
+    declaration.name: len(tool.model_dump_json(exclude_none=True)) // 4
+    for tool in chat_tools
+    for declaration in tool.function_declarations or []
+}
+CHAT_PREFIX_TOKENS = len(SYSTEM_INSTRUCTION) // 4 + sum(TOOL_TOKENS.values())
+# Assumed reply size until the real usage is known
+EXPECTED_OUTPUT_TOKENS = 512
+
+# Fetch issues, sprints and boards named in a message while the model thinks
+prefetcher = Prefetcher(
+    tool_executor, max_references=int(os.getenv("PREFETCH_MAX_REFERENCES", "3"))
+)
+
+# Histograms and counters served on /metrics, next to component stats
+ttft_seconds = registry.histogram(
+    "ttft_seconds",
+    "Time to the first chunk of a chat model call",
+    label_names=("model",),
+)
+tool_seconds = registry.histogram(
+    "tool_seconds", "MCP tool call latency", label_names=("tool", "status")
+)
+turn_tokens = registry.histogram(
+    "turn_tokens", "Model tokens used per user turn", TOKEN_BUCKETS
+)
+turn_cost = registry.histogram(
+    "turn_cost_dollars", "Model cost per user turn", COST_BUCKETS
+)
+turns_total = registry.counter(
+    "turns_total", "User turns by path and outcome", ("path", "outcome")
+)
+for name, stats in (
+    ("mcp_pool", mcp_pool.stats),
+    ("tool_cache", tool_result_cache.stats),
+    ("singleflight", tool_executor.coalescer.stats),
+    ("tool_router", tool_router.stats),
+    ("context_cache", context_cache.stats),
+    ("fast_path", fast_path.stats),
+    ("prefetch", prefetcher.stats),
+    ("scheduler", scheduler.stats),
+    ("model_router", model_router.stats),
+    ("gemini_upstream", gemini_upstream.stats),
+    ("mcp_upstream", mcp_upstream.stats),
+    ("log", log.stats),
+    ("ws_frames", frame_batcher.stats),
+    ("atlassian", atlassian.stats),
+    ("user_store", user_store.stats),
+    ("drain", drainer.stats),
+):
+    registry.add_stats(name, stats)
+if conversations is not None:
+    registry.add_stats("conversations", conversations.stats)
+if jira_mirror is not None:
+    registry.add_stats("jira_mirror", jira_mirror.stats)
+
+
+@app.on_event("startup")
+async def app_startup():
+    mcp_pool.start()
+    if jira_mirror is not None:
+        jira_mirror.start()
+    drainer.install(asyncio.get_running_loop())
+    app.state.ready = True
+
+
+@app.get("/livez")
+async def liveness():
+    """The worker's event loop is serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readiness():
+    """Whether this worker takes new conversations; not while it drains."""
+    if drainer.draining or not getattr(app.state, "ready", False):
+        return JSONResponse({"status": "draining"}, status_code=503)
+    return {"status": "ready", "connections": len(drainer.connections)}
 
 
 # Serve index.html at root
@@ -158,273 +494,905 @@ def serve_react_index():
     return FileResponse("jira-chat-automator/dist/index.html")
 
 
+class InstrumentedWebSocket:
+    """WebSocket proxy that times every frame sent as the ``ws_send`` stage."""
+
+    def __init__(self, websocket: WebSocket):
+        self._websocket = websocket
+
+    def __getattr__(self, name):
+        return getattr(self._websocket, name)
+
+    async def send_text(self, data: str):
+        with span("ws_send"):
+            await self._websocket.send_text(data)
+
+
+async def send_status(writer: FrameWriter, status: str, message: str, **details):
+    """Send a ``status`` event: queued, busy or unavailable."""
+    await writer.event("status", status=status, message=message, **details)
+
+
+def queue_notifier(writer: FrameWriter):
+    """Tell the client its request is waiting for model capacity."""
+
+    async def on_queued(position: int, estimated_wait: float):
+        await send_status(
+            writer,
+            "queued",
+            "The assistant is busy, your request is queued.",
+            position=position,
+            retry_after=round(estimated_wait, 1),
+        )
+
+    return on_queued
+
+
+def estimate_request_tokens(contents, prefix_tokens: int = 0) -> int:
+    if isinstance(contents, str):
+        tokens = len(contents) // 4
+    elif isinstance(contents, types.Content):
+        tokens = estimate_tokens(contents)
+    else:
+        tokens = sum(estimate_tokens(content) for content in contents)
+    return tokens + prefix_tokens + EXPECTED_OUTPUT_TOKENS
+
+
+async def scheduled_stream(
+    model: str,
+    contents,
+    config: types.GenerateContentConfig,
+    user: str,
+    priority: int = INTERACTIVE,
+    on_queued=None,
+    prefix_tokens: int = 0,
+):
+    """``generate_content_stream`` admitted through the shared scheduler.
+
+    Transient failures are retried until the first chunk arrives, never after,
+    and every retry is admitted again like a request of its own.
+    """
+    tokens = estimate_request_tokens(contents, prefix_tokens)
+    tickets = [await scheduler.admit(model, user, tokens, priority, on_queued)]
+
+    async def readmit():
+        tickets.append(await scheduler.admit(model, user, tokens, priority))
+
+    used = 0
+    try:
+        async with contextlib.aclosing(
+            gemini_upstream.stream(
+                lambda: client.aio.models.generate_content_stream(
+                    model=model, contents=contents, config=config
+                ),
+                before_retry=readmit,
+            )
+        ) as stream:
+            async for chunk in stream:
+                if chunk.usage_metadata and chunk.usage_metadata.total_token_count:
+                    used = chunk.usage_metadata.total_token_count
+                yield chunk
+    finally:
+        scheduler.settle(tickets[-1], used)
+
+
+async def stream_rendered_result(writer: FrameWriter, rendered) -> str:
+    """Stream locally rendered markdown rows; the writer batches them into frames."""
+    streamed_text = ""
+    for row in rendered:
+        streamed_text += row
+        await writer.text(row)
+    return streamed_text
+
+
+async def stream_formatted_result(
+    writer: FrameWriter, result_content: str, usage: TurnUsage, user: str
+) -> str:
+    """Stream a model-written markdown rendering of a tool result to the client."""
+    streamed_text = ""
+    # Ask Gemini to format the tool result in markdown, and stream the markdown response
+    format_prompt = types.Content(
+        role="user",
+        parts=[
+            types.Part.from_text(
+                text=f"Format this result for display to the user in markdown: {result_content}. and format the markdown in a format so it's easily readable in a chat application. and just return the result not any extra content"
+            )
+        ],
+    )
+    model = model_router.format_model(result_content)
+    fallback = model_router.format_models[-1]
+    while True:
+        started = time.perf_counter()
+        usage_chunk = None
+        try:
+            async with contextlib.aclosing(
+                scheduled_stream(
+                    model,
+                    format_prompt,
+                    types.GenerateContentConfig(
+                        response_mime_type="text/plain",
+                    ),
+                    user,
+                    BACKGROUND,
+                )
+            ) as stream:
+                async for func_chunk in stream:
+                    try:
+                        if func_chunk.usage_metadata:
+                            usage_chunk = func_chunk
+                        if hasattr(func_chunk, "text") and func_chunk.text:
+                            chunk_text = func_chunk.text
+                            chunk_text = chunk_text.replace("```markdown", "").replace(
+                                "```", ""
+                            )
+                            streamed_text += chunk_text
+                            await writer.text(chunk_text)
+                    except Exception as chunk_err:
+                        logger.warning(f"Chunk streaming error: {chunk_err}")
+                        log_payload(logger, "Unprocessed chunk", func_chunk)
+                        continue
+        except SchedulerBusyError as e:
+            # A saturated small model is no failure; try the fallback's quota
+            if streamed_text or model == fallback:
+                raise
+            logger.info(f"Formatting with {model} refused, using {fallback}: {e}")
+            model = fallback
+            continue
+        except CircuitOpenError:
+            raise
+        except asyncio.CancelledError:
+            if usage_chunk is not None:
+                await usage.add(usage_chunk, model)
+            raise
+        except Exception as e:
+            model_router.record(model, started, ok=False)
+            if streamed_text or model == fallback:
+                raise
+            logger.warning(f"Formatting with {model} failed, using {fallback}: {e}")
+            model = fallback
+            continue
+        cost = await usage.add(usage_chunk, model) if usage_chunk is not None else 0
+        model_router.record(model, started, cost)
+        return streamed_text
+
+
+def routing_is_cheaper(model: str, tool_names: List[str]) -> bool:
+    """Whether declaring only ``tool_names`` inline costs less than the cache.
+
+    The cached prefix declares every tool but is billed at the cached rate;
+    a routed prefix is smaller but billed in full.
+    """
+    pricing = MODEL_CONFIG.get(model)
+    if pricing is None:
+        return False
+    routed = len(SYSTEM_INSTRUCTION) // 4 + sum(
+        TOOL_TOKENS.get(name, 0) for name in tool_names
+    )
+    return (
+        routed * pricing["input_price_per_million"]
+        < CHAT_PREFIX_TOKENS * pricing["cached_input_price_per_million"]
+    )
+
+
+async def open_chat_stream(
+    model: str,
+    contents,
+    tool_names: Optional[List[str]] = None,
+    user: str = "anonymous",
+    on_queued=None,
+):
+    """Stream a chat completion, declaring only ``tool_names`` when that is cheaper.
+
+    With ``tool_names`` routed for the turn, the request declares just
+    those tools inline whenever that costs less than the cached system
+    prompt with every tool. If the model reaches for another tool before
+    anything was streamed, it is retried once with every tool. Otherwise the
+    cached prefix is used when available, falling back to sending it inline
+    if the cache is missing or rejected. Every request goes through
+    ``scheduler``.
+    """
+    schedule = dict(user=user, on_queued=on_queued)
+    routed = bool(tool_names) and routing_is_cheaper(model, tool_names)
+    cache_name = None if routed else await context_cache.get(model)
+    if cache_name:
+        async with contextlib.aclosing(
+            scheduled_stream(
+                model,
+                contents,
+                types.GenerateContentConfig(
+                    cached_content=cache_name,
+                    response_mime_type="text/plain",
+                ),
+                prefix_tokens=CHAT_PREFIX_TOKENS,
+                **schedule,
+            )
+        ) as stream:
+            try:
+                first_chunk = await stream.__anext__()
+            except StopAsyncIteration:
+                return
+            except Exception as e:
+                # Anything else, such as a 429, would fail inline as well
+                if not is_cache_error(e):
+                    raise
+                logger.warning(f"Cached request failed, retrying without cache: {e}")
+                context_cache.invalidate(model)
+            else:
+                yield first_chunk
+                async for chunk in stream:
+                    yield chunk
+                return
+    if routed:
+        selected = set(tool_names)
+        async with contextlib.aclosing(
+            scheduled_stream(
+                model,
+                contents,
+                types.GenerateContentConfig(
+                    system_instruction=SYSTEM_INSTRUCTION,
+                    tools=tool_router.tools_for(tool_names),
+                    response_mime_type="text/plain",
+                ),
+                prefix_tokens=CHAT_PREFIX_TOKENS,
+                **schedule,
+            )
+        ) as stream:
+            yielded = False
+            async for chunk in stream:
+                if not yielded and tool_router.needs_widening(chunk, selected):
+                    tool_router.metrics["widened"] += 1
+                    break
+                yielded = True
+                yield chunk
+            else:
+                return
+    async with contextlib.aclosing(
+        scheduled_stream(
+            model,
+            contents,
+            types.GenerateContentConfig(
+                system_instruction=SYSTEM_INSTRUCTION,
+                tools=chat_tools,
+                response_mime_type="text/plain",
+            ),
+            prefix_tokens=CHAT_PREFIX_TOKENS,
+            **schedule,
+        )
+    ) as stream:
+        async for chunk in stream:
+            yield chunk
+
+
+async def execute_function_calls(
+    writer: FrameWriter,
+    session,
+    function_calls,
+    scope: str,
+    message: str,
+    prefetched: Optional[PrefetchSet] = None,
+    profile: Optional[dict] = None,
+):
+    """Run a step's function calls concurrently and show each result as it lands.
+
+    A profile lookup of the current user, whose Jira ``profile`` is known
+    since login, is answered without a tool call. Returns the function
+    response parts for the model, the text streamed to the client and the
+    outcomes that could not be rendered locally.
+    """
+    calls = [
+        (tool_executor.call_id(function_call), function_call)
+        for function_call in function_calls
+    ]
+    by_id = dict(calls)
+    # Send tool call notifications for every call up front
+    for call_id, function_call in calls:
+        await writer.event(
+            "tool_call_start",
+            id=call_id,
+            tool=function_call.name,
+            args=function_call.args,
+        )
+    responses = {}
+    streamed_text = ""
+    unrendered = []
+    async for outcome in tool_executor.execute(
+        session,
+        calls,
+        scope=scope,
+        prefetched=prefetched,
+        local_answer=functools.partial(profile_answer, profile) if profile else None,
+    ):
+        log_payload(
+            logger,
+            "Tool result",
+            outcome.result,
+            tool=outcome.name,
+            call_id=outcome.call_id,
+            ok=outcome.ok,
+        )
+        tool_seconds.observe(
+            outcome.elapsed,
+            tool=outcome.name,
+            status=(
+                "error"
+                if not outcome.ok
+                else (
+                    "cached"
+                    if outcome.cached
+                    else "prefetched" if outcome.prefetched else "ok"
+                )
+            ),
+        )
+        # Send tool call end notification
+        await writer.event(
+            "tool_call_end",
+            id=outcome.call_id,
+            tool=outcome.name,
+            ok=outcome.ok,
+            cached=outcome.cached,
+        )
+        if not outcome.ok:
+            error_text = f"\n\n> Tool `{outcome.name}` failed: {outcome.error}\n\n"
+            streamed_text += error_text
+            await writer.text(error_text)
+            responses[outcome.call_id] = {"error": str(outcome.error)}
+            continue
+        rendered = formatter.render(outcome.name, outcome.text)
+        if rendered is not None:
+            with span("format_local"):
+                streamed_text += await stream_rendered_result(writer, rendered)
+            responses[outcome.call_id] = {
+                "displayed": True,
+                **project_result(outcome.name, outcome.text, message),
+            }
+        else:
+            unrendered.append(outcome)
+            responses[outcome.call_id] = {
+                "displayed": False,
+                **project_result(outcome.name, outcome.text, message, max_chars=2000),
+            }
+    # Keep function responses in call order so they pair with the calls
+    parts = [
+        function_response_part(by_id[call_id], responses[call_id])
+        for call_id, _ in calls
+    ]
+    return parts, streamed_text, unrendered
+
+
+async def run_agent_turn(
+    writer: FrameWriter,
+    session,
+    history: ConversationHistory,
+    message: str,
+    scope: str,
+    usage: TurnUsage,
+    user: str,
+    prefetched: Optional[PrefetchSet] = None,
+    last_failed: bool = False,
+    profile: Optional[dict] = None,
+) -> str:
+    """Answer one user message, feeding tool results back to the model.
+
+    The model may chain several rounds of tool calls; the loop ends when it
+    answers without calling a tool or the step, token or time budget runs
+    out. The turn starts on the model ``model_router`` picks, and a step
+    that comes back empty or with a malformed call before anything was
+    streamed is retried on the next stronger model. Returns the text
+    streamed to the client.
+    """
+    budget = AgentBudget(AGENT_MAX_STEPS, AGENT_TOKEN_BUDGET, AGENT_DEADLINE_SECONDS)
+    tool_names = tool_router.select(message) if TOOL_ROUTING_TOP_K else None
+    model = model_router.choose(
+        message,
+        tools_likely=tool_router.tools_likely(message),
+        history_tokens=history.tokens,
+        last_failed=last_failed,
+    )
+    streamed_text = ""
+    step = 0
+    while True:
+        step += 1
+        while True:
+            started = time.perf_counter()
+            step_text = ""
+            function_calls = []
+            finish_reason = None
+            usage_chunk = None
+            first_chunk = True
+            try:
+                async with contextlib.aclosing(
+                    open_chat_stream(
+                        model,
+                        history.contents(),
+                        tool_names,
+                        user=user,
+                        on_queued=queue_notifier(writer),
+                    )
+                ) as stream:
+                    async for chunk in stream:
+                        if tool_names and tool_router.needs_widening(
+                            chunk, set(tool_names)
+                        ):
+                            # Too late to retry once streamed; declare every
+                            # tool for the rest of the turn
+                            tool_names = None
+                        if first_chunk:
+                            first_chunk = False
+                            ttft_seconds.observe(
+                                time.perf_counter() - started, model=model
+                            )
+                        try:
+                            if chunk.usage_metadata:
+                                usage_chunk = chunk
+                            if chunk.candidates and chunk.candidates[0].finish_reason:
+                                reason = chunk.candidates[0].finish_reason
+                                finish_reason = getattr(reason, "value", reason)
+                            if chunk.function_calls:
+                                function_calls.extend(chunk.function_calls)
+                            elif hasattr(chunk, "text") and chunk.text:
+                                step_text += chunk.text
+                                await writer.text(chunk.text)
+                        except Exception as chunk_err:
+                            logger.warning(f"Chunk processing error: {chunk_err}")
+                            continue  # Skip problematic chunks and continue processing
+            except asyncio.CancelledError:
+                # A stopped turn still reports what the call used so far
+                if usage_chunk is not None:
+                    await usage.add(usage_chunk, model)
+                raise
+            except Exception:
+                model_router.record(model, started, ok=False)
+                raise
+            finally:
+                stage_seconds.observe(time.perf_counter() - started, stage="model")
+            cost = 0
+            if usage_chunk is not None:
+                cost = await usage.add(usage_chunk, model)
+            weak = model_router.weak_step(step_text, function_calls, finish_reason)
+            model_router.record(model, started, cost, ok=weak is None)
+            # Only retry while nothing of this step reached the client
+            stronger = (
+                model_router.escalate(model, weak) if weak and not step_text else None
+            )
+            if stronger is None:
+                break
+            model = stronger
+        streamed_text += step_text
+
+        model_parts = [types.Part.from_text(text=step_text)] if step_text else []
+        model_parts += [types.Part(function_call=fc) for fc in function_calls]
+        if model_parts:
+            history.add(types.Content(role="model", parts=model_parts))
+        if not function_calls:
+            return streamed_text
+
+        with span("tools"):
+            response_parts, tool_text, unrendered = await execute_function_calls(
+                writer, session, function_calls, scope, message, prefetched, profile
+            )
+        streamed_text += tool_text
+        history.add(types.Content(role="user", parts=response_parts))
+
+        stop_reason = budget.exhausted(step, usage.total_tokens)
+        if stop_reason:
+            # The model will not see these results, so format them now
+            for outcome in unrendered:
+                with span("format_llm"):
+                    streamed_text += await stream_formatted_result(
+                        writer,
+                        compact(outcome.name, outcome.text, message, max_chars=2000),
+                        usage,
+                        user,
+                    )
+            note = f"\n\n_Stopped before finishing: {stop_reason}._\n"
+            streamed_text += note
+            await writer.text(note)
+            return streamed_text
+
+
+async def run_fast_path(
+    writer: FrameWriter,
+    session,
+    history: ConversationHistory,
+    message: str,
+    scope: str,
+    profile: Optional[dict] = None,
+) -> Optional[str]:
+    """Answer a mechanical lookup with one direct tool call and no model call.
+
+    The call and its result are recorded in ``history`` as if the model had
+    made it. Returns the text streamed to the client, or ``None`` when the
+    message is not such a lookup or its result still needs the model, as a
+    failed call does.
+    """
+    match = fast_path.match(message)
+    if match is None:
+        return None
+    intent, tool_name, args = match
+    started = time.perf_counter()
+    function_call = types.FunctionCall(name=tool_name, args=args)
+    response_parts, streamed_text, unrendered = await execute_function_calls(
+        writer, session, [function_call], scope, message, profile=profile
+    )
+    history.add(
+        types.Content(role="model", parts=[types.Part(function_call=function_call)])
+    )
+    history.add(types.Content(role="user", parts=response_parts))
+    failed = "error" in response_parts[0].function_response.response
+    if failed or unrendered:
+        # Let the model explain the error or present an unknown result shape
+        fast_path.record_fallback()
+        return None
+    history.add(
+        types.Content(
+            role="model",
+            parts=[types.Part.from_text(text="The result is shown above.")],
+        )
+    )
+    elapsed = time.perf_counter() - started
+    fast_path.record_hit(elapsed)
+    logger.info(f"Fast path {intent}: {tool_name} in {elapsed * 1000:.0f} ms")
+    return streamed_text
+
+
+async def summarize_history(
+    previous_summary: str, transcript: str, user: str = "anonymous"
+) -> str:
+    """Fold older conversation turns into the running history summary."""
+    prompt = (
+        "You maintain a running summary of a conversation between a user and a Jira assistant. "
+        "Update the summary with the new turns below. Keep issue keys, sprint and board ids, "
+        "decisions and open questions; drop pleasantries and formatting. "
+        "Return only the updated summary, at most 200 words.\n\n"
+        f"Current summary:\n{previous_summary or '(empty)'}\n\nNew turns:\n{transcript}"
+    )
+    model = "gemini-2.0-flash-lite"
+    tokens = estimate_request_tokens(prompt)
+    tickets = [await scheduler.admit(model, user, tokens, BACKGROUND)]
+
+    async def readmit():
+        tickets.append(await scheduler.admit(model, user, tokens, BACKGROUND))
+
+    response = None
+    try:
+        with span("history_summary"):
+            response = await gemini_upstream.call(
+                lambda: client.aio.models.generate_content(
+                    model=model,
+                    contents=prompt,
+                    config=types.GenerateContentConfig(response_mime_type="text/plain"),
+                ),
+                before_retry=readmit,
+            )
+    finally:
+        usage_metadata = response.usage_metadata if response else None
+        scheduler.settle(
+            tickets[-1], (usage_metadata and usage_metadata.total_token_count) or 0
+        )
+    return response.text or previous_summary
+
+
+def parse_client_message(raw: str) -> Tuple[str, str]:
+    """``(kind, text)`` of a client frame, where kind is ``message`` or ``cancel``.
+
+    Frames are JSON objects such as ``{"type": "message", "text": "..."}``;
+    anything else is the plain text of a message.
+    """
+    try:
+        frame = json.loads(raw)
+    except ValueError:
+        return "message", raw
+    if isinstance(frame, dict) and frame.get("type") in ("message", "cancel"):
+        return frame["type"], str(frame.get("text", ""))
+    return "message", raw
+
+
+async def end_turn(
+    writer: FrameWriter,
+    history: ConversationHistory,
+    usage: TurnUsage,
+    outcome: str,
+    conversation: Optional[Tuple[str, str]] = None,
+):
+    """Send a turn's usage and ``end``, then compact and save the history."""
+    try:
+        # Token usage and the end of the turn share the last frame
+        await writer.event(
+            "token_usage",
+            token_usage=usage.token_usage,
+            cost=round(usage.cost, 4),
+            cache_savings=round(usage.cache_savings, 4),
+            history=history.stats(),
+        )
+        await writer.event("end", cancelled=outcome == "cancelled")
+    except Exception as e:
+        # The client is gone
+        logger.info(f"Could not end the turn: {e}")
+    # Fold old turns into the summary without blocking the next message
+    history.compact()
+    if conversation is not None:
+        # A disconnect right after the end event must not lose the turn
+        with span("conversation_save"):
+            await conversations.save(*conversation, history.state())
+
+
+async def run_turn(
+    writer: FrameWriter,
+    session,
+    history: ConversationHistory,
+    message: str,
+    scope: str,
+    user: str,
+    last_failed: bool,
+    profile: Optional[dict] = None,
+    conversation: Optional[Tuple[str, str]] = None,
+    ended: Optional[asyncio.Event] = None,
+) -> bool:
+    """Answer one user message and close it with ``token_usage`` and ``end``.
+
+    Cancelling the task stops the model stream, tool calls and formatting in
+    flight; the turn still reports the usage so far, ends with ``cancelled``
+    set and is saved under the ``(resume token, owner)`` of
+    ``conversation``, and then the cancellation propagates. ``ended`` is set
+    once the turn has taken over sending its end, which a turn cancelled
+    before it started never does. Returns whether the turn failed.
+    """
+    history.add_user_message(message)
+    usage = TurnUsage()
+    path, outcome = "fast", "error"
+    started = time.perf_counter()
+    try:
+        with span("fast_path"):
+            answered = await run_fast_path(
+                writer, session, history, message, scope, profile
+            )
+        if answered is None:
+            path = "agent"
+            prefetched = prefetcher.start(session, message, scope)
+            try:
+                with span("agent_turn"):
+                    await run_agent_turn(
+                        writer,
+                        session,
+                        history,
+                        message,
+                        scope,
+                        usage,
+                        user,
+                        prefetched,
+                        last_failed,
+                        profile,
+                    )
+            finally:
+                prefetched.close()
+            fast_path.record_model_turn(time.perf_counter() - started)
+        outcome = "ok"
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        history.cancel_turn()
+        raise
+    except SchedulerBusyError as e:
+        outcome = "busy"
+        logger.warning(f"Model call refused: {e}")
+        await send_status(writer, "busy", str(e), retry_after=round(e.retry_after, 1))
+    except CircuitOpenError as e:
+        outcome = "unavailable"
+        logger.warning(f"Upstream unavailable: {e}")
+        await send_status(
+            writer, "unavailable", str(e), retry_after=round(e.retry_after, 1)
+        )
+    except Exception as e:
+        logger.exception(f"Streaming error: {e}")
+        await writer.event("error", message=f"Streaming error: {e}")
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, stage="turn")
+        turns_total.inc(path=path, outcome=outcome)
+        turn_tokens.observe(usage.total_tokens)
+        turn_cost.observe(usage.cost)
+        if ended is not None:
+            ended.set()
+        # Another cancel while ending must not cut the end event or save short
+        await asyncio.shield(end_turn(writer, history, usage, outcome, conversation))
+    # The next turn starts on a stronger model
+    return outcome == "error"
+
+
 @app.websocket("/ws/chat")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
+    writer = frame_batcher.writer(InstrumentedWebSocket(websocket))
+    if drainer.draining:
+        await drainer.refuse(writer, websocket)
+        return
     access_token = websocket.cookies.get("access_token")
     cloud_id = websocket.cookies.get("cloud_id")
     if not access_token or not cloud_id:
-        await websocket.send_text("ERROR: Missing access token or cloud id.")
-        await websocket.send_text("__END_STREAM__")
+        await writer.event("error", message="Missing access token or cloud id.")
+        await writer.event("end")
+        await websocket.close()
+        return
+    # Lease a warm MCP session from the pool
+    try:
+        with span("mcp_acquire"):
+            session = await mcp_pool.acquire(access_token, cloud_id)
+    except Exception as e:
+        logger.warning(f"MCP session error: {e}")
+        await writer.event("error", message=f"Could not connect to Jira tools: {e}")
+        await writer.event("end")
         await websocket.close()
         return
-    # Connect to MCP server
-    async with streamablehttp_client(
-        "http://localhost:9096/mcp",
-        headers={
-            "Authorization": f"Bearer {access_token}",
-            "X-Atlassian-Cloud-Id": cloud_id,
-        },
-    ) as (read_stream, write_stream, _):
-        async with ClientSession(read_stream, write_stream) as session:
-            await session.initialize()
-            history = [
-                types.Content(
-                    role="user",
-                    parts=[
-                        types.Part.from_text(
-                            text="You are a helpful Jira assistant. Respond with reasoning and context when possible."
-                        )
-                    ],
+    # Fair queueing for model capacity is per user, not per connection
+    user = hashlib.sha256(access_token.encode()).hexdigest()[:16]
+    with span("user_profile"):
+        profile = await current_user_profile(access_token, cloud_id)
+    # Tool results and mirrored issues also follow the account, so a rotated
+    # token keeps them; the token stands in while the account is unknown
+    account_id = profile.get("accountId") if profile else None
+    scope = permission_scope(cloud_id, account_id or user)
+    if jira_mirror is not None:
+        # Lets background syncs of this user's mirrored projects use the session
+        jira_mirror.attach(scope, session)
+    history = ConversationHistory(
+        preamble=types.Content(
+            role="user",
+            parts=[
+                types.Part.from_text(
+                    text="You are a helpful Jira assistant. Respond with reasoning and context when possible."
                 )
-            ]
-            while True:
-                try:
-                    data = await websocket.receive_text()
-                    history.append(
-                        types.Content(
-                            role="user", parts=[types.Part.from_text(text=data)]
-                        )
-                    )
-                    # Streaming Gemini response
-                    streamed_text = ""
-                    try:
-                        costing = 0
-                        token_usage = {
-                            "input_tokens": 0,
-                            "output_tokens": 0,
-                            "thinking_tokens": 0,
-                        }
-                        async for (
-                            chunk
-                        ) in await client.aio.models.generate_content_stream(
-                            model="gemini-2.0-flash",
-                            contents=history,
-                            config=types.GenerateContentConfig(
-                                system_instruction=(
-                                    "You are a helpful Jira assistant. Only answer questions related to Jira. "
-                                    "Do not answer anything except Jira-related queries. "
-                                    "Never ask the user for their identifier (email, username, key, or account ID); you already have all required context. "
-                                    "For any Jira action, use the provided tools and follow the tool descriptions and JQL examples. "
-                                    "Use JQL only when the tool description or parameters require a JQL query; do not use JQL for other tools. "
-                                    "Always return your response in beautiful markdown format, with tables and lists where appropriate, and make the output easy to read in a chat application."
-                                ),
-                                tools=tools,
-                                response_mime_type="text/plain",
-                            ),
-                        ):
-                            try:
-                                # Calculate token usage for each chunk
-                                print(chunk.text)
-                                cost, token_usage_ = await calculate_token_usage(
-                                    chunk, "gemini-2.0-flash"
-                                )
-                                costing += cost
-                                token_usage["input_tokens"] += token_usage_[
-                                    "input_tokens"
-                                ]
-                                token_usage["output_tokens"] += token_usage_[
-                                    "output_tokens"
-                                ]
-                                token_usage["thinking_tokens"] += token_usage_[
-                                    "thinking_tokens"
-                                ]
-
-                                if chunk.function_calls:
-                                    function_call = chunk.function_calls[0]
-                                    # Send tool call notification
-                                    await websocket.send_text("__TOOL_CALL_START__")
-                                    await websocket.send_text(
-                                        json.dumps(
-                                            {
-                                                "tool": function_call.name,
-                                                "args": function_call.args,
-                                            }
-                                        )
-                                    )
-                                    result = await session.call_tool(
-                                        function_call.name, function_call.args
-                                    )
-                                    print(result)
-                                    # Send tool call end notification
-                                    await websocket.send_text("__TOOL_CALL_END__")
-                                    try:
-                                        result_content = result.content[0].text
-                                        # Ask Gemini to format the tool result in markdown, and stream the markdown response
-                                        format_prompt = types.Content(
-                                            role="user",
-                                            parts=[
-                                                types.Part.from_text(
-                                                    text=f"Format this result for display to the user in markdown: {result_content}. and format the markdown in a format so it's easily readable in a chat application. and just return the result not any extra content"
-                                                )
-                                            ],
-                                        )
-                                        async for (
-                                            func_chunk
-                                        ) in await client.aio.models.generate_content_stream(
-                                            model="gemini-2.0-flash-lite",
-                                            contents=format_prompt,
-                                            config=types.GenerateContentConfig(
-                                                response_mime_type="text/plain",
-                                            ),
-                                        ):
-                                            try:
-                                                # Calculate token usage for formatting chunks
-                                                format_cost, format_token_usage = (
-                                                    await calculate_token_usage(
-                                                        func_chunk,
-                                                        "gemini-2.0-flash-lite",
-                                                    )
-                                                )
-                                                costing += format_cost
-                                                token_usage[
-                                                    "input_tokens"
-                                                ] += format_token_usage["input_tokens"]
-                                                token_usage[
-                                                    "output_tokens"
-                                                ] += format_token_usage["output_tokens"]
-                                                token_usage[
-                                                    "thinking_tokens"
-                                                ] += format_token_usage[
-                                                    "thinking_tokens"
-                                                ]
-
-                                                if (
-                                                    hasattr(func_chunk, "text")
-                                                    and func_chunk.text
-                                                ):
-                                                    chunk_text = func_chunk.text
-                                                    chunk_text = chunk_text.replace(
-                                                        "```markdown", ""
-                                                    ).replace("```", "")
-                                                    streamed_text += chunk_text
-                                                    await websocket.send_text(
-                                                        chunk_text
-                                                    )
-                                            except Exception as chunk_err:
-                                                print(
-                                                    f"Chunk streaming error: {chunk_err}, raw chunk: {func_chunk}"
-                                                )
-                                                continue
-
-                                    except (AttributeError, IndexError) as e:
-                                        # Handle case when result structure is unexpected
-                                        result_content = str(result)
-                                else:
-                                    if hasattr(chunk, "text") and chunk.text:
-                                        streamed_text += chunk.text
-                                        await websocket.send_text(chunk.text)
-                            except json.JSONDecodeError as json_err:
-                                pass
-                            except Exception as chunk_err:
-                                print(f"Chunk processing error: {chunk_err}")
-                                continue  # Skip problematic chunks and continue processing
-                    except json.JSONDecodeError as json_err:
-                        pass
-                    except Exception as e:
-                        print(type(e))
-                        print(f"Streaming error: {e}")
-                        await websocket.send_text(f"ERROR: Streaming error: {str(e)}")
-                    except json.JSONDecodeError as json_err:
-                        pass
-                    finally:
-                        # Send token usage information before ending stream
-                        token_info = {
-                            "token_usage": token_usage,
-                            "cost": round(costing, 4),
-                        }
-                        await websocket.send_text("__TOKEN_USAGE__")
-                        await websocket.send_text(json.dumps(token_info))
-                        await websocket.send_text("__END_STREAM__")
-
-                    # Add the model's streamed response to history if it's not empty
-                    if streamed_text:
-                        history.append(
-                            types.Content(
-                                role="model",
-                                parts=[types.Part.from_text(text=streamed_text)],
-                            )
-                        )
-                except WebSocketDisconnect:
-                    break
-                except Exception as e:
-                    print(f"Message handling error: {str(e)}")
-                    await websocket.send_text(
-                        f"ERROR: Message handling error: {str(e)}"
-                    )
-                    await websocket.send_text("__END_STREAM__")
+            ],
+        ),
+        token_budget=HISTORY_TOKEN_BUDGET,
+        keep_recent_turns=HISTORY_KEEP_RECENT_TURNS,
+        summarizer=functools.partial(summarize_history, user=user),
+    )
+    conversation = None
+    if conversations is not None:
+        # Conversations follow the Jira account across logins, not the token
+        conversation = await resume_conversation(
+            history,
+            websocket.query_params.get("resume"),
+            f"{cloud_id}:{account_id or user}",
+        )
+        await writer.event(
+            "session", resume_token=conversation[0], turns=len(history.state()["turns"])
+        )
+    # The current turn runs as its own task while this loop keeps reading,
+    # so a cancel, a new message or a disconnect can stop it at once
+    turn: Optional[asyncio.Task] = None
+    last_failed = False
+    connection = drainer.open(writer, websocket)
+    try:
+        while True:
+            try:
+                kind, text = parse_client_message(await websocket.receive_text())
+            except WebSocketDisconnect:
+                break
+            if drainer.draining and kind == "message":
+                # The client resends it once reconnected to another worker
+                await drainer.refuse(writer, websocket, resend=text)
+                break
+            if turn is not None:
+                if not turn.done():
+                    turn.cancel()
+                # Wait for the stopped turn to report its usage and end
+                await asyncio.wait({turn})
+                if turn.cancelled():
+                    last_failed = False
+                    if not turn_ended.is_set():
+                        # Stopped before it started, so it never ended itself
+                        await writer.event("end", cancelled=True)
+                elif turn.exception() is not None:
+                    logger.error(f"Message handling error: {turn.exception()!r}")
+                    last_failed = True
+                else:
+                    last_failed = turn.result()
+                turn = None
+            if kind == "cancel":
+                continue
+            turn_ended = asyncio.Event()
+            turn = asyncio.create_task(
+                run_turn(
+                    writer,
+                    session,
+                    history,
+                    text,
+                    scope,
+                    user,
+                    last_failed,
+                    profile,
+                    conversation,
+                    turn_ended,
+                )
+            )
+            connection.turn = turn
+    finally:
+        drainer.close(connection)
+        if turn is not None:
+            turn.cancel()
+            await asyncio.wait({turn})
+            # Nothing is listening any more, so mark a failure retrieved
+            turn.cancelled() or turn.exception()
+        await history.close()
+        if jira_mirror is not None:
+            jira_mirror.detach(scope, session)
+        await mcp_pool.release(session)
+
+
+async def resume_conversation(
+    history: ConversationHistory, resume_token: Optional[str], owner: str
+) -> Tuple[str, str]:
+    """Continue the saved conversation of ``resume_token`` if ``owner`` started it.
+
+    Returns the ``(resume token, owner)`` to save the conversation under, with
+    a new token when there was nothing to resume.
+    """
+    state = None
+    if resume_token:
+        try:
+            with span("conversation_load"):
+                state = await conversations.load(resume_token, owner)
+            if state is not None:
+                history.restore(state)
+        except Exception as e:
+            logger.warning(f"Could not resume conversation: {e}")
+            history.restore({})
+            state = None
+    return (resume_token if state is not None else new_conversation_token(), owner)
+
+
+async def current_user_profile(
+    access_token: str, cloud_id: Optional[str] = None
+) -> Optional[dict]:
+    """Jira profile of whoever logged in with ``access_token``, if it can be found."""
+    try:
+        account_id = await user_store.account_for(access_token)
+        profile = await user_store.get(account_id) if account_id else None
+        if profile is None:
+            # Logged in before a restart, or the entry expired
+            _, profile = await atlassian.resolve(access_token, cloud_id)
+            account_id = profile.get("accountId") if profile else None
+            if account_id:
+                await user_store.put(account_id, profile)
+                await user_store.remember_login(access_token, account_id)
+        return profile
+    except Exception as e:
+        logger.warning(f"Could not look up the current user: {e}")
+        return None
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(registry.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/auth/callback")
 async def jira_auth_callback(
     code: str = None, state: str = None, request: Request = None
+):
+    with span("auth_callback"):
+        last_cloud_id = request.cookies.get("cloud_id") if request else None
+        return await _jira_auth_callback(code, state, last_cloud_id)
+
+
+async def _jira_auth_callback(
+    code: str, state: str, last_cloud_id: Optional[str] = None
 ):
     if code and state:
-        token_url = "https://auth.atlassian.com/oauth/token"
-        payload = {
-            "grant_type": "authorization_code",
-            "client_id": JIRA_CLIENT_ID,
-            "client_secret": JIRA_CLIENT_SECRET,
-            "code": code,
-            "redirect_uri": CALLBACK_URL,
-        }
-        headers = {"Content-Type": "application/json"}
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(token_url, json=payload, headers=headers)
-                token_data = response.json()
+            token_data = await atlassian.exchange_code(
+                code, JIRA_CLIENT_ID, JIRA_CLIENT_SECRET, CALLBACK_URL
+            )
             access_token = token_data.get("access_token")
             if access_token:
-                cloud_url = "https://api.atlassian.com/oauth/token/accessible-resources"
-                cloud_id = ""
-                try:
-                    async with httpx.AsyncClient() as client:
-                        cloud_response = await client.get(
-                            cloud_url,
-                            headers={"Authorization": f"Bearer {access_token}"},
-                        )
-                        cloud_data = cloud_response.json()
-                        print(cloud_data)
-                        cloud_id = (
-                            cloud_data[0]["id"]
-                            if cloud_data
-                            and isinstance(cloud_data, list)
-                            and "id" in cloud_data[0]
-                            else ""
-                        )
-                except Exception as e:
-                    print(f"Error getting cloud resources: {e}")
-
-                # Fetch Jira user info and store in users dict
-                user_info = None
-                if access_token and cloud_id:
-                    try:
-                        async with httpx.AsyncClient() as client:
-                            user_resp = await client.get(
-                                f"https://api.atlassian.com/ex/jira/{cloud_id}/rest/api/3/myself",
-                                headers={
-                                    "Authorization": f"Bearer {access_token}",
-                                    "Accept": "application/json",
-                                },
-                                timeout=10,
-                            )
-                            if user_resp.status_code == 200:
-                                user_info = user_resp.json()
-                                account_id = user_info.get("accountId")
-                                if account_id:
-                                    users[account_id] = user_info
-                    except Exception as e:
-                        print(f"Failed to fetch/store user info: {e}")
+                # Cloud id and Jira user info, looked up concurrently
+                with span("auth_resolve"):
+                    cloud_id, user_info = await atlassian.resolve(
+                        access_token, last_cloud_id
+                    )
+                account_id = user_info.get("accountId") if user_info else None
+                if account_id:
+                    await user_store.put(account_id, user_info)
+                    await user_store.remember_login(access_token, account_id)
 
                 # Redirect to frontend with access_token and cloud_id in query params
                 redirect_url = f"https://jira-automation.mnv-dev.site?access_token={access_token}&cloud_id={cloud_id}"
@@ -438,7 +1406,7 @@ async def jira_auth_callback(
                     status_code=400,
                 )
         except Exception as e:
-            print(f"Auth callback error: {e}")
+            logger.exception(f"Auth callback error: {e}")
             return JSONResponse({"error": str(e)}, status_code=500)
     return JSONResponse(
         {"error": "Missing code or state in callback."}, status_code=400
@@ -477,37 +1445,36 @@ def logout_endpoint():
 # Register shutdown event to close any resources
 @app.on_event("shutdown")
 async def app_shutdown():
-    # Close any lingering aiohttp resources
-    print("Shutting down application, cleaning up resources...")
-
-    # Force close any remaining client sessions
-    for task in asyncio.all_tasks():
-        if not task.done() and not task.cancelled() and "client_session" in str(task):
-            task.cancel()
-
-    # Give tasks a moment to clean up
-    await asyncio.sleep(1)
-
-
-async def execute_with_retry(func, *args, max_retries=2, **kwargs):
-    """Execute a function with retry logic."""
-    retries = 0
-    last_exception = None
-
-    while retries <= max_retries:
-        try:
-            return await func(*args, **kwargs)
-        except Exception as e:
-            last_exception = e
-            retries += 1
-            print(f"Retry {retries}/{max_retries} after error: {str(e)}")
-            await asyncio.sleep(1)  # Wait a second before retrying
-
-    # If we get here, all retries failed
-    raise last_exception
+    # Sockets are drained by now; background syncs go before the sessions they use
+    logger.info("Shutting down application, cleaning up resources...")
+    if jira_mirror is not None:
+        await jira_mirror.close()
+    await mcp_pool.close()
+    await context_cache.close()
+    await atlassian.close()
+    await user_store.close()
+    if conversations is not None:
+        await conversations.close()
+    log.shutdown()
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run("server:app", host="0.0.0.0", port=10000, reload=True)
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    if not RELOAD and (loop, http) != ("uvloop", "httptools"):
+        logger.warning(f"uvloop or httptools is not installed, using {loop} and {http}")
+    uvicorn.run(
+        # Worker processes import the app themselves
+        "server:app" if RELOAD or WORKERS > 1 else app,
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "10000")),
+        reload=RELOAD,
+        workers=WORKERS,
+        loop=loop,
+        http=http,
+        ws="websockets",
+        ws_per_message_deflate=True,
+        timeout_graceful_shutdown=int(drainer.deadline) + 10,
+    )
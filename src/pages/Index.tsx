@@ -1,5 +1,5 @@
 import React, { useState, useRef, useEffect } from 'react';
-import { Send, History, MessageCircle, Bot, User, Sparkles, Zap, Menu, X, Loader2 } from 'lucide-react';
+import { Send, Square, History, MessageCircle, Bot, User, Sparkles, Zap, Menu, X, Loader2 } from 'lucide-react';
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
 import { ScrollArea } from "@/components/ui/scroll-area";
@@ -15,6 +15,20 @@ interface Message {
   timestamp: Date;
 }
 
+type ServerEvent =
+  | { type: 'text'; text: string }
+  | { type: 'error'; message: string }
+  | { type: 'end'; cancelled?: boolean }
+  | { type: 'session'; resume_token: string; turns: number }
+  | { type: 'reconnect'; retry_after: number; resend?: string }
+  | { type: 'tool_call_start'; id?: string; tool: string; args: any }
+  | { type: 'tool_call_end'; id?: string; tool: string; ok: boolean; cached: boolean }
+  | { type: 'status'; status: string; message: string; retry_after?: number; position?: number }
+  | { type: 'token_usage'; token_usage: { input_tokens: number; output_tokens: number; thinking_tokens: number }; cost: number; cache_savings?: number };
+
+// Lets a reconnect, to any server worker, continue the same conversation
+const RESUME_TOKEN_KEY = 'chat_resume_token';
+
 interface ChatHistory {
   id: string;
   title: string;
@@ -59,7 +73,8 @@ const Index = () => {
   const ws = useRef<WebSocket | null>(null);
   const [isWsConnected, setIsWsConnected] = useState(false);
   const streamingMessageIdRef = useRef<string | null>(null);
-  const [currentToolCall, setCurrentToolCall] = useState<{tool: string, args: any} | null>(null);
+  const [currentToolCall, setCurrentToolCall] = useState<{id?: string, tool: string, args: any} | null>(null);
+  const [serverStatus, setServerStatus] = useState<{status: string, message: string, retry_after?: number} | null>(null);
   const [lastTokenUsage, setLastTokenUsage] = useState<{token_usage: any, cost: number} | null>(null);
   const [cumulativeCost, setCumulativeCost] = useState<number>(0);
   const [cumulativeTokens, setCumulativeTokens] = useState({
@@ -93,6 +108,10 @@ const Index = () => {
 
   useEffect(() => {
     let reconnectTimeout: NodeJS.Timeout | null = null;
+    // Set when a draining server sends us away: how soon to come back, and
+    // a message it did not take that goes out again once reconnected
+    let reconnectDelay: number | null = null;
+    let pendingResend: string | null = null;
     function connectWebSocket() {
       // Close existing connection if any
       if (ws.current) {
@@ -101,20 +120,31 @@ const Index = () => {
       }
       
       console.log('Connecting to WebSocket...');
-      ws.current = new WebSocket('wss://jira-automation.mnv-dev.site/ws/chat');
+      const resumeToken = sessionStorage.getItem(RESUME_TOKEN_KEY);
+      ws.current = new WebSocket(
+        'wss://jira-automation.mnv-dev.site/ws/chat' +
+          (resumeToken ? `?resume=${encodeURIComponent(resumeToken)}` : '')
+      );
       ws.current.onopen = () => {
         console.log('WebSocket connected');
         setIsWsConnected(true);
+        if (pendingResend !== null && ws.current) {
+          ws.current.send(JSON.stringify({ type: 'message', text: pendingResend }));
+          pendingResend = null;
+          setIsTyping(true);
+        }
       };
       ws.current.onclose = () => {
         console.log('WebSocket disconnected');
         setIsWsConnected(false);
         setIsTyping(false);
         streamingMessageIdRef.current = null;
-        // Try to reconnect after 2 seconds
+        // Try to reconnect after 2 seconds, or when a restarting server asked
+        const delay = reconnectDelay ?? 2000;
+        reconnectDelay = null;
         reconnectTimeout = setTimeout(() => {
           connectWebSocket();
-        }, 2000);
+        }, delay);
       };
       ws.current.onerror = () => {
         console.log('WebSocket error');
@@ -126,109 +156,103 @@ const Index = () => {
           connectWebSocket();
         }, 2000);
       };
-      ws.current.onmessage = async (event) => {
-        console.log('Received message:', event.data);
+      ws.current.onmessage = (event) => {
+        // Every frame is a JSON array of typed events, in order
+        let events: ServerEvent[];
         try {
-          const parsed = JSON.parse(event.data);
-          if (parsed && typeof parsed === 'object' && ('tool' in parsed && 'args' in parsed) || ('token_usage' in parsed && 'cost' in parsed)) {
-            return;
-          }
+          events = JSON.parse(event.data);
         } catch (e) {
-          // Not JSON, continue normal flow
-        }
-        if (event.data === "__END_STREAM__") {
-          console.log('Stream ended');
-          setIsTyping(false);
-          streamingMessageIdRef.current = null;
+          console.error('Failed to parse frame:', e);
           return;
         }
-        if (event.data === "__TOOL_CALL_START__") {
-          // Next message will be the tool details
-          const nextMessage = await new Promise<string>((resolve) => {
-            const handler = (e: MessageEvent) => {
-              ws.current?.removeEventListener('message', handler);
-              resolve(e.data);
-            };
-            ws.current?.addEventListener('message', handler);
-          });
-          try {
-            const toolData = JSON.parse(nextMessage);
-            setCurrentToolCall(toolData);
-            
-            // Add tool call message to chat history
-            const toolCallMessage: Message = {
-              id: `tool-${Date.now()}`,
-              content: `🔧 **Tool Executed:** ${toolData.tool.replace('mcp_atlassian-uv_jira_', '').replace(/_/g, ' ')}\n\n**Parameters:**\n\`\`\`json\n${JSON.stringify(toolData.args, null, 2)}\n\`\`\``,
-              isUser: false,
-              timestamp: new Date(),
-            };
-            
-            setMessages(prev => [...prev, toolCallMessage]);
-          } catch (e) {
-            console.error('Failed to parse tool data:', e);
+        for (const serverEvent of events) {
+          handleServerEvent(serverEvent);
+        }
+      };
+    }
+    function appendBotText(text: string) {
+      setServerStatus(null);
+      setMessages(prev => {
+        // If we're already streaming (have a streamingMessageId), append to that message
+        if (streamingMessageIdRef.current) {
+          return prev.map(msg =>
+            msg.id === streamingMessageIdRef.current
+              ? { ...msg, content: msg.content + text }
+              : msg
+          );
+        }
+        // Start a new bot message
+        const newMessageId = Date.now().toString();
+        streamingMessageIdRef.current = newMessageId;
+        setIsTyping(true);
+        return [
+          ...prev,
+          {
+            id: newMessageId,
+            content: text,
+            isUser: false,
+            timestamp: new Date(),
           }
+        ];
+      });
+    }
+    function handleServerEvent(serverEvent: ServerEvent) {
+      switch (serverEvent.type) {
+        case 'text':
+          appendBotText(serverEvent.text);
           return;
-        }
-        if (event.data === "__TOOL_CALL_END__") {
-          setCurrentToolCall(null);
+        case 'error':
+          appendBotText(`ERROR: ${serverEvent.message}`);
           return;
-        }
-        if (event.data === "__TOKEN_USAGE__") {
-          // Next message will be the token usage data
-          const nextMessage = await new Promise<string>((resolve) => {
-            const handler = (e: MessageEvent) => {
-              ws.current?.removeEventListener('message', handler);
-              resolve(e.data);
-            };
-            ws.current?.addEventListener('message', handler);
-          });
-          try {
-            const tokenData = JSON.parse(nextMessage);
-            setLastTokenUsage(tokenData);
-            // Add current cost to cumulative cost
-            setCumulativeCost(prev => prev + tokenData.cost);
-            // Add current tokens to cumulative tokens
-            setCumulativeTokens(prev => ({
-              input_tokens: prev.input_tokens + tokenData.token_usage.input_tokens,
-              output_tokens: prev.output_tokens + tokenData.token_usage.output_tokens,
-              thinking_tokens: prev.thinking_tokens + tokenData.token_usage.thinking_tokens,
-              total_tokens: prev.total_tokens + tokenData.token_usage.input_tokens + tokenData.token_usage.output_tokens + tokenData.token_usage.thinking_tokens
-            }));
-          } catch (e) {
-            console.error('Failed to parse token usage data:', e);
+        case 'end':
+          if (serverEvent.cancelled && streamingMessageIdRef.current) {
+            appendBotText('\n\n_Stopped._');
           }
+          setIsTyping(false);
+          setServerStatus(prev => (prev && prev.status !== 'queued' ? prev : null));
+          streamingMessageIdRef.current = null;
+          return;
+        case 'session':
+          sessionStorage.setItem(RESUME_TOKEN_KEY, serverEvent.resume_token);
+          return;
+        case 'reconnect':
+          // The server is restarting; the socket closes right after this
+          reconnectDelay = serverEvent.retry_after * 1000;
+          if (serverEvent.resend) pendingResend = serverEvent.resend;
+          return;
+        case 'tool_call_start': {
+          setCurrentToolCall(serverEvent);
+          // Add tool call message to chat history
+          const toolCallMessage: Message = {
+            id: `tool-${serverEvent.id ?? Date.now()}`,
+            content: `🔧 **Tool Executed:** ${serverEvent.tool.replace('mcp_atlassian-uv_jira_', '').replace(/_/g, ' ')}\n\n**Parameters:**\n\`\`\`json\n${JSON.stringify(serverEvent.args, null, 2)}\n\`\`\``,
+            isUser: false,
+            timestamp: new Date(),
+          };
+          setMessages(prev => [...prev, toolCallMessage]);
           return;
         }
-        // Ignore TOOL_RESULT marker
-        if (event.data === "__TOOL_RESULT__") {
+        case 'tool_call_end':
+          setCurrentToolCall(prev => (prev && prev.id === serverEvent.id ? null : prev));
+          return;
+        case 'status':
+          setServerStatus(serverEvent);
+          return;
+        case 'token_usage': {
+          const usage = serverEvent.token_usage;
+          setLastTokenUsage(serverEvent);
+          // Add current cost to cumulative cost
+          setCumulativeCost(prev => prev + serverEvent.cost);
+          // Add current tokens to cumulative tokens
+          setCumulativeTokens(prev => ({
+            input_tokens: prev.input_tokens + usage.input_tokens,
+            output_tokens: prev.output_tokens + usage.output_tokens,
+            thinking_tokens: prev.thinking_tokens + usage.thinking_tokens,
+            total_tokens: prev.total_tokens + usage.input_tokens + usage.output_tokens + usage.thinking_tokens
+          }));
           return;
         }
-        setMessages(prev => {
-          // If we're already streaming (have a streamingMessageId), append to that message
-          if (streamingMessageIdRef.current) {
-            console.log('Appending to existing message:', streamingMessageIdRef.current);
-            return prev.map(msg => 
-              msg.id === streamingMessageIdRef.current 
-                ? { ...msg, content: msg.content + event.data }
-                : msg
-            );
-          } 
-          // Start a new bot message
-          const newMessageId = Date.now().toString();
-          console.log('Starting new message:', newMessageId);
-          streamingMessageIdRef.current = newMessageId;
-          setIsTyping(true);
-          return [
-            ...prev,
-            {
-              id: newMessageId,
-              content: event.data,
-              isUser: false,
-              timestamp: new Date(),
-            }
-          ];
-        });
-      };
+      }
     }
     if (isAuthenticated && !ws.current) {
       connectWebSocket();
@@ -254,9 +278,10 @@ const Index = () => {
     if (!inputValue.trim() || !ws.current || ws.current.readyState !== 1) return;
 
     // Reset streaming state and last token usage before sending new message
-    // Keep cumulative cost intact
+    // Keep cumulative cost intact. The answer counts as in progress, and can
+    // be stopped, until its end event arrives
     streamingMessageIdRef.current = null;
-    setIsTyping(false);
+    setIsTyping(true);
     setLastTokenUsage(null);
 
     const userMessage: Message = {
@@ -269,8 +294,15 @@ const Index = () => {
     setMessages(prev => [...prev, userMessage]);
     const messageToSend = inputValue;
     setInputValue('');
+    setServerStatus(null);
     console.log('Sending message:', messageToSend);
-    ws.current.send(messageToSend);
+    // Sending while an answer streams stops that answer on the server
+    ws.current.send(JSON.stringify({ type: 'message', text: messageToSend }));
+  };
+
+  const handleStopAnswer = () => {
+    if (!ws.current || ws.current.readyState !== 1) return;
+    ws.current.send(JSON.stringify({ type: 'cancel' }));
   };
 
   const getBotResponse = (userInput: string): string => {
@@ -301,6 +333,9 @@ const Index = () => {
       }
     ]);
     setCurrentChatId('new-' + Date.now());
+    // Reconnect without the resume token so the server starts over too
+    sessionStorage.removeItem(RESUME_TOKEN_KEY);
+    ws.current?.close();
     setSidebarOpen(false);
     // Reset cumulative cost and tokens for new chat
     setCumulativeCost(0);
@@ -547,6 +582,18 @@ const Index = () => {
               </div>
             )}
 
+            {/* Server Status (queued / busy) */}
+            {serverStatus && (
+              <div className="flex justify-center animate-fade-in">
+                <div className="bg-amber-50 border border-amber-200 rounded-xl px-4 py-2 shadow-sm text-xs text-amber-800">
+                  {serverStatus.message}
+                  {serverStatus.retry_after !== undefined && serverStatus.status !== 'queued' && (
+                    <span className="ml-1">Please try again in about {Math.ceil(serverStatus.retry_after)}s.</span>
+                  )}
+                </div>
+              </div>
+            )}
+
             {/* Token Usage Display */}
             {lastTokenUsage && (
               <div className="flex justify-center animate-fade-in">
@@ -640,12 +687,13 @@ const Index = () => {
                   className="pr-12 lg:pr-14 py-3 lg:py-4 text-sm border-gray-300/50 focus:border-blue-500 focus:ring-blue-500 rounded-xl shadow-sm bg-white/70 backdrop-blur-sm placeholder:text-gray-400"
                 />
                 <Button
-                  onClick={handleSendMessage}
-                  disabled={!inputValue.trim() || isTyping}
+                  onClick={isTyping && !inputValue.trim() ? handleStopAnswer : handleSendMessage}
+                  disabled={!inputValue.trim() && !isTyping}
+                  title={isTyping && !inputValue.trim() ? 'Stop answer' : 'Send'}
                   size="sm"
                   className="absolute right-2 top-1/2 transform -translate-y-1/2 bg-gradient-to-r from-blue-600 to-purple-600 hover:from-blue-700 hover:to-purple-700 disabled:from-gray-300 disabled:to-gray-400 rounded-lg shadow-md hover:scale-105 transition-all duration-200 p-2 h-8 w-8"
                 >
-                  <Send className="w-4 h-4" />
+                  {isTyping && !inputValue.trim() ? <Square className="w-4 h-4" /> : <Send className="w-4 h-4" />}
                 </Button>
               </div>
             </div>
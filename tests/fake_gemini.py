@@ -0,0 +1,100 @@
+"""The app module, loaded without credentials, with Gemini streams scripted."""
+
+import asyncio
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+
+import pytest
+from google.genai import types
+
+_data = tempfile.mkdtemp(prefix="jira-chat-tests-")
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("CONVERSATION_STORE_PATH", os.path.join(_data, "chats.db"))
+os.environ.setdefault("JIRA_MIRROR_PATH", os.path.join(_data, "mirror.db"))
+
+# The built frontend is mounted from the working directory on import
+os.makedirs(os.path.join(_data, "jira-chat-automator", "dist", "assets"))
+_cwd = os.getcwd()
+os.chdir(_data)
+try:
+    import server  # noqa: E402
+finally:
+    os.chdir(_cwd)
+
+
+def chunk(text=None, calls=(), tokens: int = 110) -> types.GenerateContentResponse:
+    parts = [types.Part.from_text(text=text)] if text else []
+    parts += [types.Part(function_call=call) for call in calls]
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=parts))],
+        usage_metadata=types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=tokens - 10,
+            candidates_token_count=10,
+            total_token_count=tokens,
+        ),
+    )
+
+
+class FakeGemini:
+    """Answers each ``generate_content_stream`` with the next scripted step."""
+
+    def __init__(self):
+        self.steps = []
+        self.delay = 0.0
+        self.requests = 0
+        self.closed = 0
+
+    async def generate_content_stream(self, model, contents, config):
+        self.requests += 1
+        chunks = self.steps.pop(0) if self.steps else [chunk("ok")]
+
+        async def stream():
+            try:
+                for item in chunks:
+                    await asyncio.sleep(self.delay)
+                    yield item
+            finally:
+                self.closed += 1
+
+        return stream()
+
+
+class FakeSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send_text(self, text: str):
+        self.frames.append(text)
+
+    @property
+    def events(self) -> list:
+        return [event for frame in self.frames for event in json.loads(frame)]
+
+
+class FakeJiraSession:
+    """Answers every tool call with the same issue."""
+
+    async def call_tool(self, name, arguments):
+        issue = {"key": "P-1", "summary": "Fix login", "status": {"name": "Open"}}
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=json.dumps(issue))], isError=False
+        )
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    fake = FakeGemini()
+    monkeypatch.setattr(
+        server.client.aio.models,
+        "generate_content_stream",
+        fake.generate_content_stream,
+    )
+
+    async def no_cache(model):
+        return None
+
+    monkeypatch.setattr(server.context_cache, "get", no_cache)
+    return fake
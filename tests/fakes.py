@@ -0,0 +1,64 @@
+"""Stand-ins for the MCP client transport and session."""
+
+import asyncio
+import contextlib
+
+import pytest
+
+import mcp_pool
+
+
+class FakeSession:
+    """Stands in for ``ClientSession``; every instance is a new connection."""
+
+    instances = []
+
+    def __init__(self, read_stream, write_stream):
+        self.initialized = asyncio.Event()
+        self.exited = False
+        self.fail_with = None
+        self.call_delay = 0.0
+        self.calls = []
+        FakeSession.instances.append(self)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.exited = True
+
+    async def initialize(self):
+        await FakeSession.gate.wait()
+        self.initialized.set()
+
+    async def call_tool(self, name, arguments):
+        self.calls.append((name, arguments))
+        if self.call_delay:
+            await asyncio.sleep(self.call_delay)
+        if self.fail_with is not None:
+            raise self.fail_with
+        return (name, arguments, self)
+
+    async def send_ping(self):
+        pass
+
+
+@contextlib.asynccontextmanager
+async def fake_transport(url, headers=None):
+    yield None, None, None
+
+
+@pytest.fixture(autouse=True)
+def fake_mcp(monkeypatch):
+    FakeSession.instances = []
+    monkeypatch.setattr(mcp_pool, "ClientSession", FakeSession)
+    monkeypatch.setattr(mcp_pool, "streamablehttp_client", fake_transport)
+
+
+def run(coro_fn):
+    async def main():
+        FakeSession.gate = asyncio.Event()
+        FakeSession.gate.set()
+        return await coro_fn()
+
+    return asyncio.run(main())
@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+from google.genai import types
+
+from agent_loop import AgentBudget, function_response_part, project_result
+from fake_gemini import FakeJiraSession, FakeSocket, chunk, gemini, server  # noqa: F401
+
+
+def test_budget_stops_at_the_step_token_and_time_limits():
+    budget = AgentBudget(max_steps=3, max_tokens=1000, deadline=60)
+    assert budget.exhausted(2, 999) is None
+    assert budget.exhausted(3, 0) == "reached the limit of 3 steps"
+    assert budget.exhausted(1, 1000) == "used 1000 of 1000 tokens"
+    budget.started -= 60
+    assert budget.exhausted(1, 0) == "ran past the 60s deadline"
+
+
+def test_results_reach_the_model_compacted_and_paired_with_their_call():
+    payload = json.dumps({"issues": [{"key": "P-1", "summary": "x" * 2000}]})
+    assert project_result("jira_search", payload, max_chars=200) == {
+        "result": "issues 1-1\nkey|summary\nP-1|" + "x" * 50 + "... [1950 chars cut]"
+    }
+    call = types.FunctionCall(id="c1", name="jira_get_issue", args={})
+    part = function_response_part(call, {"result": "ok"})
+    response = part.function_response
+    assert (response.id, response.name, response.response) == (
+        "c1",
+        "jira_get_issue",
+        {"result": "ok"},
+    )
+
+
+def lookup(n: int) -> list:
+    call = types.FunctionCall(
+        id=f"call-{n}", name="jira_get_issue", args={"issue_key": "P-1"}
+    )
+    return [chunk(calls=[call])]
+
+
+def run_turn(message="look into P-1 for me and compare it"):
+    history = server.ConversationHistory()
+    history.add_user_message(message)
+    usage = server.TurnUsage()
+    socket = FakeSocket()
+    writer = server.frame_batcher.writer(socket)
+
+    async def turn():
+        text = await server.run_agent_turn(
+            writer, FakeJiraSession(), history, message, "cloud/agent", usage, "u"
+        )
+        await writer.flush()
+        return text
+
+    return asyncio.run(turn()), history, usage
+
+
+def test_tool_results_are_fed_back_until_the_model_answers(gemini):
+    gemini.steps = [lookup(1), [chunk("P-1 is "), chunk("open.")]]
+    text, history, usage = run_turn()
+    assert text.endswith("P-1 is open.")
+    assert gemini.requests == 2 and usage.total_tokens == 220
+    roles = [content.role for content in history.contents()]
+    assert roles == ["user", "model", "user", "model"]
+
+
+def test_step_budget_stops_the_loop(gemini, monkeypatch):
+    monkeypatch.setattr(server, "AGENT_MAX_STEPS", 2)
+    gemini.steps = [lookup(1), lookup(2), lookup(3)]
+    text, history, _ = run_turn()
+    assert gemini.requests == 2
+    assert text.endswith("_Stopped before finishing: reached the limit of 2 steps._\n")
+    # Every call made before the stop is answered in history
+    contents = history.contents()
+    assert contents[-1].role == "user" and contents[-1].parts[0].function_response
+
+
+def test_token_budget_stops_the_loop(gemini, monkeypatch):
+    monkeypatch.setattr(server, "AGENT_TOKEN_BUDGET", 100)
+    gemini.steps = [lookup(1), lookup(2)]
+    text, _, usage = run_turn()
+    assert gemini.requests == 1 and usage.total_tokens == 110
+    assert "used 110 of 100 tokens" in text
@@ -0,0 +1,85 @@
+import asyncio
+
+import httpx
+
+from atlassian import AtlassianClient
+
+PROFILE = {"accountId": "a-1", "displayName": "Alice"}
+
+
+class FakeAtlassian:
+    """Answers ``accessible-resources`` and ``/myself`` per access token."""
+
+    def __init__(self, clouds, myself_status=200):
+        self.clouds = clouds
+        self.myself_status = myself_status
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        token = request.headers["Authorization"].removeprefix("Bearer ")
+        path = request.url.path
+        self.requests.append(path)
+        cloud = self.clouds.get(token)
+        if path.endswith("/accessible-resources"):
+            if cloud is None:
+                return httpx.Response(401, json={"message": "Unauthorized"})
+            return httpx.Response(200, json=[{"id": cloud}])
+        if path != f"/ex/jira/{cloud}/rest/api/3/myself":
+            return httpx.Response(404, json={"message": "Site not found"})
+        return httpx.Response(self.myself_status, json=PROFILE)
+
+
+def client(fake: FakeAtlassian) -> AtlassianClient:
+    atlassian = AtlassianClient()
+    atlassian.http = httpx.AsyncClient(transport=httpx.MockTransport(fake))
+    return atlassian
+
+
+def test_resolved_profiles_are_cached():
+    async def scenario():
+        atlassian = client(FakeAtlassian({"alice": "cloud-a"}))
+        results = [await atlassian.resolve("alice") for _ in range(2)]
+        return results, atlassian.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert results == [("cloud-a", PROFILE)] * 2
+    assert stats["cache_hits"] == 1 and stats["cached"] == 1
+
+
+def test_failed_profile_is_not_cached():
+    async def scenario():
+        fake = FakeAtlassian({"alice": "cloud-a"}, myself_status=500)
+        atlassian = client(fake)
+        failed = await atlassian.resolve("alice")
+        fake.myself_status = 200
+        return failed, await atlassian.resolve("alice"), atlassian.stats()
+
+    failed, recovered, stats = asyncio.run(scenario())
+    assert failed == ("cloud-a", None)
+    assert recovered == ("cloud-a", PROFILE)
+    assert stats["errors"] == 1 and stats["cache_hits"] == 0
+
+
+def test_rejected_token_resolves_to_nothing():
+    async def scenario():
+        atlassian = client(FakeAtlassian({}))
+        return await atlassian.resolve("expired"), atlassian.stats()
+
+    resolved, stats = asyncio.run(scenario())
+    assert resolved == ("", None)
+    assert stats["errors"] == 1 and stats["cached"] == 0
+
+
+def test_only_the_users_own_cloud_is_guessed():
+    async def scenario():
+        fake = FakeAtlassian({"alice": "cloud-a", "bob": "cloud-b"})
+        atlassian = client(fake)
+        alice = await atlassian.resolve("alice", last_cloud_id="cloud-a")
+        # Alice's cloud is not a guess for Bob
+        bob = await atlassian.resolve("bob")
+        return alice, bob, fake.requests, atlassian.stats()
+
+    alice, bob, requests, stats = asyncio.run(scenario())
+    assert alice == ("cloud-a", PROFILE) and bob == ("cloud-b", PROFILE)
+    assert requests.count("/ex/jira/cloud-a/rest/api/3/myself") == 1
+    assert stats["guess_hits"] == 1 and stats["guess_misses"] == 0
@@ -0,0 +1,74 @@
+import json
+
+from compaction import compact, issue_columns, project, truncate
+
+
+def issue(i: int) -> dict:
+    return {
+        "key": f"PROJ-{i}",
+        "summary": f"Fix | login {i}",
+        "url": f"https://example.atlassian.net/browse/PROJ-{i}",
+        "description": "lorem ipsum " * 100,
+        "status": {"name": "In Progress", "color": "yellow"},
+        "assignee": {"display_name": "Alice", "avatar_url": "https://a.io/1"},
+        "labels": [],
+        "updated": "2024-05-03T11:22:33.000+0000",
+    }
+
+
+def test_issue_lists_become_a_table_much_smaller_than_the_json():
+    text = json.dumps({"issues": [issue(i) for i in range(20)], "total": 40})
+    compacted = compact("jira_search", text, "who is working on what")
+    lines = compacted.splitlines()
+    assert lines[0] == "issues 1-20 of 40"
+    assert lines[1] == "key|summary|status|assignee|updated"
+    assert lines[2] == "PROJ-0|Fix / login 0|In Progress|Alice|2024-05-03"
+    assert len(compacted) * 5 < len(text)
+
+
+def test_optional_columns_follow_the_message():
+    assert "description" in issue_columns("why is it blocked")
+    assert "description" not in issue_columns("list my issues")
+    text = json.dumps({"issues": [issue(1)]})
+    assert "chars cut]" in compact("jira_search", text, "describe it", max_chars=200)
+
+
+def test_long_lists_and_strings_are_cut_with_markers():
+    assert truncate("abcdef", 4) == "abcd... [2 chars cut]"
+    projected = project({"items": list(range(5)), "self": "x", "empty": None}, 3, 100)
+    assert projected == {"items": [0, 1, 2, "... 2 more not shown"]}
+    text = json.dumps({"issues": [issue(i) for i in range(5)]})
+    assert "(3 more fetched, not shown)" in compact("jira_search", text, max_items=2)
+    assert compact("jira_get_issue", "x" * 100, max_chars=5).endswith("[60 chars cut]")
+
+
+def test_changelogs_keep_the_latest_changes():
+    changes = [
+        {
+            "created": f"2024-05-0{day}T10:00:00",
+            "author": {"displayName": "Bob"},
+            "items": [{"field": "status", "fromString": "To Do", "toString": "Done"}],
+        }
+        for day in range(1, 5)
+    ]
+    text = json.dumps([{"issue_key": "P-1", "changelogs": changes}])
+    compacted = compact("jira_batch_get_changelogs", text, max_items=2)
+    assert compacted.startswith("P-1 changes (2 older changes not shown)")
+    assert "2024-05-04|Bob|status|To Do|Done" in compacted
+    assert "2024-05-01" not in compacted
+
+
+def test_malformed_payloads_degrade_instead_of_failing():
+    assert compact("jira_search", json.dumps({"issues": ["PROJ-1"]})) == (
+        '{"issues":["PROJ-1"]}'
+    )
+    odd_page = {"issues": [issue(1)], "start_at": "20"}
+    assert compact("jira_search", json.dumps(odd_page)).startswith("issues 1-1\n")
+    entries = [
+        {"issue_key": "P-2", "changelogs": "none"},
+        {"issue_key": "P-3", "changelogs": ["stray", {"items": [None]}]},
+    ]
+    assert compact("jira_batch_get_changelogs", json.dumps(entries)) == (
+        "P-2: no changes\n\nP-3: no changes"
+    )
+    assert compact("jira_batch_get_changelogs", '["P-1"]') == '["P-1"]'
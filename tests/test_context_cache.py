@@ -0,0 +1,96 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from context_cache import ContextCache
+
+
+class FakeCaches:
+    """Stands in for ``client.aio.caches``; failures are set per method."""
+
+    def __init__(self):
+        self.created = []
+        self.updated = []
+        self.deleted = []
+        self.fail = set()
+
+    async def create(self, model, config):
+        await asyncio.sleep(0.01)
+        if "create" in self.fail:
+            raise RuntimeError("caching not supported")
+        self.created.append((model, config.ttl))
+        return SimpleNamespace(name=f"cachedContents/{model}-{len(self.created)}")
+
+    async def update(self, name, config):
+        if "update" in self.fail:
+            raise RuntimeError("cache expired")
+        self.updated.append(name)
+
+    async def delete(self, name):
+        self.deleted.append(name)
+
+
+def context_cache(**kwargs):
+    caches = FakeCaches()
+    client = SimpleNamespace(aio=SimpleNamespace(caches=caches))
+    return ContextCache(client, "system prompt", [], ttl_seconds=600, **kwargs), caches
+
+
+def test_one_cache_per_model_shared_by_concurrent_callers():
+    async def scenario():
+        cache, caches = context_cache()
+        names = await asyncio.gather(*(cache.get("flash") for _ in range(5)))
+        other = await cache.get("pro")
+        return names, other, caches.created, cache.stats()
+
+    names, other, created, stats = asyncio.run(scenario())
+    assert set(names) == {"cachedContents/flash-1"}
+    assert other == "cachedContents/pro-2"
+    assert created == [("flash", "600s"), ("pro", "600s")]
+    assert stats["hits"] == 4 and stats["cached_models"] == ["flash", "pro"]
+
+
+def test_cache_is_extended_before_it_expires_and_recreated_if_that_fails():
+    async def scenario():
+        cache, caches = context_cache(refresh_margin=300)
+        first = await cache.get("flash")
+        cache._entries["flash"].expires_at = time.monotonic() + 100
+        extended = await cache.get("flash")
+        cache._entries["flash"].expires_at = time.monotonic() + 100
+        caches.fail.add("update")
+        recreated = await cache.get("flash")
+        return first, extended, recreated, caches.updated
+
+    first, extended, recreated, updated = asyncio.run(scenario())
+    assert extended == first and updated == [first]
+    assert recreated == "cachedContents/flash-2"
+
+
+def test_models_that_reject_caching_fall_back_inline_for_a_while():
+    async def scenario():
+        cache, caches = context_cache(retry_after=600)
+        caches.fail.add("create")
+        results = [await cache.get("gemma"), await cache.get("gemma")]
+        attempts = cache.stats()["failures"]
+        caches.fail.clear()
+        cache._disabled_until["gemma"] = 0
+        results.append(await cache.get("gemma"))
+        return results, attempts
+
+    results, attempts = asyncio.run(scenario())
+    assert results == [None, None, "cachedContents/gemma-1"]
+    assert attempts == 1
+
+
+def test_rejected_cache_is_recreated_and_deleted_on_close():
+    async def scenario():
+        cache, caches = context_cache()
+        first = await cache.get("flash")
+        cache.invalidate("flash")
+        second = await cache.get("flash")
+        await cache.close()
+        return first, second, caches.deleted, cache.stats()
+
+    first, second, deleted, stats = asyncio.run(scenario())
+    assert first != second and deleted == [second]
+    assert stats["invalidations"] == 1 and stats["cached_models"] == []
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from conversation_store import (
+    ConversationStore,
+    SQLiteConversationStore,
+    decode_state,
+    encode_state,
+    new_token,
+)
+
+STATE = {"messages": [{"role": "user", "parts": [{"text": "hi"}]}], "summary": None}
+
+
+def test_interface_cannot_be_instantiated():
+    with pytest.raises(TypeError):
+        ConversationStore()
+
+
+def test_state_round_trips_compressed():
+    assert decode_state(encode_state(STATE)) == STATE
+    assert new_token() != new_token()
+
+
+def test_conversation_resumes_only_for_its_owner(tmp_path):
+    async def scenario():
+        store = SQLiteConversationStore(str(tmp_path / "conversations.db"))
+        token = new_token()
+        await store.save(token, "alice", STATE)
+        results = (
+            await store.load(token, "alice"),
+            await store.load(token, "bob"),
+            await store.load(new_token(), "alice"),
+        )
+        stats = store.stats()
+        await store.close()
+        return results, stats
+
+    (mine, theirs, unknown), stats = asyncio.run(scenario())
+    assert mine == STATE
+    assert theirs is None and unknown is None
+    assert stats["resumed"] == 1 and stats["misses"] == 2
+
+
+def test_workers_share_the_file_and_expired_conversations_are_gone(tmp_path):
+    path = str(tmp_path / "conversations.db")
+
+    async def scenario():
+        writer = SQLiteConversationStore(path)
+        reader = SQLiteConversationStore(path)
+        expired = SQLiteConversationStore(path, ttl=-1)
+        await writer.save("t", "alice", STATE)
+        results = await reader.load("t", "alice"), await expired.load("t", "alice")
+        for store in (writer, reader, expired):
+            await store.close()
+        return results
+
+    assert asyncio.run(scenario()) == (STATE, None)
@@ -0,0 +1,89 @@
+import asyncio
+import signal
+
+import uvicorn
+
+from drain import SERVICE_RESTART, Drainer
+
+
+class FakeWriter:
+    def __init__(self):
+        self.events = []
+
+    async def event(self, kind, **fields):
+        self.events.append((kind, fields))
+
+    async def flush(self):
+        pass
+
+
+class FakeSocket:
+    def __init__(self):
+        self.closed_with = None
+
+    async def close(self, code):
+        self.closed_with = code
+
+
+def test_drain_lets_turns_finish_then_sends_sockets_away():
+    async def scenario():
+        drainer = Drainer(deadline=1)
+        writer, socket = FakeWriter(), FakeSocket()
+        connection = drainer.open(writer, socket)
+        connection.turn = asyncio.create_task(asyncio.sleep(0.01))
+        await drainer.drain()
+        return writer.events, socket.closed_with, drainer.stats()
+
+    events, closed_with, stats = asyncio.run(scenario())
+    assert events == [("reconnect", {"retry_after": 1.0})]
+    assert closed_with == SERVICE_RESTART
+    assert stats["turns_finished"] == 1 and stats["draining"]
+
+
+def test_turns_past_the_deadline_are_cancelled():
+    async def scenario():
+        drainer = Drainer(deadline=0.01)
+        connection = drainer.open(FakeWriter(), FakeSocket())
+        connection.turn = asyncio.create_task(asyncio.sleep(60))
+        await drainer.drain()
+        return connection.turn.cancelled(), drainer.stats()["turns_cancelled"]
+
+    assert asyncio.run(scenario()) == (True, 1)
+
+
+def test_sigterm_drains_before_uvicorn_exits():
+    server = uvicorn.Server(uvicorn.Config(app=None))
+    previous = signal.signal(signal.SIGTERM, server.handle_exit)
+
+    async def scenario():
+        drainer = Drainer(deadline=1)
+        socket = FakeSocket()
+        connection = drainer.open(FakeWriter(), socket)
+        connection.turn = asyncio.create_task(asyncio.sleep(0.05))
+        drainer.install(asyncio.get_running_loop())
+        signal.raise_signal(signal.SIGTERM)
+        await asyncio.sleep(0.01)
+        exiting_early = server.should_exit
+        while not server.should_exit:
+            await asyncio.sleep(0.01)
+        return exiting_early, connection.turn.done(), socket.closed_with
+
+    try:
+        exiting_early, finished, closed_with = asyncio.run(scenario())
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+    assert not exiting_early
+    assert finished and closed_with == SERVICE_RESTART
+
+
+def test_without_uvicorn_sigterm_is_left_alone():
+    previous = signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    async def scenario():
+        Drainer().install(asyncio.get_running_loop())
+        return signal.getsignal(signal.SIGTERM)
+
+    try:
+        assert asyncio.run(scenario()) is signal.SIG_DFL
+    finally:
+        signal.signal(signal.SIGTERM, previous)
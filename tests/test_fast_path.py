@@ -0,0 +1,96 @@
+import pytest
+
+from fast_path import FastPath, normalize
+
+
+@pytest.mark.parametrize(
+    "message, intent, tool_name, args",
+    [
+        ("PROJ-12", "issue", "jira_get_issue", {"issue_key": "PROJ-12"}),
+        ("open proj-12", "issue", "jira_get_issue", {"issue_key": "PROJ-12"}),
+        (
+            "What is ticket PROJ-12?",
+            "issue",
+            "jira_get_issue",
+            {"issue_key": "PROJ-12"},
+        ),
+        (
+            "show me the transitions for PROJ-9",
+            "transitions",
+            "jira_get_transitions",
+            {"issue_key": "PROJ-9"},
+        ),
+        (
+            "time logged on PROJ-9",
+            "worklog",
+            "jira_get_worklog",
+            {"issue_key": "PROJ-9"},
+        ),
+        (
+            "what's in the current sprint on board 3",
+            "current_sprint",
+            "jira_get_board_issues",
+            {"board_id": "3", "jql": "sprint in openSprints()"},
+        ),
+        (
+            "list sprints for board #7",
+            "sprints",
+            "jira_get_sprints_from_board",
+            {"board_id": "7"},
+        ),
+        (
+            "scrum boards for project ABC",
+            "boards",
+            "jira_get_agile_boards",
+            {"board_type": "scrum", "project_key": "ABC"},
+        ),
+        ("boards", "boards", "jira_get_agile_boards", {}),
+        (
+            "issues in ABC",
+            "project_issues",
+            "jira_get_project_issues",
+            {"project_key": "ABC"},
+        ),
+        ("issue link types", "link_types", "jira_get_link_types", {}),
+    ],
+)
+def test_lookups_map_to_one_tool_call(message, intent, tool_name, args):
+    assert FastPath().match(message) == (intent, tool_name, args)
+
+
+@pytest.mark.parametrize(
+    "message",
+    [
+        "open PROJ-12 and move it to done",
+        "why is PROJ-12 blocked",
+        "issues for me",
+        "summarize the sprints on board 3",
+        "hello",
+    ],
+)
+def test_anything_more_than_a_lookup_goes_to_the_model(message):
+    fast_path = FastPath()
+    assert fast_path.match(message) is None
+    assert fast_path.stats()["misses"] == 1
+
+
+def test_disabled_fast_path_matches_nothing():
+    assert FastPath(enabled=False).match("PROJ-12") is None
+
+
+def test_normalize_collapses_space_and_trailing_punctuation():
+    assert normalize("  open   PROJ-1 ?! ") == "open PROJ-1"
+
+
+def test_hit_rate_and_saved_latency():
+    fast_path = FastPath(smoothing=0.5)
+    fast_path.record_hit(0.1)
+    fast_path.record_model_turn(2.0)
+    fast_path.record_model_turn(4.0)
+    fast_path.record_hit(0.5)
+    fast_path.record_fallback()
+    fast_path.match("hello")
+    stats = fast_path.stats()
+    assert stats["model_turn_seconds"] == 3.0
+    assert stats["saved_seconds"] == 2.5
+    assert stats["hit_rate"] == 0.5
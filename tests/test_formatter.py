@@ -0,0 +1,87 @@
+import json
+
+import formatter
+
+ISSUE = {
+    "key": "PROJ-1",
+    "summary": "Fix | the login",
+    "status": {"name": "In Progress"},
+    "assignee": {"display_name": "Alice"},
+    "labels": ["auth", 7],
+    "updated": "2024-05-01T10:30:00.000+0000",
+    "comments": [
+        {"author": {"displayName": "Bob"}, "body": "On it"},
+        "stray",
+        {"author": {"displayName": "Carol"}, "body": "Done", "created": "2024-05-02"},
+    ],
+}
+
+
+def render(tool_name, data) -> str:
+    rendered = formatter.render(tool_name, json.dumps(data))
+    return None if rendered is None else "".join(rendered)
+
+
+def test_issue_renders_fields_and_comments():
+    text = render("jira_get_issue", ISSUE)
+    assert text.startswith("### PROJ-1: Fix \\| the login")
+    assert "| Assignee | Alice |" in text and "| Labels | auth, 7 |" in text
+    assert "| Updated | 2024-05-01 10:30 |" in text
+    assert "**Comments** (2)" in text and "- **Bob**: On it" in text
+    assert "- **Carol** (2024-05-02): Done" in text
+
+
+def test_search_pages_and_bad_totals():
+    page = {"issues": [ISSUE], "total": 40, "start_at": 20}
+    assert "**40 issues found** (showing 21–21)" in render("jira_search", page)
+    odd = {"issues": [ISSUE], "total": "40", "start_at": None}
+    assert "**1 issue found**" in render("jira_search", odd)
+    assert render("jira_search", {"issues": []}) == "No issues found.\n"
+
+
+def test_unknown_shapes_fall_back_to_the_model():
+    assert formatter.render("jira_get_issue", "not json") is None
+    assert render("jira_search", {"issues": ["PROJ-1"]}) is None
+    assert render("jira_get_worklog", {"worklogs": ["2h"]}) is None
+    assert render("jira_get_worklog", ["2h"]) is None
+    assert render("jira_batch_get_changelogs", ["PROJ-1"]) is None
+    assert render("jira_get_sprints_from_board", [{"name": "no id"}]) is None
+
+
+def test_worklogs_total_only_counts_numbers():
+    worklogs = [
+        {"author": {"name": "alice"}, "timeSpent": "1h", "timeSpentSeconds": 3600},
+        {"author": {"name": "bob"}, "timeSpent": "?", "timeSpentSeconds": "n/a"},
+    ]
+    text = render("jira_get_worklog", {"worklogs": worklogs})
+    assert "| alice | - | 1h | - |" in text
+    assert text.endswith("**Total:** 1h\n")
+
+
+def test_changelogs_skip_malformed_entries():
+    entries = [
+        {
+            "issue_key": "PROJ-1",
+            "changelogs": [
+                "stray",
+                {
+                    "created": "2024-05-01T10:30:00",
+                    "author": {"displayName": "Alice"},
+                    "items": [
+                        None,
+                        {"field": "status", "fromString": "To Do", "toString": "Done"},
+                    ],
+                },
+            ],
+        },
+        {"issue_key": "PROJ-2", "changelogs": "none"},
+    ]
+    text = render("jira_batch_get_changelogs", entries)
+    assert "| 2024-05-01 10:30 | Alice | status | To Do | Done |" in text
+    assert "#### PROJ-2\n\nNo changes." in text
+
+
+def test_errors_and_mutations():
+    assert render("jira_create_issue", {"error": "nope"}) == "> **Error:** nope\n"
+    text = render("jira_create_issue", {"message": "Created", "issue": ISSUE})
+    assert text.startswith("✅ Created\n\n### PROJ-1")
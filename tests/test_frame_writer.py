@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+import pytest
+
+from frame_writer import FrameBatcher
+
+
+class Socket:
+    def __init__(self, fail: bool = False):
+        self.frames = []
+        self.fail = fail
+
+    async def send_text(self, text: str):
+        if self.fail:
+            raise ConnectionError("gone")
+        self.frames.append(json.loads(text))
+
+
+def test_deltas_within_the_interval_share_one_frame():
+    async def scenario():
+        batcher = FrameBatcher(flush_interval=0.02)
+        socket = Socket()
+        writer = batcher.writer(socket)
+        for delta in ("Hel", "lo", ""):
+            await writer.text(delta)
+        await writer.event("tool_call_start", id="1", tool="jira_get_issue")
+        await writer.text("!")
+        sent_early = list(socket.frames)
+        await asyncio.sleep(0.05)
+        return sent_early, socket.frames, batcher.stats()
+
+    sent_early, frames, stats = asyncio.run(scenario())
+    assert sent_early == []
+    assert frames == [
+        [
+            {"type": "text", "text": "Hello"},
+            {"type": "tool_call_start", "id": "1", "tool": "jira_get_issue"},
+            {"type": "text", "text": "!"},
+        ]
+    ]
+    assert stats["frames"] == 1 and stats["text_deltas"] == 3
+
+
+def test_a_full_batch_is_sent_at_once():
+    async def scenario():
+        socket = Socket()
+        writer = FrameBatcher(flush_interval=60, max_batch_chars=5).writer(socket)
+        await writer.text("abc")
+        await writer.text("defg")
+        return socket.frames
+
+    assert asyncio.run(scenario()) == [[{"type": "text", "text": "abcdefg"}]]
+
+
+def test_end_and_error_flush_immediately_in_order():
+    async def scenario():
+        socket = Socket()
+        writer = FrameBatcher(flush_interval=60).writer(socket)
+        await writer.text("partial")
+        await writer.event("end", cancelled=True)
+        await writer.flush()
+        return socket.frames
+
+    assert asyncio.run(scenario()) == [
+        [{"type": "text", "text": "partial"}, {"type": "end", "cancelled": True}]
+    ]
+
+
+def test_a_failed_background_flush_surfaces_on_the_next_write():
+    async def scenario():
+        writer = FrameBatcher(flush_interval=0.01).writer(Socket(fail=True))
+        await writer.text("lost")
+        await asyncio.sleep(0.03)
+        with pytest.raises(ConnectionError):
+            await writer.text("more")
+        with pytest.raises(ConnectionError):
+            await writer.event("end")
+
+    asyncio.run(scenario())
@@ -0,0 +1,154 @@
+import asyncio
+
+from google.genai import types
+
+from history import CANCELLED_TURN_NOTE, STALE_TOOL_RESULT, ConversationHistory
+
+
+def model_text(text: str) -> types.Content:
+    return types.Content(role="model", parts=[types.Part.from_text(text=text)])
+
+
+def tool_round(history: ConversationHistory, payload: str):
+    call = types.FunctionCall(name="jira_get_issue", args={"issue_key": "P-1"})
+    history.add(types.Content(role="model", parts=[types.Part(function_call=call)]))
+    response = types.FunctionResponse(name="jira_get_issue", response={"r": payload})
+    history.add(
+        types.Content(role="user", parts=[types.Part(function_response=response)])
+    )
+
+
+def add_turns(history: ConversationHistory, count: int, size: int = 400, first=0):
+    for n in range(first, first + count):
+        history.add_user_message(f"question {n} " + "x" * size)
+        history.add(model_text("answer " + "y" * size))
+
+
+def texts(history: ConversationHistory):
+    return [p.text for c in history.contents() for p in c.parts if p.text]
+
+
+def test_tool_payloads_are_dropped_from_all_but_the_latest_turn():
+    history = ConversationHistory(token_budget=10**6)
+    for _ in range(2):
+        history.add_user_message("open P-1")
+        tool_round(history, "z" * 4000)
+    history.compact()
+    responses = [
+        p.function_response.response
+        for c in history.contents()
+        for p in c.parts
+        if p.function_response
+    ]
+    assert responses[0] == STALE_TOOL_RESULT and responses[1] == {"r": "z" * 4000}
+    assert history.stats()["tool_payloads_dropped"] == 1
+
+
+def test_old_turns_are_summarized_in_the_background():
+    async def scenario():
+        release = asyncio.Event()
+        transcripts = []
+
+        async def summarizer(previous, transcript):
+            transcripts.append(transcript)
+            await release.wait()
+            return "they asked about P-1"
+
+        history = ConversationHistory(
+            token_budget=500, keep_recent_turns=2, summarizer=summarizer
+        )
+        add_turns(history, 5)
+        history.compact()
+        # The turns being summarized stay until the summary is ready
+        before = history.stats()["turns"]
+        release.set()
+        await history._summary_task
+        return history, before, transcripts
+
+    history, before, transcripts = asyncio.run(scenario())
+    assert before == 5
+    assert (
+        transcripts[0].startswith("user: question 0")
+        and "question 3" not in transcripts[0]
+    )
+    assert history.stats()["turns"] == 2 and history.metrics["turns_summarized"] == 3
+    assert (
+        texts(history)[0]
+        == "Summary of the earlier conversation:\nthey asked about P-1"
+    )
+    assert texts(history)[1].startswith("question 3")
+
+
+def test_without_a_summarizer_the_oldest_turns_are_dropped():
+    history = ConversationHistory(token_budget=500, keep_recent_turns=2)
+    add_turns(history, 5)
+    history.compact()
+    assert texts(history)[0].startswith("question 3")
+    assert history.metrics["turns_dropped"] == 3
+
+
+def test_history_past_twice_the_budget_drops_turns_behind_a_pending_summary():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def summarizer(previous, transcript):
+            await release.wait()
+            return "summary"
+
+        history = ConversationHistory(
+            token_budget=500, keep_recent_turns=1, summarizer=summarizer
+        )
+        add_turns(history, 3)
+        history.compact()
+        add_turns(history, 4, first=3)
+        history.compact()
+        during = [t.split()[1] for t in texts(history) if t.startswith("question")]
+        release.set()
+        await history._summary_task
+        after = [t.split()[1] for t in texts(history) if t.startswith("question")]
+        return during, after, history.metrics
+
+    during, after, metrics = asyncio.run(scenario())
+    # Turns 0 and 1 wait for their summary; 2 to 5 are dropped to stay bounded
+    assert during == ["0", "1", "6"]
+    assert after == ["6"]
+    assert metrics["turns_dropped"] == 4 and metrics["turns_summarized"] == 2
+
+
+def test_failed_summary_drops_the_turns():
+    async def scenario():
+        async def summarizer(previous, transcript):
+            raise ConnectionError("down")
+
+        history = ConversationHistory(
+            token_budget=500, keep_recent_turns=2, summarizer=summarizer
+        )
+        add_turns(history, 4)
+        history.compact()
+        await history._summary_task
+        return history
+
+    history = asyncio.run(scenario())
+    assert history.summary == "" and history.stats()["turns"] == 2
+    assert history.metrics["summary_failures"] == 1
+
+
+def test_cancelled_turn_drops_the_unanswered_call():
+    history = ConversationHistory()
+    history.add_user_message("open P-1")
+    call = types.FunctionCall(name="jira_get_issue", args={"issue_key": "P-1"})
+    history.add(types.Content(role="model", parts=[types.Part(function_call=call)]))
+    history.cancel_turn()
+    contents = history.contents()
+    assert [c.role for c in contents] == ["user", "model"]
+    assert contents[-1].parts[0].text == CANCELLED_TURN_NOTE
+
+
+def test_state_restores_in_another_history():
+    history = ConversationHistory()
+    add_turns(history, 2, size=10)
+    history.summary = "earlier"
+    restored = ConversationHistory()
+    restored.restore(history.state())
+    assert texts(restored) == texts(history)
+    assert restored.tokens == history.tokens
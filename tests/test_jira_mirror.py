@@ -0,0 +1,185 @@
+import asyncio
+import json
+import re
+import time
+from datetime import datetime, timezone
+
+from mcp.types import CallToolResult, TextContent
+
+from jira_mirror import ISO, JiraMirror, SyncState, live_jql
+from result_cache import permission_scope
+
+ALICE = permission_scope("cloud", "alice")
+BOB = permission_scope("cloud", "bob")
+
+
+def _result(payload) -> CallToolResult:
+    return CallToolResult(content=[TextContent(type="text", text=json.dumps(payload))])
+
+
+class FakeJira:
+    """Answers ``jira_search`` like Jira, from issues updated minutes apart."""
+
+    def __init__(self, count: int, profile=None):
+        now = time.time()
+        self.updated = {f"P-{n}": now - (count - n) * 120 for n in range(1, count + 1)}
+        self.profile = profile
+        self.calls = []
+        self.on_page = None
+
+    def issue(self, key: str) -> dict:
+        moment = datetime.fromtimestamp(self.updated[key], tz=timezone.utc)
+        return {
+            "key": key,
+            "summary": f"Issue {key}",
+            "status": {"name": "Open"},
+            "assignee": {"display_name": "Alice Smith"},
+            "updated": moment.strftime(ISO),
+        }
+
+    async def call_tool(self, name, args):
+        self.calls.append((name, args))
+        if name == "jira_get_user_profile":
+            if self.profile is None:
+                return _result({"error": "not found"})
+            return _result(self.profile)
+        cursor = re.search(r"updated >= -(\d+)m", args["jql"])
+        cutoff = time.time() - int(cursor[1]) * 60 if cursor else 0
+        keys = sorted(
+            (key for key, at in self.updated.items() if at >= cutoff),
+            key=lambda key: (self.updated[key], int(key.split("-")[1])),
+        )
+        start = int(args.get("start_at") or 0)
+        page = [self.issue(key) for key in keys[start : start + args["limit"]]]
+        if self.on_page is not None:
+            self.on_page(self)
+        return _result({"total": len(keys), "issues": page})
+
+
+def test_issue_updated_mid_sync_is_not_skipped(tmp_path):
+    async def scenario():
+        jira = FakeJira(120)
+        mirror = JiraMirror(str(tmp_path / "mirror.db"))
+
+        def touch_first_page_issue(jira):
+            # After the first page, an issue already read moves to the end
+            if len(jira.calls) == 1:
+                jira.updated["P-3"] = time.time()
+
+        jira.on_page = touch_first_page_issue
+        await mirror.sync(jira, ALICE, "P")
+        total, _ = await mirror._db(mirror.index.search, ALICE, "P", limit=200)
+        await mirror.close()
+        return total
+
+    assert asyncio.run(scenario()) == 120
+
+
+def test_sync_pages_through_issues_updated_in_the_same_minute(tmp_path):
+    async def scenario():
+        jira = FakeJira(120)
+        now = time.time()
+        jira.updated = {key: now for key in jira.updated}
+        mirror = JiraMirror(str(tmp_path / "mirror.db"))
+        await mirror.sync(jira, ALICE, "P")
+        total, _ = await mirror._db(mirror.index.search, ALICE, "P", limit=200)
+        state = await mirror._db(mirror.index.state, ALICE, "P")
+        await mirror.close()
+        return total, state.synced_at
+
+    total, synced_at = asyncio.run(scenario())
+    assert total == 120
+    assert synced_at is not None
+
+
+def test_mirror_rows_are_kept_per_user(tmp_path):
+    async def scenario():
+        mirror = JiraMirror(str(tmp_path / "mirror.db"))
+        await mirror.sync(FakeJira(10), ALICE, "P")
+        bob = FakeJira(0)
+        result = await mirror.search(bob, {"project_key": "P"}, BOB)
+        alice = await mirror.search(FakeJira(0), {"project_key": "P"}, ALICE)
+        await mirror.close()
+        return json.loads(result.content[0].text), json.loads(alice.content[0].text)
+
+    bob, alice = asyncio.run(scenario())
+    # Bob has not synced yet, so his search goes to Jira with his session
+    assert bob.get("source") != "mirror" and bob["issues"] == []
+    assert alice["source"] == "mirror" and alice["total"] == 10
+
+
+def test_idle_scopes_are_dropped(tmp_path):
+    async def scenario():
+        mirror = JiraMirror(str(tmp_path / "mirror.db"), interval=0.01, idle_after=0)
+        await mirror.search(FakeJira(10), {"project_key": "P"}, ALICE)
+        await asyncio.gather(*mirror._syncs.values())
+        mirror.start()
+        await asyncio.sleep(0.05)
+        count = await mirror._db(mirror.index.count)
+        state = await mirror._db(mirror.index.state, ALICE, "P")
+        await mirror.close()
+        return count, state
+
+    assert asyncio.run(scenario()) == (0, None)
+
+
+def test_live_jql_leaves_out_unresolved_assignee():
+    args = {"project_key": "p", "assignee": "ali", "status": "Open"}
+    assert "assignee" not in live_jql(args)
+    assert 'assignee = "abc123"' in live_jql(args, "abc123")
+
+
+def test_live_search_resolves_assignee_to_account_id(tmp_path):
+    async def scenario():
+        jira = FakeJira(
+            3, profile={"accountId": "abc123", "displayName": "Alice Smith"}
+        )
+        mirror = JiraMirror(str(tmp_path / "mirror.db"))
+        await mirror._search_live(
+            jira, ALICE, {"project_key": "P", "assignee": "alice"}
+        )
+        await mirror.close()
+        return jira.calls
+
+    calls = asyncio.run(scenario())
+    assert calls[0][0] == "jira_get_user_profile"
+    assert 'assignee = "abc123"' in calls[1][1]["jql"]
+
+
+def test_live_search_matches_partial_assignee_names(tmp_path):
+    async def scenario():
+        jira = FakeJira(3, profile={"accountId": "xyz", "displayName": "Bob"})
+        mirror = JiraMirror(str(tmp_path / "mirror.db"))
+        smith = await mirror._search_live(
+            jira, ALICE, {"project_key": "P", "assignee": "smi"}
+        )
+        carol = await mirror._search_live(
+            jira, ALICE, {"project_key": "P", "assignee": "car"}
+        )
+        await mirror.close()
+        return json.loads(smith.content[0].text), json.loads(carol.content[0].text)
+
+    smith, carol = asyncio.run(scenario())
+    # The profile lookup answered with someone else, so names are matched
+    assert smith["total"] == 3
+    assert carol["total"] == 0 and carol["issues"] == []
+
+
+def test_backfill_saved_before_any_issue_resumes(tmp_path):
+    async def scenario():
+        jira = FakeJira(5)
+        mirror = JiraMirror(str(tmp_path / "mirror.db"), backfill_days=1)
+        covered_since = datetime.fromtimestamp(time.time() - 3600, tz=timezone.utc)
+        state = SyncState(None, covered_since.strftime(ISO), None)
+        await mirror._db(mirror.index.save_state, ALICE, "P", state)
+        await mirror.sync(jira, ALICE, 'P"X')
+        await mirror.sync(jira, ALICE, "P")
+        total, _ = await mirror._db(mirror.index.search, ALICE, "P", limit=10)
+        await mirror.close()
+        return total, [args["jql"] for _, args in jira.calls]
+
+    total, queries = asyncio.run(scenario())
+    assert total == 5
+    assert queries[0].startswith('project = "P\\"X" AND updated >= ')
+    # The stored backfill resumes from where it started, an hour ago
+    assert 60 <= int(re.search(r"updated >= -(\d+)m", queries[1])[1]) <= 61
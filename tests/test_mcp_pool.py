@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED, ErrorData
+
+from fakes import FakeSession, fake_mcp, run  # noqa: F401
+from mcp_pool import MCPSessionPool
+
+
+def connection_closed():
+    return McpError(ErrorData(code=CONNECTION_CLOSED, message="Connection closed"))
+
+
+def test_same_key_shares_one_session():
+    async def scenario():
+        pool = MCPSessionPool(url="http://mcp")
+        first = await pool.acquire("token", "cloud")
+        second = await pool.acquire("token", "cloud")
+        assert first.session is second.session
+        assert first.entry.leases == 2
+        await pool.release(first)
+        await pool.release(first)
+        assert second.entry.leases == 1
+        assert (await second.call_tool("jira_get_issue", {}))[2] is second.session
+        await pool.release(second)
+        await pool.close()
+
+    run(scenario)
+
+
+def test_release_of_a_replaced_session_leaves_the_new_one_alone():
+    async def scenario():
+        pool = MCPSessionPool(url="http://mcp")
+        old = await pool.acquire("token", "cloud")
+        await pool.invalidate(old)
+        await asyncio.sleep(0)
+        new = await pool.acquire("token", "cloud")
+        assert new.entry is not old.entry
+        await pool.release(old)
+        assert new.entry.leases == 1
+        assert new.entry.alive
+        assert pool._entries[("token", "cloud")] is new.entry
+        await pool.release(new)
+        await pool.close()
+
+    run(scenario)
+
+
+def test_failed_acquire_keeps_the_session_other_holders_wait_for():
+    async def scenario():
+        pool = MCPSessionPool(url="http://mcp", acquire_timeout=5)
+        FakeSession.gate.clear()
+        waiting = asyncio.create_task(pool.acquire("token", "cloud"))
+        giving_up = asyncio.create_task(pool.acquire("token", "cloud"))
+        await asyncio.sleep(0.01)
+        giving_up.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await giving_up
+        FakeSession.gate.set()
+        lease = await waiting
+        assert lease.entry.alive
+        assert lease.entry.leases == 1
+        assert len(FakeSession.instances) == 1
+        await pool.release(lease)
+        await pool.close()
+
+    run(scenario)
+
+
+def test_lost_connection_is_replaced_on_the_next_call():
+    async def scenario():
+        pool = MCPSessionPool(url="http://mcp")
+        lease = await pool.acquire("token", "cloud")
+        other = await pool.acquire("token", "cloud")
+        lease.session.fail_with = connection_closed()
+        with pytest.raises(McpError):
+            await lease.call_tool("jira_get_issue", {"issue_key": "A-1"})
+        name, _, session = await lease.call_tool("jira_get_issue", {})
+        assert session is FakeSession.instances[1]
+        # The other holder moves to the same fresh session
+        assert (await other.call_tool("jira_search", {}))[2] is session
+        assert pool.metrics["invalidations"] == 1
+        assert pool.metrics["renewals"] == 2
+        assert lease.entry.leases == 2
+        await pool.release(lease)
+        await pool.release(other)
+        await pool.close()
+
+    run(scenario)
+
+
+def test_call_in_flight_keeps_its_session_from_eviction():
+    async def scenario():
+        pool = MCPSessionPool(url="http://mcp", max_sessions=1, acquire_timeout=5)
+        lease = await pool.acquire("a", "cloud")
+        lease.session.call_delay = 0.05
+        call = asyncio.create_task(lease.call_tool("jira_get_issue", {}))
+        await asyncio.sleep(0)
+        await pool.release(lease)
+        other = await pool.acquire("b", "cloud")
+        assert call.done()
+        assert (await call)[2] is FakeSession.instances[0]
+        assert pool.metrics["evictions"] == 1
+        await pool.release(other)
+        await pool.close()
+
+    run(scenario)
+
+
+def test_released_lease_refuses_calls():
+    async def scenario():
+        pool = MCPSessionPool(url="http://mcp")
+        lease = await pool.acquire("token", "cloud")
+        await pool.release(lease)
+        with pytest.raises(ConnectionError):
+            await lease.call_tool("jira_get_issue", {})
+        await pool.close()
+
+    run(scenario)
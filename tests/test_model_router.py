@@ -0,0 +1,62 @@
+from google.genai import types
+
+from model_router import ModelRouter
+from tool_router import ToolRouter
+from tools import tools
+
+LADDER = ["lite", "flash", "pro"]
+
+
+def router(**kwargs) -> ModelRouter:
+    return ModelRouter(
+        chat_models=LADDER,
+        format_models=["lite", "flash"],
+        tool_declarations=tools,
+        default_chat_model="flash",
+        **kwargs,
+    )
+
+
+def test_simple_turns_start_on_the_cheapest_model():
+    assert router().choose("open PROJ-1", tools_likely=True) == "lite"
+    long_plan = "compare the sprint scope and explain why " * 30
+    assert router().choose(long_plan, tools_likely=True, last_failed=True) == "pro"
+    assert router(enabled=False).choose("hi", tools_likely=False) == "flash"
+
+
+def test_escalation_climbs_the_ladder_and_stops_at_the_top():
+    models = router()
+    assert models.escalate("lite", "empty reply") == "flash"
+    assert models.escalate("pro", "empty reply") is None
+    assert models.stats()["escalation_paths"] == {"lite->flash": 1}
+
+
+def test_unknown_model_escalates_to_the_top_not_the_bottom():
+    assert router().escalate("gemini-exp", "empty reply") == "pro"
+
+
+def test_format_model_by_payload_size():
+    models = router(small_format_chars=10)
+    assert models.format_model("short") == "lite"
+    assert models.format_model("x" * 11) == "flash"
+
+
+def test_weak_steps():
+    models = router()
+    call = types.FunctionCall(name="jira_get_issue", args={})
+    assert models.weak_step("", [call], None) == "jira_get_issue missing issue_key"
+    assert models.weak_step("", [], None) == "empty reply"
+    assert models.weak_step("", [], "MALFORMED_FUNCTION_CALL")
+    assert models.weak_step("Done.", [], "STOP") is None
+
+
+def test_tools_likely_ignores_chit_chat():
+    tool_router = ToolRouter(tools)
+    for message in ("thanks, that's all for now", "write me a poem about agile"):
+        assert not tool_router.tools_likely(message)
+    for message in (
+        "open PROJ-12",
+        "log 2 hours on my ticket",
+        "list sprints on board 3",
+    ):
+        assert tool_router.tools_likely(message)
@@ -0,0 +1,109 @@
+import asyncio
+from types import SimpleNamespace
+
+from fakes import FakeSession, fake_mcp, run  # noqa: F401
+from mcp_pool import MCPSessionPool
+from prefetch import Prefetcher, references
+from result_cache import ToolResultCache, permission_scope
+from singleflight import SingleFlight
+from tool_executor import ToolExecutor
+
+SCOPE = permission_scope("cloud", "alice")
+
+
+def test_references_build_the_models_arguments():
+    assert references("Compare PROJ-1 with proj-2 and PROJ-1 in sprint #12") == [
+        ("jira_get_issue", {"issue_key": "PROJ-1"}),
+        ("jira_get_sprint_issues", {"sprint_id": "12"}),
+    ]
+    assert references("what is on board 7?") == [
+        ("jira_get_sprints_from_board", {"board_id": "7"})
+    ]
+
+
+def test_real_call_racing_a_prefetch_joins_it():
+    async def scenario():
+        pool = MCPSessionPool(url="http://mcp")
+        lease = await pool.acquire("token", "cloud")
+        lease.session.call_delay = 0.02
+        executor = ToolExecutor(cache=ToolResultCache(), coalescer=SingleFlight())
+        prefetcher = Prefetcher(executor)
+        prefetched = prefetcher.start(lease, "what about PROJ-1?", SCOPE)
+        await asyncio.sleep(0.005)
+        # Another turn of the same user, which has no claim on the prefetch
+        done = [
+            outcome
+            async for outcome in executor.execute(
+                lease,
+                [
+                    (
+                        "1",
+                        SimpleNamespace(
+                            name="jira_get_issue", args={"issue_key": "PROJ-1"}
+                        ),
+                    )
+                ],
+                scope=SCOPE,
+            )
+        ]
+        assert done[0].ok
+        assert len(lease.session.calls) == 1
+        assert executor.coalescer.metrics["coalesced"] == 1
+        prefetched.close()
+        await pool.release(lease)
+        await pool.close()
+
+    run(scenario)
+
+
+def test_prefetch_is_used_by_the_turn_that_started_it():
+    async def scenario():
+        pool = MCPSessionPool(url="http://mcp")
+        lease = await pool.acquire("token", "cloud")
+        executor = ToolExecutor(cache=ToolResultCache(), coalescer=SingleFlight())
+        prefetcher = Prefetcher(executor)
+        prefetched = prefetcher.start(lease, "open PROJ-1", SCOPE)
+        await asyncio.sleep(0.01)
+        done = [
+            outcome
+            async for outcome in executor.execute(
+                lease,
+                [
+                    (
+                        "1",
+                        SimpleNamespace(
+                            name="jira_get_issue", args={"issue_key": "PROJ-1"}
+                        ),
+                    )
+                ],
+                scope=SCOPE,
+                prefetched=prefetched,
+            )
+        ]
+        # Already cached by the prefetch, which is therefore left unused
+        assert done[0].cached or done[0].prefetched
+        assert len(lease.session.calls) == 1
+        prefetched.close()
+        await pool.release(lease)
+        await pool.close()
+
+    run(scenario)
+
+
+def test_write_in_between_makes_a_prefetch_stale():
+    async def scenario():
+        pool = MCPSessionPool(url="http://mcp")
+        lease = await pool.acquire("token", "cloud")
+        lease.session.call_delay = 0.01
+        cache = ToolResultCache()
+        executor = ToolExecutor(cache=cache, coalescer=SingleFlight())
+        prefetcher = Prefetcher(executor)
+        prefetched = prefetcher.start(lease, "open PROJ-1", SCOPE)
+        cache.invalidate_for(SCOPE, "jira_update_issue", {"issue_key": "PROJ-1"})
+        assert await prefetched.take("jira_get_issue", {"issue_key": "PROJ-1"}) is None
+        assert prefetcher.metrics["stale"] == 1
+        prefetched.close()
+        await pool.release(lease)
+        await pool.close()
+
+    run(scenario)
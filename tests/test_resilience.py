@@ -0,0 +1,178 @@
+import asyncio
+
+import httpx
+import pytest
+from google.genai import errors as genai_errors
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED, ErrorData
+
+from context_cache import is_cache_error
+from fakes import FakeSession, fake_mcp, run  # noqa: F401
+from mcp_pool import MCPSessionPool
+from resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryBudget,
+    RetryPolicy,
+    Upstream,
+    is_transient,
+)
+
+
+def api_error(code: int, message: str) -> genai_errors.ClientError:
+    return genai_errors.ClientError(code, {"error": {"code": code, "message": message}})
+
+
+def upstream(**kwargs) -> Upstream:
+    return Upstream("test", RetryPolicy(max_attempts=3, base_delay=0), **kwargs)
+
+
+class Flaky:
+    """Fails with ``errors`` in turn, then answers ``"ok"``."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def test_transient_errors():
+    assert is_transient(ConnectionError())
+    assert is_transient(api_error(429, "Resource exhausted"))
+    assert not is_transient(api_error(400, "Bad request"))
+    assert is_transient(
+        McpError(ErrorData(code=CONNECTION_CLOSED, message="Connection closed"))
+    )
+    assert not is_transient(ValueError())
+
+
+def test_only_cache_rejections_count_as_cache_errors():
+    assert is_cache_error(api_error(404, "CachedContent not found"))
+    assert not is_cache_error(api_error(429, "Resource exhausted"))
+    assert not is_cache_error(api_error(400, "Invalid contents"))
+
+
+def test_breaker_opens_and_lets_one_probe_through():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    asyncio.run(asyncio.sleep(0.06))
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_opens_again():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.metrics["opened"] == 2
+
+
+def test_retries_transient_errors_but_not_writes_or_bad_requests():
+    async def scenario():
+        calls = upstream()
+        flaky = Flaky(ConnectionError(), ConnectionError())
+        assert await calls.call(flaky) == "ok" and flaky.calls == 3
+        write = Flaky(ConnectionError())
+        with pytest.raises(ConnectionError):
+            await calls.call(write, retryable=False)
+        bad = Flaky(ValueError())
+        with pytest.raises(ValueError):
+            await calls.call(bad)
+        return write.calls, bad.calls
+
+    assert asyncio.run(scenario()) == (1, 1)
+
+
+def test_retry_budget_bounds_retries():
+    async def scenario():
+        calls = upstream(budget=RetryBudget(ratio=0, min_per_second=0, max_balance=1))
+        first = Flaky(ConnectionError())
+        await calls.call(first)
+        second = Flaky(ConnectionError())
+        with pytest.raises(ConnectionError):
+            await calls.call(second)
+        return calls.stats()["budget_exhausted"]
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_every_retry_is_admitted_again():
+    async def scenario():
+        admitted = []
+
+        async def readmit():
+            admitted.append(True)
+
+        calls = upstream()
+        await calls.call(
+            Flaky(ConnectionError(), ConnectionError()), before_retry=readmit
+        )
+
+        async def open_stream():
+            async def chunks():
+                yield "chunk"
+
+            return chunks()
+
+        failing_open = Flaky(ConnectionError())
+
+        async def flaky_open():
+            await failing_open()
+            return await open_stream()
+
+        items = [item async for item in calls.stream(flaky_open, before_retry=readmit)]
+        return len(admitted), items
+
+    assert asyncio.run(scenario()) == (3, ["chunk"])
+
+
+def test_breakers_are_kept_per_key():
+    async def scenario():
+        calls = Upstream(
+            "test",
+            RetryPolicy(max_attempts=1),
+            breaker=CircuitBreaker("test", failure_threshold=1),
+        )
+        with pytest.raises(httpx.ConnectError):
+            await calls.call(Flaky(httpx.ConnectError("down")), key="cloud-a")
+        with pytest.raises(CircuitOpenError):
+            await calls.call(Flaky(), key="cloud-a")
+        return await calls.call(Flaky(), key="cloud-b"), await calls.call(Flaky())
+
+    assert asyncio.run(scenario()) == ("ok", "ok")
+
+
+def test_closed_connection_is_retried_on_a_fresh_session():
+    async def scenario():
+        pool = MCPSessionPool(url="http://mcp")
+        lease = await pool.acquire("token", "cloud")
+        dead = lease.session
+        dead.fail_with = McpError(
+            ErrorData(code=CONNECTION_CLOSED, message="Connection closed")
+        )
+        result = await upstream().call(lambda: lease.call_tool("jira_get_issue", {}))
+        await pool.release(lease)
+        await pool.close()
+        return dead, result[2], pool.stats()
+
+    dead, answered_by, stats = run(scenario)
+    assert answered_by is not dead
+    assert stats["invalidations"] == 1 and stats["renewals"] == 1
@@ -0,0 +1,144 @@
+from mcp.types import CallToolResult, TextContent
+
+import result_cache
+from result_cache import ToolResultCache, permission_scope
+
+ALICE = permission_scope("cloud-1", "alice")
+BOB = permission_scope("cloud-1", "bob")
+CAROL_ELSEWHERE = permission_scope("cloud-2", "carol")
+
+
+def result(text: str, is_error: bool = False) -> CallToolResult:
+    return CallToolResult(
+        content=[TextContent(type="text", text=text)], isError=is_error
+    )
+
+
+def test_results_are_not_shared_between_users():
+    cache = ToolResultCache()
+    cache.put(ALICE, "jira_get_issue", {"issue_key": "SEC-1"}, result("secret"))
+    assert cache.get(ALICE, "jira_get_issue", {"issue_key": "SEC-1"}) is not None
+    assert cache.get(BOB, "jira_get_issue", {"issue_key": "SEC-1"}) is None
+
+
+def test_args_are_matched_canonically():
+    cache = ToolResultCache()
+    cache.put(
+        ALICE, "jira_search", {"jql": "x", "limit": 5, "fields": None}, result("r")
+    )
+    assert cache.get(ALICE, "jira_search", {"limit": 5, "jql": "x"}) is not None
+
+
+def test_write_invalidates_every_users_entries_on_the_cloud():
+    cache = ToolResultCache()
+    for scope in (ALICE, BOB, CAROL_ELSEWHERE):
+        cache.put(scope, "jira_get_issue", {"issue_key": "P-1"}, result("old"))
+        cache.put(scope, "jira_search", {"jql": "project = P"}, result("list"))
+    cache.put(ALICE, "jira_get_issue", {"issue_key": "P-2"}, result("other"))
+    cache.invalidate_for(BOB, "jira_update_issue", {"issue_key": "p-1"})
+    for scope in (ALICE, BOB):
+        assert cache.get(scope, "jira_get_issue", {"issue_key": "P-1"}) is None
+        assert cache.get(scope, "jira_search", {"jql": "project = P"}) is None
+    assert cache.get(ALICE, "jira_get_issue", {"issue_key": "P-2"}) is not None
+    assert cache.get(CAROL_ELSEWHERE, "jira_get_issue", {"issue_key": "P-1"})
+
+
+def test_comment_only_invalidates_the_issue():
+    cache = ToolResultCache()
+    cache.put(ALICE, "jira_get_issue", {"issue_key": "P-1"}, result("old"))
+    cache.put(ALICE, "jira_search", {"jql": "project = P"}, result("list"))
+    cache.invalidate_for(ALICE, "jira_add_comment", {"issue_key": "P-1"})
+    assert cache.get(ALICE, "jira_get_issue", {"issue_key": "P-1"}) is None
+    assert cache.get(ALICE, "jira_search", {"jql": "project = P"}) is not None
+
+
+def test_unknown_write_clears_the_whole_cloud():
+    cache = ToolResultCache()
+    cache.put(ALICE, "jira_get_agile_boards", {}, result("boards"))
+    cache.put(CAROL_ELSEWHERE, "jira_get_agile_boards", {}, result("boards"))
+    cache.invalidate_for(BOB, "jira_some_new_write", {})
+    assert cache.get(ALICE, "jira_get_agile_boards", {}) is None
+    assert cache.get(CAROL_ELSEWHERE, "jira_get_agile_boards", {}) is not None
+
+
+def test_read_that_raced_a_write_is_not_stored():
+    cache = ToolResultCache()
+    generation = cache.generation(ALICE)
+    cache.invalidate_for(BOB, "jira_update_issue", {"issue_key": "P-1"})
+    cache.put(
+        ALICE, "jira_get_issue", {"issue_key": "P-1"}, result("stale"), generation
+    )
+    assert cache.get(ALICE, "jira_get_issue", {"issue_key": "P-1"}) is None
+    cache.put(
+        ALICE,
+        "jira_get_issue",
+        {"issue_key": "P-1"},
+        result("fresh"),
+        cache.generation(ALICE),
+    )
+    assert cache.get(ALICE, "jira_get_issue", {"issue_key": "P-1"}) is not None
+
+
+def test_reads_of_other_clouds_keep_their_generation():
+    cache = ToolResultCache()
+    generation = cache.generation(CAROL_ELSEWHERE)
+    cache.invalidate_for(ALICE, "jira_update_issue", {"issue_key": "P-1"})
+    assert cache.generation(CAROL_ELSEWHERE) == generation
+
+
+def test_errors_and_uncacheable_tools_are_not_stored():
+    cache = ToolResultCache()
+    cache.put(ALICE, "jira_get_issue", {"issue_key": "P-1"}, result("no", True))
+    cache.put(ALICE, "jira_get_user_profile", {"user_identifier": "me"}, result("p"))
+    assert cache.get(ALICE, "jira_get_issue", {"issue_key": "P-1"}) is None
+    assert cache.get(ALICE, "jira_get_user_profile", {"user_identifier": "me"}) is None
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+    cache = ToolResultCache()
+    cache.put(ALICE, "jira_get_issue", {"issue_key": "P-1"}, result("r"))
+    now[0] += 59
+    assert cache.get(ALICE, "jira_get_issue", {"issue_key": "P-1"}) is not None
+    now[0] += 2
+    assert cache.get(ALICE, "jira_get_issue", {"issue_key": "P-1"}) is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_least_recently_used_entries_go_first_over_the_byte_cap():
+    cache = ToolResultCache(max_bytes=30, max_entry_bytes=20)
+    cache.put(ALICE, "jira_get_issue", {"issue_key": "P-1"}, result("a" * 10))
+    cache.put(ALICE, "jira_get_issue", {"issue_key": "P-2"}, result("b" * 10))
+    cache.get(ALICE, "jira_get_issue", {"issue_key": "P-1"})
+    cache.put(ALICE, "jira_get_issue", {"issue_key": "P-3"}, result("c" * 15))
+    assert cache.get(ALICE, "jira_get_issue", {"issue_key": "P-2"}) is None
+    assert cache.get(ALICE, "jira_get_issue", {"issue_key": "P-1"}) is not None
+    assert cache.bytes <= 30
+    cache.put(ALICE, "jira_get_issue", {"issue_key": "P-4"}, result("d" * 25))
+    assert cache.get(ALICE, "jira_get_issue", {"issue_key": "P-4"}) is None
+
+
+def test_changelog_reads_are_cached_and_invalidate_nothing():
+    cache = ToolResultCache()
+    cache.put(ALICE, "jira_get_issue", {"issue_key": "P-1"}, result("issue"))
+    cache.put(BOB, "jira_search", {"jql": "project = P"}, result("list"))
+    args = {"issue_ids_or_keys": ["P-1"]}
+    cache.invalidate_for(ALICE, "jira_batch_get_changelogs", args)
+    assert cache.generation(ALICE) == 0
+    assert cache.get(ALICE, "jira_get_issue", {"issue_key": "P-1"}) is not None
+    assert cache.get(BOB, "jira_search", {"jql": "project = P"}) is not None
+    cache.put(ALICE, "jira_batch_get_changelogs", args, result("changes"))
+    cache.invalidate_for(ALICE, "jira_add_comment", {"issue_key": "P-1"})
+    assert cache.get(ALICE, "jira_batch_get_changelogs", args) is None
+
+
+def test_removed_link_drops_cached_issues():
+    cache = ToolResultCache()
+    cache.put(ALICE, "jira_get_issue", {"issue_key": "P-1"}, result("linked"))
+    cache.put(BOB, "jira_get_issue", {"issue_key": "P-2"}, result("linked"))
+    cache.put(ALICE, "jira_search", {"jql": "project = P"}, result("list"))
+    cache.invalidate_for(ALICE, "jira_remove_issue_link", {"link_id": "10"})
+    assert cache.get(ALICE, "jira_get_issue", {"issue_key": "P-1"}) is None
+    assert cache.get(BOB, "jira_get_issue", {"issue_key": "P-2"}) is None
+    assert cache.get(ALICE, "jira_search", {"jql": "project = P"}) is not None
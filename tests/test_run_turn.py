@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from fake_gemini import FakeJiraSession, FakeSocket, chunk, gemini, server  # noqa: F401
+from history import CANCELLED_TURN_NOTE
+
+MESSAGE = "tell me a long story about sprint planning"
+
+
+class SlowSocket(FakeSocket):
+    """A client on a slow link, so ending the turn takes a while."""
+
+    async def send_text(self, text: str):
+        await asyncio.sleep(0.02)
+        await super().send_text(text)
+
+
+def story(words: int = 20) -> list:
+    return [chunk(f"word{n} ", tokens=110) for n in range(words)]
+
+
+async def start_turn(socket, history, token, ended):
+    writer = server.frame_batcher.writer(socket)
+    task = asyncio.create_task(
+        server.run_turn(
+            writer,
+            FakeJiraSession(),
+            history,
+            MESSAGE,
+            "cloud/turns",
+            "u",
+            False,
+            None,
+            (token, "owner"),
+            ended,
+        )
+    )
+    # Let a few chunks reach the client before the user stops the answer
+    while not any(event["type"] == "text" for event in socket.events):
+        await asyncio.sleep(0.01)
+    return task
+
+
+def test_cancelled_turn_ends_reports_usage_and_saves(gemini):
+    gemini.steps, gemini.delay = [story()], 0.02
+
+    async def scenario():
+        socket, history, ended = (
+            FakeSocket(),
+            server.ConversationHistory(),
+            asyncio.Event(),
+        )
+        task = await start_turn(socket, history, "cancel-once", ended)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        saved = await server.conversations.load("cancel-once", "owner")
+        return socket.events, history, ended, saved
+
+    events, history, ended, saved = asyncio.run(scenario())
+    assert ended.is_set() and gemini.closed == 1
+    types = [event["type"] for event in events]
+    assert types.count("token_usage") == types.count("end") == 1
+    assert types[-2:] == ["token_usage", "end"] and events[-1]["cancelled"] is True
+    assert events[-2]["token_usage"]["input_tokens"] > 0
+    assert history.contents()[-1].parts[0].text == CANCELLED_TURN_NOTE
+    assert saved == history.state()
+
+
+def test_second_cancel_does_not_cut_the_end_short(gemini):
+    gemini.steps, gemini.delay = [story()], 0.02
+
+    async def scenario():
+        socket, history, ended = (
+            SlowSocket(),
+            server.ConversationHistory(),
+            asyncio.Event(),
+        )
+        task = await start_turn(socket, history, "cancel-twice", ended)
+        task.cancel()
+        await ended.wait()
+        # The turn is now sending its end under the shield
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        saved = None
+        for _ in range(50):
+            saved = await server.conversations.load("cancel-twice", "owner")
+            if saved is not None:
+                break
+            await asyncio.sleep(0.01)
+        return socket.events, saved
+
+    events, saved = asyncio.run(scenario())
+    assert [event["type"] for event in events][-2:] == ["token_usage", "end"]
+    assert events[-1]["cancelled"] is True
+    assert saved["turns"][-1][0]["parts"][0]["text"] == MESSAGE
+
+
+def test_finished_turn_ends_without_cancelled(gemini):
+    gemini.steps = [[chunk("Sprint planning "), chunk("went well.")]]
+
+    async def scenario():
+        socket, history = FakeSocket(), server.ConversationHistory()
+        writer = server.frame_batcher.writer(socket)
+        failed = await server.run_turn(
+            writer, FakeJiraSession(), history, MESSAGE, "cloud/turns", "u", False
+        )
+        await writer.flush()
+        return failed, socket.events
+
+    failed, events = asyncio.run(scenario())
+    assert failed is False
+    assert events[-1] == {"type": "end", "cancelled": False}
+    text = "".join(event["text"] for event in events if event["type"] == "text")
+    assert "Sprint planning went well." in text
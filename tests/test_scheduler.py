@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from scheduler import (
+    BACKGROUND,
+    INTERACTIVE,
+    GeminiScheduler,
+    SchedulerBusyError,
+    TokenBucket,
+)
+
+
+def test_bucket_refills_and_carries_debt():
+    bucket = TokenBucket(10, 600)
+    bucket.take(15)
+    assert bucket.level == pytest.approx(-5, abs=0.1)
+    assert bucket.delay(1) == pytest.approx(0.6, abs=0.01)
+
+
+def test_unlimited_models_are_admitted_at_once():
+    async def scenario():
+        scheduler = GeminiScheduler({})
+        await scheduler.admit("any", "alice", 10**9)
+        return scheduler.stats()
+
+    assert asyncio.run(scenario())["admitted"] == 1
+
+
+def test_workers_share_the_quota():
+    async def scenario():
+        scheduler = GeminiScheduler({"m": (60, 60_000)}, workers=4)
+        scheduler._queue("m")
+        queue = scheduler._models["m"]
+        return queue.requests.capacity, queue.tokens.capacity
+
+    assert asyncio.run(scenario()) == (15, 15_000)
+
+
+def test_users_are_served_round_robin_with_interactive_first():
+    async def scenario():
+        scheduler = GeminiScheduler({"m": (600, 10**6)}, max_wait=5)
+        queue = scheduler._queue("m")
+        queue.requests.level = 0
+        order = []
+
+        async def call(user, priority=INTERACTIVE):
+            await scheduler.admit("m", user, 1, priority)
+            order.append(user)
+
+        tasks = [
+            asyncio.create_task(call(user, priority))
+            for user, priority in [
+                ("summary", BACKGROUND),
+                ("alice", INTERACTIVE),
+                ("alice", INTERACTIVE),
+                ("bob", INTERACTIVE),
+            ]
+        ]
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == ["alice", "bob", "alice", "summary"]
+
+
+def test_full_queue_rejects():
+    async def scenario():
+        scheduler = GeminiScheduler({"m": (1, 10**6)}, max_queue_depth=1, max_wait=60)
+        await scheduler.admit("m", "alice", 1)
+        waiting = asyncio.create_task(scheduler.admit("m", "bob", 1))
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerBusyError):
+            await scheduler.admit("m", "carol", 1)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        return scheduler.stats()
+
+    assert asyncio.run(scenario())["rejected"] == 1
+
+
+def test_cancelled_waiters_leave_the_depth():
+    async def scenario():
+        scheduler = GeminiScheduler({"m": (1, 10**6)}, max_wait=120)
+        await scheduler.admit("m", "alice", 1)
+        head = asyncio.create_task(scheduler.admit("m", "bob", 1))
+        behind = [
+            asyncio.create_task(scheduler.admit("m", f"user{n}", 1)) for n in range(3)
+        ]
+        await asyncio.sleep(0)
+        for task in behind:
+            task.cancel()
+        await asyncio.gather(*behind, return_exceptions=True)
+        depth = scheduler.stats()["queue_depth"]["m"]
+        head.cancel()
+        await asyncio.gather(head, return_exceptions=True)
+        return depth, scheduler.stats()["queue_depth"]["m"]
+
+    assert asyncio.run(scenario()) == (1, 0)
+
+
+def test_grant_the_waiter_gave_up_on_is_refunded():
+    async def scenario():
+        scheduler = GeminiScheduler({"m": (60, 600)}, max_wait=60)
+        queue = scheduler._queue("m")
+        await scheduler.admit("m", "alice", 100)
+        queue.requests.level = 0
+
+        async def give_up(position, wait):
+            # Granted while the caller is still busy, then it fails anyway
+            queue.requests.level = 1
+            queue.wakeup.set()
+            await asyncio.sleep(0.01)
+            raise ConnectionError
+
+        scheduler.notify_after = 0
+        with pytest.raises(ConnectionError):
+            await scheduler.admit("m", "bob", 100, on_queued=give_up)
+        return queue.requests.level, queue.tokens.level, queue.depth
+
+    requests, tokens, depth = asyncio.run(scenario())
+    assert requests == pytest.approx(1, abs=0.05)
+    assert tokens == pytest.approx(500, abs=5)
+    assert depth == 0
+
+
+def test_settle_corrects_the_token_bucket():
+    async def scenario():
+        scheduler = GeminiScheduler({"m": (60, 10_000)})
+        ticket = await scheduler.admit("m", "alice", 1000)
+        scheduler.settle(ticket, 3000)
+        return scheduler._models["m"].tokens.level
+
+    assert asyncio.run(scenario()) == pytest.approx(7000, abs=5)
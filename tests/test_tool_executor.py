@@ -0,0 +1,108 @@
+import asyncio
+from types import SimpleNamespace
+
+from fakes import FakeSession, fake_mcp, run  # noqa: F401
+from mcp_pool import MCPSessionPool
+from result_cache import ToolResultCache, permission_scope
+from singleflight import SingleFlight
+from tool_executor import ToolExecutor
+
+ALICE = permission_scope("cloud", "alice")
+BOB = permission_scope("cloud", "bob")
+
+
+def call(name: str, **args):
+    return SimpleNamespace(name=name, args=args)
+
+
+async def outcomes(executor, session, calls, scope):
+    return [
+        outcome
+        async for outcome in executor.execute(
+            session, [(str(i), c) for i, c in enumerate(calls)], scope=scope
+        )
+    ]
+
+
+def test_identical_reads_of_one_user_are_coalesced():
+    async def scenario():
+        pool = MCPSessionPool(url="http://mcp")
+        lease = await pool.acquire("alice-token", "cloud")
+        lease.session.call_delay = 0.01
+        executor = ToolExecutor(coalescer=SingleFlight())
+        done = await outcomes(
+            executor, lease, [call("jira_get_issue", issue_key="P-1")] * 3, ALICE
+        )
+        assert all(outcome.ok for outcome in done)
+        assert len(lease.session.calls) == 1
+        await pool.release(lease)
+        await pool.close()
+
+    run(scenario)
+
+
+def test_users_on_one_cloud_never_share_a_call_or_a_result():
+    async def scenario():
+        pool = MCPSessionPool(url="http://mcp")
+        alice = await pool.acquire("alice-token", "cloud")
+        bob = await pool.acquire("bob-token", "cloud")
+        for lease in (alice, bob):
+            lease.session.call_delay = 0.01
+        executor = ToolExecutor(cache=ToolResultCache(), coalescer=SingleFlight())
+        issue = call("jira_get_issue", issue_key="P-1")
+        alice_done, bob_done = await asyncio.gather(
+            outcomes(executor, alice, [issue], ALICE),
+            outcomes(executor, bob, [issue], BOB),
+        )
+        assert alice_done[0].result[2] is alice.session
+        assert bob_done[0].result[2] is bob.session
+        # Bob's cached copy is his own
+        cached = await outcomes(executor, bob, [issue], BOB)
+        assert cached[0].cached and cached[0].result[2] is bob.session
+        await pool.release(alice)
+        await pool.release(bob)
+        await pool.close()
+
+    run(scenario)
+
+
+def test_coalesced_call_survives_the_first_caller_releasing_its_lease():
+    async def scenario():
+        pool = MCPSessionPool(url="http://mcp")
+        first = await pool.acquire("token", "cloud")
+        second = await pool.acquire("token", "cloud")
+        first.session.call_delay = 0.02
+        executor = ToolExecutor(coalescer=SingleFlight())
+        issue = call("jira_get_issue", issue_key="P-1")
+        leader = asyncio.create_task(outcomes(executor, first, [issue], ALICE))
+        await asyncio.sleep(0.005)
+        follower = asyncio.create_task(outcomes(executor, second, [issue], ALICE))
+        await asyncio.sleep(0.001)
+        leader.cancel()
+        await pool.release(first)
+        done = await follower
+        assert done[0].ok
+        assert len(FakeSession.instances) == 1
+        await pool.release(second)
+        await pool.close()
+
+    run(scenario)
+
+
+def test_writes_are_not_coalesced_and_invalidate_the_cache():
+    async def scenario():
+        pool = MCPSessionPool(url="http://mcp")
+        lease = await pool.acquire("token", "cloud")
+        cache = ToolResultCache()
+        executor = ToolExecutor(cache=cache, coalescer=SingleFlight())
+        await outcomes(
+            executor, lease, [call("jira_get_issue", issue_key="P-1")], ALICE
+        )
+        comment = call("jira_add_comment", issue_key="P-1", comment="hi")
+        await outcomes(executor, lease, [comment, comment], BOB)
+        assert [name for name, _ in lease.session.calls].count("jira_add_comment") == 2
+        assert cache.get(ALICE, "jira_get_issue", {"issue_key": "P-1"}) is None
+        await pool.release(lease)
+        await pool.close()
+
+    run(scenario)
@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+import pytest
+
+from tool_router import ToolRouter, tokenize
+from tools import tools
+
+
+@pytest.fixture(scope="module")
+def router():
+    return ToolRouter(tools)
+
+
+def test_tokenize_drops_stop_words_and_maps_everyday_words():
+    synonyms = {"tickets": "issue"}
+    assert tokenize("Show me the tickets on boards", synonyms) == ["issue", "board"]
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        ("log 3 hours on PROJ-1", "jira_add_worklog"),
+        ("move PROJ-1 to done", "jira_transition_issue"),
+        ("what changed on PROJ-4 last week", "jira_batch_get_changelogs"),
+        ("list sprints on board 3", "jira_get_sprints_from_board"),
+        ("create a bug in PROJ", "jira_create_issue"),
+        ("download the attachments of PROJ-2", "jira_download_attachments"),
+    ],
+)
+def test_the_wanted_tool_ranks_near_the_top(router, message, expected):
+    assert expected in router.rank(message)[:3]
+
+
+def test_selection_always_includes_the_basics_and_stops_at_top_k(router):
+    selected = router.select("log 3 hours on PROJ-1", top_k=4)
+    assert selected[:2] == ["jira_search", "jira_get_issue"]
+    assert len(selected) == 4 and len(set(selected)) == 4
+    # Nothing matches, so only the tools that are always offered remain
+    assert router.select("hello there") == ["jira_search", "jira_get_issue"]
+    assert router.stats()["routed"] == 2
+
+
+def test_unknown_always_include_names_are_ignored():
+    router = ToolRouter(tools, always_include=("jira_search", "jira_teleport"))
+    assert router.always_include == ["jira_search"]
+    assert len(router.tools_for(["jira_search", "jira_teleport"])) == 1
+
+
+def test_model_reaching_outside_the_selection_widens_it():
+    def chunk(*names, finish_reason=None):
+        return SimpleNamespace(
+            function_calls=[SimpleNamespace(name=name) for name in names],
+            candidates=[SimpleNamespace(finish_reason=finish_reason)],
+        )
+
+    selected = {"jira_search", "jira_get_issue"}
+    assert not ToolRouter.needs_widening(chunk("jira_get_issue"), selected)
+    assert ToolRouter.needs_widening(chunk("jira_add_worklog"), selected)
+    malformed = chunk(finish_reason="MALFORMED_FUNCTION_CALL")
+    assert ToolRouter.needs_widening(malformed, selected)
@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+
+from user_store import (
+    MemoryUserStore,
+    SQLiteUserStore,
+    UserStore,
+    is_user,
+    profile_answer,
+)
+
+PROFILE = {"accountId": "a-1", "displayName": "Alice", "emailAddress": "a@x.io"}
+
+
+def test_interface_cannot_be_instantiated():
+    with pytest.raises(TypeError):
+        UserStore()
+
+    class Partial(UserStore):
+        async def get(self, account_id):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_memory_store_evicts_least_recently_used():
+    async def scenario():
+        store = MemoryUserStore(max_entries=2)
+        await store.put("a", {"n": 1})
+        await store.put("b", {"n": 2})
+        await store.get("a")
+        await store.put("c", {"n": 3})
+        return [await store.get(k) for k in "abc"], store.stats()
+
+    values, stats = asyncio.run(scenario())
+    assert values == [{"n": 1}, None, {"n": 3}]
+    assert stats["evictions"] == 1
+
+
+def test_memory_store_bounds_bytes_and_expires_entries():
+    async def scenario():
+        store = MemoryUserStore(max_bytes=len(json.dumps(PROFILE)) + 5, ttl=-1)
+        await store.put("a-1", PROFILE)
+        expired = await store.get("a-1")
+        store.ttl = 60
+        await store.put("a-1", PROFILE)
+        await store.put("a-2", PROFILE)
+        return expired, await store.get("a-1"), await store.get("a-2"), store.bytes
+
+    expired, first, second, size = asyncio.run(scenario())
+    assert expired is None and first is None
+    assert second == PROFILE and size == len(json.dumps(PROFILE))
+
+
+def test_sqlite_store_survives_restarts(tmp_path):
+    path = str(tmp_path / "users.db")
+
+    async def write():
+        store = SQLiteUserStore(path)
+        await store.put("a-1", PROFILE)
+        await store.remember_login("token", "a-1")
+        await store.close()
+
+    async def read():
+        store = SQLiteUserStore(path)
+        account = await store.account_for("token")
+        profile = await store.get(account)
+        stats = store.stats()
+        await store.close()
+        return account, profile, stats
+
+    asyncio.run(write())
+    account, profile, stats = asyncio.run(read())
+    assert (account, profile) == ("a-1", PROFILE)
+    assert stats["db_hits"] == 2
+
+
+def test_profile_answers_only_calls_about_the_user():
+    assert is_user("me", PROFILE) and is_user("A@X.IO", PROFILE)
+    assert not is_user("bob", PROFILE)
+    answer = profile_answer(
+        PROFILE, "jira_get_user_profile", {"user_identifier": "Alice"}
+    )
+    assert json.loads(answer.content[0].text) == PROFILE
+    assert profile_answer(PROFILE, "jira_get_issue", {"user_identifier": "me"}) is None
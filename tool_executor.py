@@ -0,0 +1,223 @@
+import asyncio
+import time
+import uuid
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from mcp_pool import Lease
+from resilience import Upstream
+from result_cache import (
+    UNCACHED_READ_TOOLS,
+    ToolResultCache,
+    canonical_args,
+    cloud_of,
+)
+from singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    from prefetch import PrefetchSet
+
+
+class ToolCallOutcome:
+    """Result of one MCP tool call dispatched for a model function call."""
+
+    __slots__ = (
+        "call_id",
+        "name",
+        "args",
+        "result",
+        "error",
+        "elapsed",
+        "cached",
+        "prefetched",
+    )
+
+    def __init__(self, call_id: str, name: str, args: dict):
+        self.call_id = call_id
+        self.name = name
+        self.args = args
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.elapsed = 0.0
+        self.cached = False
+        self.prefetched = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def text(self) -> str:
+        """First text block of the MCP result, or its repr if it has none."""
+        try:
+            return self.result.content[0].text
+        except (AttributeError, IndexError, TypeError):
+            return str(self.result)
+
+
+class ToolExecutor:
+    """Run every function call of a model turn concurrently via an MCP session.
+
+    At most ``max_concurrency`` calls of one turn are in flight at a time and
+    each call is bounded by ``call_timeout`` seconds. Outcomes are yielded in
+    completion order so results can be streamed as soon as they are ready.
+    With a ``cache``, read-only calls are served from it and writes
+    invalidate what they touched within the call's ``scope``. With a
+    ``coalescer``, identical read-only calls in flight at the same time for
+    the same scope share one upstream call, made on a lease of its own so
+    it does not depend on the first caller's. With an ``upstream``, transient
+    failures of read-only calls are retried under its budget and the
+    circuit breaker of the scope's cloud; writes are never retried since
+    they may have been applied.
+    Tools in ``local_tools`` are answered in process by their handler,
+    called as ``handler(session, args, scope)``, instead of by the session.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        call_timeout: float = 60.0,
+        cache: Optional[ToolResultCache] = None,
+        coalescer: Optional[SingleFlight] = None,
+        upstream: Optional[Upstream] = None,
+        local_tools: Optional[Dict[str, Callable]] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.call_timeout = call_timeout
+        self.cache = cache
+        self.coalescer = coalescer
+        self.upstream = upstream
+        self.local_tools = local_tools or {}
+
+    @staticmethod
+    def call_id(function_call) -> str:
+        return getattr(function_call, "id", None) or uuid.uuid4().hex[:12]
+
+    async def _call_tool(
+        self, session, name: str, args: dict, scope: Optional[str] = None
+    ):
+        if self.upstream is None:
+            return await session.call_tool(name, args)
+        idempotent = ToolResultCache.is_cacheable(name) or name in UNCACHED_READ_TOOLS
+        return await self.upstream.call(
+            lambda: session.call_tool(name, args),
+            retryable=idempotent,
+            # A cloud that keeps failing only trips its own circuit
+            key=cloud_of(scope) if scope else None,
+        )
+
+    async def fetch(self, session, name: str, args: dict, scope: str):
+        """Call a read-only tool upstream and cache the result if still fresh."""
+        generation = self.cache.generation(scope) if self.cache else None
+        result = await self._call_tool(session, name, args, scope)
+        if self.cache is not None:
+            self.cache.put(scope, name, args, result, generation)
+        return result
+
+    async def shared_fetch(self, session, name: str, args: dict, scope: str):
+        """``fetch``, joined with identical calls in flight for the same scope."""
+        if self.coalescer is None:
+            return await self.fetch(session, name, args, scope)
+        return await self.coalescer.do(
+            (scope, name, canonical_args(args)),
+            lambda: self._detached_fetch(session, name, args, scope),
+        )
+
+    async def _detached_fetch(self, session, name: str, args: dict, scope: str):
+        if not isinstance(session, Lease):
+            return await self.fetch(session, name, args, scope)
+        # Callers that join later depend on this call too, and the first
+        # caller may give its lease back while the call is in flight
+        async with session.borrow() as own:
+            return await self.fetch(own, name, args, scope)
+
+    async def _call(
+        self,
+        session,
+        semaphore: asyncio.Semaphore,
+        outcome: ToolCallOutcome,
+        scope: Optional[str],
+        prefetched: Optional["PrefetchSet"] = None,
+        local_answer: Optional[Callable] = None,
+    ) -> ToolCallOutcome:
+        if local_answer is not None:
+            outcome.result = local_answer(outcome.name, outcome.args)
+            if outcome.result is not None:
+                outcome.cached = True
+                return outcome
+        read_only = scope is not None and ToolResultCache.is_cacheable(outcome.name)
+        if read_only and self.cache is not None:
+            outcome.result = self.cache.get(scope, outcome.name, outcome.args)
+            if outcome.result is not None:
+                outcome.cached = True
+                return outcome
+        if read_only and prefetched is not None:
+            started = time.perf_counter()
+            outcome.result = await prefetched.take(outcome.name, outcome.args)
+            if outcome.result is not None:
+                outcome.prefetched = True
+                outcome.elapsed = time.perf_counter() - started
+                return outcome
+        try:
+            async with semaphore:
+                started = time.perf_counter()
+                if outcome.name in self.local_tools:
+                    call = self.local_tools[outcome.name](
+                        session, outcome.args, scope or ""
+                    )
+                elif not read_only:
+                    call = self._call_tool(session, outcome.name, outcome.args, scope)
+                else:
+                    call = self.shared_fetch(session, outcome.name, outcome.args, scope)
+                try:
+                    outcome.result = await asyncio.wait_for(
+                        call, timeout=self.call_timeout
+                    )
+                except asyncio.TimeoutError:
+                    outcome.error = TimeoutError(
+                        f"{outcome.name} timed out after {self.call_timeout:g}s"
+                    )
+                except Exception as e:
+                    outcome.error = e
+                outcome.elapsed = time.perf_counter() - started
+        finally:
+            if scope is not None and self.cache is not None and not read_only:
+                # Failed, timed out or cancelled writes may still have landed,
+                # so always invalidate
+                self.cache.invalidate_for(scope, outcome.name, outcome.args)
+        return outcome
+
+    async def execute(
+        self,
+        session,
+        calls: List[Tuple[str, object]],
+        scope: Optional[str] = None,
+        prefetched: Optional["PrefetchSet"] = None,
+        local_answer: Optional[Callable] = None,
+    ) -> AsyncIterator[ToolCallOutcome]:
+        """Dispatch ``(call_id, function_call)`` pairs and yield as they finish.
+
+        Read-only calls that were speculatively started in ``prefetched`` are
+        served from those fetches. ``local_answer(name, args)`` may return a
+        result for a call, which then never reaches the session.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [
+            asyncio.create_task(
+                self._call(
+                    session,
+                    semaphore,
+                    ToolCallOutcome(call_id, function_call.name, function_call.args),
+                    scope,
+                    prefetched,
+                    local_answer,
+                )
+            )
+            for call_id, function_call in calls
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
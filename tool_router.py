@@ -0,0 +1,207 @@
+import math
+import re
+from collections import defaultdict
+from typing import Dict, List, Set
+
+from google.genai import types
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+ISSUE_KEY_RE = re.compile(r"\b[A-Z][A-Z0-9]+-\d+\b")
+PROJECT_KEY_RE = re.compile(r"\b[A-Z][A-Z0-9]+\b")
+
+# Finish reasons Gemini reports when it tried to call an undeclared tool
+WIDENING_FINISH_REASONS = {"MALFORMED_FUNCTION_CALL", "UNEXPECTED_TOOL_CALL"}
+
+# Extra score for a message word that appears in the tool name itself
+NAME_MATCH_BONUS = 0.3
+
+# Best tool score from which a message without issue keys likely needs tools;
+# chit-chat and writing requests stay below it
+TOOLS_LIKELY_SCORE = 0.8
+
+# Words that say nothing about which tool is wanted
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "ctx", "do", "for",
+    "from", "get", "give", "i", "if", "in", "is", "it", "json", "me", "my",
+    "of", "on", "or", "please", "show", "string", "that", "the", "this", "to",
+    "what", "which", "with", "you",
+}  # fmt: skip
+
+# Everyday phrasing mapped onto the vocabulary of the tool descriptions
+SYNONYMS = {
+    "ticket": "issue",
+    "tickets": "issue",
+    "task": "issue",
+    "bug": "issue",
+    "move": "transition",
+    "close": "transition",
+    "resolve": "transition",
+    "status": "transition",
+    "assign": "update",
+    "edit": "update",
+    "change": "update",
+    "rename": "update",
+    "find": "search",
+    "list": "search",
+    "open": "issue",
+    "new": "create",
+    "log": "worklog",
+    "time": "worklog",
+    "hours": "worklog",
+    "history": "changelog",
+    "changes": "changelog",
+    "changed": "changelog",
+    "remove": "delete",
+    "attachment": "attachments",
+    "file": "attachments",
+    "files": "attachments",
+    "iteration": "sprint",
+    "kanban": "board",
+    "scrum": "board",
+    "who": "user",
+    "profile": "user",
+}
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "es", "ed", "s"):
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[: -len(suffix)]
+    return word
+
+
+def tokenize(text: str, synonyms: Dict[str, str] = None) -> List[str]:
+    tokens = []
+    for word in TOKEN_RE.findall(text.lower()):
+        if word in STOP_WORDS:
+            continue
+        if synonyms:
+            word = synonyms.get(word, word)
+        tokens.append(_stem(word))
+    return tokens
+
+
+def _name_words(name: str) -> str:
+    return name.replace("jira_", "").replace("_", " ")
+
+
+def _declaration_text(declaration: types.FunctionDeclaration) -> str:
+    description = (declaration.description or "").split("Returns:")[0]
+    params = " ".join((declaration.parameters.properties or {}).keys())
+    return f"{_name_words(declaration.name)} {description} {params}"
+
+
+class ToolRouter:
+    """Pick the tools most relevant to a user message with a TF-IDF index.
+
+    The index is built once from the tool names and descriptions in
+    ``tools.py``; scoring a message is a handful of dict lookups, so it runs
+    in microseconds. ``always_include`` tools are part of every selection.
+    """
+
+    def __init__(
+        self,
+        tools: List[types.Tool],
+        top_k: int = 6,
+        always_include=("jira_search", "jira_get_issue"),
+    ):
+        self.tools = tools
+        self.top_k = top_k
+        self._by_name: Dict[str, types.Tool] = {}
+        documents = []
+        for tool in tools:
+            for declaration in tool.function_declarations or []:
+                self._by_name[declaration.name] = tool
+                documents.append(
+                    (declaration.name, tokenize(_declaration_text(declaration)))
+                )
+        self.always_include = [name for name in always_include if name in self._by_name]
+
+        document_frequency = defaultdict(int)
+        for _, tokens in documents:
+            for token in set(tokens):
+                document_frequency[token] += 1
+        count = len(documents)
+        self._postings: Dict[str, List] = defaultdict(list)
+        self._name_postings: Dict[str, List[str]] = defaultdict(list)
+        for name in self._by_name:
+            for token in set(tokenize(_name_words(name))):
+                self._name_postings[token].append(name)
+        for name, tokens in documents:
+            term_counts = defaultdict(int)
+            for token in tokens:
+                term_counts[token] += 1
+            weights = {
+                token: (1 + math.log(tf))
+                * math.log((count + 1) / document_frequency[token])
+                for token, tf in term_counts.items()
+            }
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for token, weight in weights.items():
+                self._postings[token].append((name, weight / norm))
+        self.metrics = {"routed": 0, "widened": 0, "tools_selected": 0}
+
+    @property
+    def all_names(self) -> Set[str]:
+        return set(self._by_name)
+
+    def _scores(self, message: str) -> Dict[str, float]:
+        scores: Dict[str, float] = defaultdict(float)
+        has_issue_key = ISSUE_KEY_RE.search(message) is not None
+        # Issue and project keys would only match the JQL examples
+        message = PROJECT_KEY_RE.sub(" ", ISSUE_KEY_RE.sub(" ", message))
+        for token in tokenize(message, SYNONYMS):
+            for name, weight in self._postings.get(token, ()):
+                scores[name] += weight
+            for name in self._name_postings.get(token, ()):
+                scores[name] += NAME_MATCH_BONUS
+        if has_issue_key:
+            scores["jira_get_issue"] += 0.5
+        return scores
+
+    def rank(self, message: str) -> List[str]:
+        scores = self._scores(message)
+        return sorted(scores, key=scores.get, reverse=True)
+
+    def tools_likely(self, message: str) -> bool:
+        """Whether ``message`` probably needs a tool, not just any word match."""
+        if ISSUE_KEY_RE.search(message):
+            return True
+        return max(self._scores(message).values(), default=0.0) >= TOOLS_LIKELY_SCORE
+
+    def select(self, message: str, top_k: int = None) -> List[str]:
+        """Names of the tools to offer the model for ``message``."""
+        top_k = top_k or self.top_k
+        selected = list(self.always_include)
+        for name in self.rank(message):
+            if len(selected) >= top_k:
+                break
+            if name not in selected:
+                selected.append(name)
+        self.metrics["routed"] += 1
+        self.metrics["tools_selected"] += len(selected)
+        return selected
+
+    def tools_for(self, names: List[str]) -> List[types.Tool]:
+        return [self._by_name[name] for name in names if name in self._by_name]
+
+    @staticmethod
+    def needs_widening(chunk, selected: Set[str]) -> bool:
+        """Whether the model reached for a tool outside the routed selection."""
+        for function_call in chunk.function_calls or []:
+            if function_call.name not in selected:
+                return True
+        for candidate in chunk.candidates or []:
+            reason = getattr(candidate.finish_reason, "name", candidate.finish_reason)
+            if reason in WIDENING_FINISH_REASONS:
+                return True
+        return False
+
+    def stats(self) -> dict:
+        routed = self.metrics["routed"]
+        return {
+            **self.metrics,
+            "avg_tools_selected": (
+                round(self.metrics["tools_selected"] / routed, 2) if routed else 0.0
+            ),
+        }
@@ -0,0 +1,239 @@
+"""Jira user profiles and the access tokens they logged in with.
+
+``MemoryUserStore`` is an LRU bounded by entry count and by the JSON size
+of the profiles, with a TTL on every entry. ``SQLiteUserStore`` keeps the
+same entries in a SQLite file so they survive restarts, with a
+``MemoryUserStore`` in front of it for the hot set. Access tokens are only
+kept as SHA-256 digests.
+"""
+
+import abc
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from mcp.types import CallToolResult, TextContent
+
+# Identifiers the model uses for whoever is chatting
+SELF_IDENTIFIERS = {"me", "myself", "current user", "currentuser", "currentuser()"}
+
+
+def token_key(access_token: str) -> str:
+    return hashlib.sha256(access_token.encode()).hexdigest()
+
+
+def is_user(identifier, profile: dict) -> bool:
+    """Whether a ``jira_get_user_profile`` identifier names ``profile``."""
+    if not identifier:
+        return False
+    value = str(identifier).strip().lower()
+    if value in SELF_IDENTIFIERS:
+        return True
+    return any(
+        value == str(profile.get(field) or "").lower()
+        for field in ("accountId", "emailAddress", "displayName", "name", "key")
+    )
+
+
+def profile_answer(profile: Optional[dict], name: str, args: Optional[dict]):
+    """The current user's profile as the result of a matching tool call."""
+    if (
+        profile is None
+        or name != "jira_get_user_profile"
+        or not is_user((args or {}).get("user_identifier"), profile)
+    ):
+        return None
+    return CallToolResult(content=[TextContent(type="text", text=json.dumps(profile))])
+
+
+class UserStore(abc.ABC):
+    """Interface of the user stores; every method is safe to await on the loop."""
+
+    @abc.abstractmethod
+    async def get(self, account_id: str) -> Optional[dict]: ...
+
+    @abc.abstractmethod
+    async def put(self, account_id: str, profile: dict): ...
+
+    @abc.abstractmethod
+    async def account_for(self, access_token: str) -> Optional[str]:
+        """Account id that logged in with ``access_token``, if known."""
+
+    @abc.abstractmethod
+    async def remember_login(self, access_token: str, account_id: str): ...
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryUserStore(UserStore):
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        max_bytes: int = 16 * 1024 * 1024,
+        ttl: float = 3600.0,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # ("user", account id) or ("token", digest) -> (expires at, value, size)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, object, int]]" = (
+            OrderedDict()
+        )
+        self.bytes = 0
+        self.metrics = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def lookup(self, key: Tuple[str, str]):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.metrics["misses"] += 1
+            return None
+        if entry[0] <= time.time():
+            self._remove(key)
+            self.metrics["expired"] += 1
+            self.metrics["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.metrics["hits"] += 1
+        return entry[1]
+
+    def store(self, key: Tuple[str, str], value, expires_at: Optional[float] = None):
+        self._remove(key)
+        size = len(json.dumps(value)) if isinstance(value, dict) else len(str(value))
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (expires_at or time.time() + self.ttl, value, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.metrics["evictions"] += 1
+
+    def _remove(self, key: Tuple[str, str]):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    async def get(self, account_id: str) -> Optional[dict]:
+        return self.lookup(("user", account_id))
+
+    async def put(self, account_id: str, profile: dict):
+        self.store(("user", account_id), profile)
+
+    async def account_for(self, access_token: str) -> Optional[str]:
+        return self.lookup(("token", token_key(access_token)))
+
+    async def remember_login(self, access_token: str, account_id: str):
+        self.store(("token", token_key(access_token)), account_id)
+
+    def stats(self) -> dict:
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "hit_rate": round(self.metrics["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    account_id TEXT PRIMARY KEY,
+    profile TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS logins (
+    token_key TEXT PRIMARY KEY,
+    account_id TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+# Table -> (key column, value column)
+COLUMNS = {"users": ("account_id", "profile"), "logins": ("token_key", "account_id")}
+
+
+class SQLiteUserStore(UserStore):
+    """``memory`` in front of a SQLite file that outlives the process."""
+
+    def __init__(self, path: str, memory: Optional[MemoryUserStore] = None):
+        self.memory = memory or MemoryUserStore()
+        # One thread owns the connection, which also serializes every query
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="users")
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self.metrics = {"db_hits": 0, "db_misses": 0}
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._thread, lambda: fn(*args)
+        )
+
+    def _select(self, table: str, key: str):
+        key_column, value_column = COLUMNS[table]
+        return self._db.execute(
+            f"SELECT {value_column}, expires_at FROM {table} "
+            f"WHERE {key_column} = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+
+    def _upsert(self, table: str, key: str, value: str, expires_at: float):
+        with self._db:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {table} VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            # Expired rows go a few at a time instead of in a sweep
+            self._db.execute(
+                f"DELETE FROM {table} WHERE rowid IN "
+                f"(SELECT rowid FROM {table} WHERE expires_at <= ? LIMIT 16)",
+                (time.time(),),
+            )
+
+    async def _lookup(self, kind: str, key: str, table: str):
+        value = self.memory.lookup((kind, key))
+        if value is not None:
+            return value
+        row = await self._run(self._select, table, key)
+        if row is None:
+            self.metrics["db_misses"] += 1
+            return None
+        self.metrics["db_hits"] += 1
+        value = json.loads(row[0]) if table == "users" else row[0]
+        self.memory.store((kind, key), value, row[1])
+        return value
+
+    async def get(self, account_id: str) -> Optional[dict]:
+        return await self._lookup("user", account_id, "users")
+
+    async def put(self, account_id: str, profile: dict):
+        expires_at = time.time() + self.memory.ttl
+        self.memory.store(("user", account_id), profile, expires_at)
+        await self._run(
+            self._upsert, "users", account_id, json.dumps(profile), expires_at
+        )
+
+    async def account_for(self, access_token: str) -> Optional[str]:
+        return await self._lookup("token", token_key(access_token), "logins")
+
+    async def remember_login(self, access_token: str, account_id: str):
+        key = token_key(access_token)
+        expires_at = time.time() + self.memory.ttl
+        self.memory.store(("token", key), account_id, expires_at)
+        await self._run(self._upsert, "logins", key, account_id, expires_at)
+
+    async def close(self):
+        await self._run(self._db.close)
+        self._thread.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {**self.memory.stats(), **self.metrics}